@@ -1,47 +1,189 @@
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from models import db, ma, migrate
 from routes import register_routes
-from werkzeug.security import generate_password_hash
+from cli import register_commands
 from flask_jwt_extended import JWTManager
-from models.user import User  
-from models.category import Category
+from services.instrumentation import init_sql_instrumentation
+from services.metrics import init_metrics
+from services.cache import product_cache
+from services.database import engine_options, init_database, replica_binds
+from services.replica import init_replica
+from services.json_provider import init_json
+from services.jobs import init_jobs, start_worker_threads
+from services.ratelimit import init_rate_limits
+from services.admission import init_admission
+from services.seeding import seed_categories_bulk, seed_users_bulk
 from datetime import timedelta
 import os
 
-app = Flask(__name__)
+jwt = JWTManager()
 
-# Configure the DB
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///db.sqlite3')
+def create_app(test_config=None):
+    """Create and configure the Flask application."""
+    app = Flask(__name__)
 
-# Configure JWT
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', b'|f\xa3\xf5\xc7=x\xa0\xca\xad[i\xaf\xde\x07\xfe\xfez"\xba\xcc\xec@\xf7\x1f\x19"|!\x9ah\x8f')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=4)
+    # Configure the DB
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///db.sqlite3')
+    # Connection pool (SQLite files and server databases; in-memory SQLite keeps a single connection)
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    # SQLite connection profile: 'production' (WAL and the pragmas below) or 'default' (SQLite defaults)
+    app.config['SQLITE_PROFILE'] = os.getenv('SQLITE_PROFILE', 'production')
+    app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_CACHE_SIZE_KB'] = int(os.getenv('SQLITE_CACHE_SIZE_KB', 65536))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))
+    # Optional read replica for read-only endpoints; clients that just wrote keep reading the primary
+    # for DB_READ_YOUR_WRITES_SECONDS (keep it above the replica lag)
+    app.config['DATABASE_REPLICA_URL'] = os.getenv('DATABASE_REPLICA_URL')
+    app.config['DB_READ_YOUR_WRITES_SECONDS'] = int(os.getenv('DB_READ_YOUR_WRITES_SECONDS', 5))
 
-jwt = JWTManager(app)
+    # Configure JWT
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', b'|f\xa3\xf5\xc7=x\xa0\xca\xad[i\xaf\xde\x07\xfe\xfez"\xba\xcc\xec@\xf7\x1f\x19"|!\x9ah\x8f')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=4)
+    # Seconds a user's role is cached for authorization checks; 0 trusts the role claim in the token
+    app.config['AUTH_PRINCIPAL_CACHE_TTL'] = float(os.getenv('AUTH_PRINCIPAL_CACHE_TTL', 0))
 
-db.init_app(app)
-ma.init_app(app)
-migrate.init_app(app, db)
+    # Configure password hashing: PBKDF2 parameters and the bounded hashing process pool
+    app.config['PASSWORD_HASH_ALGORITHM'] = os.getenv('PASSWORD_HASH_ALGORITHM', 'sha256')
+    app.config['PASSWORD_HASH_ITERATIONS'] = int(os.getenv('PASSWORD_HASH_ITERATIONS', 600000))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
 
-register_routes(app)
+    # Configure pagination of the product listing
+    app.config['PRODUCTS_PAGE_SIZE'] = int(os.getenv('PRODUCTS_PAGE_SIZE', 50))
+    app.config['PRODUCTS_MAX_PAGE_SIZE'] = int(os.getenv('PRODUCTS_MAX_PAGE_SIZE', 200))
+    # Configure pagination of the order and invoice history
+    app.config['HISTORY_PAGE_SIZE'] = int(os.getenv('HISTORY_PAGE_SIZE', 20))
+    app.config['HISTORY_MAX_PAGE_SIZE'] = int(os.getenv('HISTORY_MAX_PAGE_SIZE', 100))
+    # Rows per transaction of the bulk product import (and per fetch of the export)
+    app.config['PRODUCTS_IMPORT_BATCH_SIZE'] = int(os.getenv('PRODUCTS_IMPORT_BATCH_SIZE', 1000))
 
-def seed_data():
-    """This function seeds initial data into the database."""
-    admin_hashed_password = generate_password_hash("Omar123#", method='pbkdf2:sha256')
-    user_hashed_password = generate_password_hash("Ali321@", method='pbkdf2:sha256')
+    # Stock level at or below which a product shows in the low-stock report
+    app.config['LOW_STOCK_THRESHOLD'] = int(os.getenv('LOW_STOCK_THRESHOLD', 10))
 
-    with app.app_context():
-        if not User.query.filter_by(email="Omar12.amjad@gmail.com").first():
-            admin = User(user_name="Omar Hamayel", email="Omar12.amjad@gmail.com", role='admin', password_hash=admin_hashed_password)
-            db.session.add(admin)
+    # Configure Cache-Control of conditional (ETag/Last-Modified) responses
+    app.config['PRODUCTS_CACHE_CONTROL'] = os.getenv('PRODUCTS_CACHE_CONTROL', 'private, no-cache')
+    app.config['PROFILE_CACHE_CONTROL'] = os.getenv('PROFILE_CACHE_CONTROL', 'private, no-cache')
 
-        if not User.query.filter_by(email="Ali.kareem@gmail.com").first():
-            user1 = User(user_name="Ali Kareem", email="Ali.kareem@gmail.com", role='customer', password_hash=user_hashed_password)
-            db.session.add(user1)
-        
-        db.session.commit()
+    # Configure the product cache: 'local' (per-process LRU) or 'redis' (shared by all workers)
+    app.config['PRODUCT_CACHE_BACKEND'] = os.getenv('PRODUCT_CACHE_BACKEND', 'local')
+    app.config['PRODUCT_CACHE_REDIS_URL'] = os.getenv('PRODUCT_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    app.config['PRODUCT_CACHE_TTL'] = float(os.getenv('PRODUCT_CACHE_TTL', 60))
+    app.config['PRODUCT_CACHE_MAXSIZE'] = int(os.getenv('PRODUCT_CACHE_MAXSIZE', 10000))
+
+    # Seconds a stored Idempotency-Key response is replayed to retries, and seconds after which a key whose
+    # request never finished (e.g. its worker was killed) may be claimed again (keep it above GUNICORN_TIMEOUT)
+    app.config['IDEMPOTENCY_KEY_TTL'] = int(os.getenv('IDEMPOTENCY_KEY_TTL', 86400))
+    app.config['IDEMPOTENCY_LOCK_TIMEOUT'] = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+    # JSON encoding of responses: 'orjson' (fast, needs the orjson package) or 'default' (Flask's encoder)
+    app.config['JSON_PROVIDER'] = os.getenv('JSON_PROVIDER', 'orjson')
+
+    # Background jobs: worker threads started in each web process (0 when `flask jobs work` runs them),
+    # seconds between polls when idle, seconds before a running job is considered lost and requeued,
+    # exponential retry backoff bounds and days finished jobs are kept
+    app.config['JOB_WORKER_THREADS'] = int(os.getenv('JOB_WORKER_THREADS', 1))
+    app.config['JOB_POLL_INTERVAL'] = float(os.getenv('JOB_POLL_INTERVAL', 1))
+    app.config['JOB_TIMEOUT'] = int(os.getenv('JOB_TIMEOUT', 600))
+    app.config['JOB_RETRY_BASE_SECONDS'] = float(os.getenv('JOB_RETRY_BASE_SECONDS', 10))
+    app.config['JOB_RETRY_MAX_SECONDS'] = float(os.getenv('JOB_RETRY_MAX_SECONDS', 3600))
+    app.config['JOB_RETENTION_DAYS'] = int(os.getenv('JOB_RETENTION_DAYS', 7))
+    # Pending carts untouched for CART_TTL_SECONDS are expired and their stock released (0 keeps them)
+    app.config['CART_TTL_SECONDS'] = int(os.getenv('CART_TTL_SECONDS', 172800))
+    app.config['CART_EXPIRY_BATCH_SIZE'] = int(os.getenv('CART_EXPIRY_BATCH_SIZE', 500))
+    # Where rendered invoice documents are written (defaults to <instance>/invoices)
+    app.config['INVOICE_DIR'] = os.getenv('INVOICE_DIR')
+
+    # Threads running the endpoints without an async view when served through asgi:app, and how many
+    # requests may be running or waiting for them before new ones get 503 (0 = no bound)
+    app.config['ASYNC_WSGI_THREADS'] = int(os.getenv('ASYNC_WSGI_THREADS', 10))
+    app.config['ASYNC_WSGI_MAX_PENDING'] = int(os.getenv('ASYNC_WSGI_MAX_PENDING', 50))
+
+    # Number of trusted reverse proxies in front of the app; their X-Forwarded-For/-Proto headers then give
+    # the client address and scheme (0 = the app is reached directly, the headers are ignored)
+    app.config['PROXY_FIX_HOPS'] = int(os.getenv('PROXY_FIX_HOPS', 0))
+
+    # Rate limits ('<count>/<second|minute|hour|day>', empty disables them): RATE_LIMIT_DEFAULT applies to
+    # every request per client IP, the others to logins and registrations per IP and logins per account.
+    # Counters are kept per process ('local'), in the primary database ('database') or in Redis ('redis');
+    # with several worker processes only the shared backends enforce the exact limits. The per-IP limits
+    # are off by default: behind a reverse proxy they need PROXY_FIX_HOPS, or every client shares one address.
+    app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'local')
+    app.config['RATE_LIMIT_REDIS_URL'] = os.getenv('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/1')
+    app.config['RATE_LIMIT_ALGORITHM'] = os.getenv('RATE_LIMIT_ALGORITHM', 'token_bucket')
+    app.config['RATE_LIMIT_DEFAULT'] = os.getenv('RATE_LIMIT_DEFAULT', '')
+    app.config['RATE_LIMIT_LOGIN'] = os.getenv('RATE_LIMIT_LOGIN', '')
+    app.config['RATE_LIMIT_LOGIN_ACCOUNT'] = os.getenv('RATE_LIMIT_LOGIN_ACCOUNT', '10/minute')
+    app.config['RATE_LIMIT_REGISTER'] = os.getenv('RATE_LIMIT_REGISTER', '')
+    # Requests in flight per process above which new ones get 503 with Retry-After (0 = no cap)
+    app.config['MAX_IN_FLIGHT_REQUESTS'] = int(os.getenv('MAX_IN_FLIGHT_REQUESTS', 0))
+    app.config['ADMISSION_RETRY_AFTER'] = int(os.getenv('ADMISSION_RETRY_AFTER', 1))
+
+    # Configure SQL instrumentation (opt-in) and the slow query log
+    app.config['SQL_INSTRUMENTATION'] = os.getenv('SQL_INSTRUMENTATION', '0') == '1'
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+    app.config['SQL_INSTRUMENTATION_TOP_N'] = int(os.getenv('SQL_INSTRUMENTATION_TOP_N', 3))
+
+    # Apply overrides (tests, benchmarks) before the extensions read the configuration
+    if test_config:
+        app.config.update(test_config)
+
+    hops = app.config['PROXY_FIX_HOPS']
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    app.config.setdefault('SQLALCHEMY_BINDS', replica_binds(app.config))
+
+    init_json(app)
+    jwt.init_app(app)
+
+    db.init_app(app)
+    init_database(app, db)
+    init_replica(app)
+    ma.init_app(app)
+    migrate.init_app(app, db, render_as_batch=True, include_object=include_object)
+    product_cache.init_app(app)
+    init_jobs(app)
+    init_rate_limits(app)
+
+    register_routes(app)
+    register_commands(app)
+    init_sql_instrumentation(app)
+    init_metrics(app, db)
+    init_admission(app)
+
+    app.add_url_rule('/', 'home', home, methods=['GET'])
+    app.add_url_rule('/home', 'home', home, methods=['GET'])
+
+    return app
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Keep Alembic autogenerate away from the FTS5 search tables, which are managed by hand."""
+    return not (type_ == 'table' and name.startswith('product_fts'))
+
+
+def home():
+    return "<h1>Welcome to our website</h1>"
+
+
+def seed_data(app):
+    """This function seeds initial data into the database (passwords are only hashed for missing users)."""
+    with app.app_context():
+        seed_users_bulk([{'user_name': "Omar Hamayel", 'email': "Omar12.amjad@gmail.com", 'role': 'admin'}],
+                        "Omar123#")
+        seed_users_bulk([{'user_name': "Ali Kareem", 'email': "Ali.kareem@gmail.com", 'role': 'customer'}],
+                        "Ali321@")
         
-def seed_categories():
+
+def seed_categories(app):
     """Seed the database with initial categories."""
     categories = [
         {"name": "Living Room Furniture"},
@@ -54,31 +196,27 @@ def seed_categories():
     
     try:
         with app.app_context():
-            for category in categories:
-                if not Category.query.filter_by(category_name=category['name']).first():
-                    new_category = Category(category_name=category['name'].order_by(category.id))
-                    db.session.add(new_category)
-            
-            db.session.commit()
+            seed_categories_bulk(category['name'] for category in categories)
             print("Categories seeded successfully.")
     except Exception as e:
-        db.session.rollback()
+        with app.app_context():
+            db.session.rollback()
         print(f"An error occurred while seeding categories: {e}")
-# adding new route
-@app.route('/', methods=['GET'])
-@app.route('/home', methods=['GET'])
-def home():
-    return "<h1>Welcome to our website</h1>"
 
 
-def create_tables():
+def create_tables(app):
     """This function creates all the database tables."""
     with app.app_context():
         db.create_all()
 
 if __name__ == '__main__':
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py wsgi:app`
+    app = create_app()
     with app.app_context():
-        create_tables()
-        seed_data()
-        seed_categories()
+        create_tables(app)
+        seed_data(app)
+        seed_categories(app)
+    # The reloader runs this script twice; only its serving child works on jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_worker_threads(app)
     app.run(debug=True)
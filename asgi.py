@@ -0,0 +1,7 @@
+# ASGI entry point serving the read-heavy endpoints with async views (see services.asgi), e.g.
+# `gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app` or `uvicorn asgi:app`.
+# Plain uvicorn starts no job worker threads; run `flask jobs work` next to it.
+from app import create_app
+from services.asgi import AsgiApp
+
+app = AsgiApp(create_app())
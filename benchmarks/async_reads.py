@@ -0,0 +1,216 @@
+"""
+Concurrency of the read endpoints under the WSGI and the ASGI server.
+
+Usage:
+    python benchmarks/async_reads.py [--concurrency 1,8,32,128] [--duration 10] [--threads 4]
+                                     [--servers gthread,uvicorn] [--db-latency-ms 0]
+
+Seeds a throw-away SQLite database (migrations, `seed_data` and a small
+`seed_synthetic` dataset), then starts one single-process server at a time:
+
+    gthread  gunicorn wsgi:app with `--threads` request threads
+    uvicorn  gunicorn asgi:app with the uvicorn worker (async views)
+
+For every concurrency level, that many keep-alive connections send
+GET /products, GET /products/<id>, GET /cart and GET /profile in turn for
+`--duration` seconds. The report lists requests per second, p50/p95 latency
+and errors (non-200 responses, resets and timeouts) per server and level.
+With the WSGI server, requests beyond its thread count wait in the accept
+queue; the ASGI server keeps them all in flight on the event loop.
+
+A local SQLite file answers in microseconds, so the servers mostly compete
+on CPU. `--db-latency-ms` makes every SQL statement wait that long on the
+thread running it, like the network round trip to a database server, which
+is the I/O-bound case the async views are for.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVERS = {
+    'gthread': lambda threads: ['wsgi:app', '--threads', str(threads)],
+    'uvicorn': lambda threads: ['asgi:app', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+REQUEST_TIMEOUT = 10
+
+
+def prepare():
+    """Seed the database and give the customer a cart; returns the admin and customer access tokens."""
+    from flask_jwt_extended import create_access_token
+    from flask_migrate import upgrade
+    from app import create_app, seed_data
+    from models import db
+    from models.product import Product
+    from models.user import User
+    from services.seeding import SYNTHETIC_EMAIL, seed_synthetic
+
+    app = create_app()
+    with app.app_context():
+        upgrade()
+        seed_data(app)
+        seed_synthetic(users=50, categories=10, products=2000, orders=200)
+        admin = User.query.filter_by(role='admin').first()
+        customer = User.query.filter_by(email=SYNTHETIC_EMAIL.format(0)).first()
+        tokens = (create_access_token(identity=admin.user_id, additional_claims={'role': admin.role}),
+                  create_access_token(identity=customer.user_id, additional_claims={'role': customer.role}))
+        product_name = db.session.get(Product, 1).product_name
+    response = app.test_client().post('/cart', json={'products': [{'name': product_name, 'quantity': 1}]},
+                                      headers={'Authorization': f'Bearer {tokens[1]}'})
+    if response.status_code != 200:
+        raise SystemExit(f'could not create the cart: {response.json}')
+    return tokens
+
+
+def serve(latency_ms, argv):
+    """Run gunicorn in this process, delaying every SQL statement by `latency_ms`."""
+    from gunicorn.app.wsgiapp import run
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    def delay(statement):
+        time.sleep(latency_ms / 1000)
+
+    def add_latency(dbapi_connection, connection_record):
+        # The trace callback runs on the thread executing the statement (aiosqlite's own thread when async)
+        if hasattr(dbapi_connection, 'run_async'):
+            dbapi_connection.run_async(lambda connection: connection.set_trace_callback(delay))
+        else:
+            dbapi_connection.set_trace_callback(delay)
+
+    if latency_ms:
+        event.listen(Engine, 'connect', add_latency)
+    sys.argv = ['gunicorn'] + argv
+    run()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, threads, port, latency_ms):
+    command = [sys.executable, os.path.abspath(__file__), '--serve', str(latency_ms),
+               '-c', 'gunicorn.conf.py', '-w', '1', '-b', f'127.0.0.1:{port}',
+               '--access-logfile', '/dev/null'] + SERVERS[name](threads)
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f'{name} did not start')
+
+
+async def get(reader, writer, path, token):
+    """Send a keep-alive GET and read the response; returns the status code."""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n\r\n'.encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(lines[0].split()[1])
+
+
+async def connection_loop(port, requests, deadline, samples):
+    errors = 0
+    reader = writer = None
+    index = 0
+    while time.perf_counter() < deadline:
+        path, token = requests[index % len(requests)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            status = await asyncio.wait_for(get(reader, writer, path, token), REQUEST_TIMEOUT)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            errors += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            continue
+        if status == 200:
+            samples.append(time.perf_counter() - started)
+        else:
+            errors += 1
+    if writer is not None:
+        writer.close()
+    return errors
+
+
+async def measure(port, requests, concurrency, duration):
+    samples = []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    errors = await asyncio.gather(*(connection_loop(port, requests, deadline, samples)
+                                    for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    samples.sort()
+
+    def percentile(fraction):
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000 if samples else 0.0
+
+    return len(samples) / elapsed, percentile(0.5), percentile(0.95), sum(errors)
+
+
+def main():
+    if sys.argv[1:2] == ['--serve']:
+        serve(float(sys.argv[2]), sys.argv[3:])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,8,32,128')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=4, help='Request threads of the gthread server.')
+    parser.add_argument('--servers', default=','.join(SERVERS))
+    parser.add_argument('--db-latency-ms', type=float, default=0, help='Simulated database round trip.')
+    args = parser.parse_args()
+
+    fd, db_path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ['JOB_WORKER_THREADS'] = '0'
+    admin_token, customer_token = prepare()
+    requests = [('/products?limit=50', admin_token), ('/products/1', admin_token),
+                ('/cart', customer_token), ('/profile', customer_token)]
+
+    print(f"{'server':<8} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6}")
+    try:
+        for name in args.servers.split(','):
+            port = free_port()
+            process = start_server(name, args.threads, port, args.db_latency_ms)
+            try:
+                for concurrency in (int(level) for level in args.concurrency.split(',')):
+                    throughput, p50, p95, errors = asyncio.run(
+                        measure(port, requests, concurrency, args.duration))
+                    print(f"{name:<8} {concurrency:>7} {throughput:>8.1f} {p50:>8.2f} {p95:>8.2f} {errors:>6}")
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=30)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
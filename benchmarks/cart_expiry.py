@@ -0,0 +1,126 @@
+"""
+Throughput of the stale cart sweeper against a per-item release loop.
+
+Usage:
+    python benchmarks/cart_expiry.py [--carts 5000] [--items 5] [--products 200] [--batch-size 500]
+
+Seeds the same set of abandoned carts twice. One copy is released the way
+DELETE /cart/clear does it, one cart and one item at a time through the ORM.
+The other copy goes through `expire_stale_carts`, which uses set-based
+statements per batch. For each approach the script reports rows per second
+and checks that every reserved unit is back in stock. It exits non-zero
+when the stock does not match.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_fd, DB_PATH = tempfile.mkstemp(suffix='.sqlite3')
+os.close(_fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from sqlalchemy import func, insert  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+from models.category import Category  # noqa: E402
+from models.invoice import Invoice  # noqa: E402
+from models.order import Order  # noqa: E402
+from models.order_items import OrderItems  # noqa: E402
+from models.product import Product  # noqa: E402
+from models.user import User  # noqa: E402
+from services.cart import adjust_stock, expire_stale_carts  # noqa: E402
+
+STOCK = 1_000_000
+
+app = create_app()
+
+
+def seed(carts, items, products):
+    """Reset the stock and create `carts` stale Pending carts with `items` lines each."""
+    db.session.execute(Product.__table__.update().values(product_quantity=STOCK))
+    old = datetime.utcnow() - timedelta(days=30)
+    user_ids = db.session.execute(db.select(User.user_id)).scalars().all()
+    orders = [{'status': 'Pending', 'user_id': user_ids[i % len(user_ids)], 'order_date': old, 'updated_at': old}
+              for i in range(carts)]
+    db.session.execute(insert(Order), orders)
+    order_ids = db.session.execute(db.select(Order.order_id).where(Order.status == 'Pending')).scalars().all()
+    lines, invoices, taken = [], [], {}
+    for order_id in order_ids:
+        for product_id in random.sample(range(1, products + 1), items):
+            quantity = random.randint(1, 3)
+            lines.append({'order_id': order_id, 'product_id': product_id, 'quantity': quantity, 'unit_price': 10})
+            taken[product_id] = taken.get(product_id, 0) + quantity
+        invoices.append({'order_id': order_id, 'total_amount': 0, 'payment_method': 'Online Payment',
+                         'invoice_date': old})
+    db.session.execute(insert(OrderItems), lines)
+    db.session.execute(insert(Invoice), invoices)
+    adjust_stock(taken)
+    db.session.commit()
+    return len(lines) + len(invoices) + len(order_ids)
+
+
+def release_one_by_one():
+    """The clear_cart approach: load each cart and delete it row by row."""
+    for order in Order.query.filter_by(status='Pending').all():
+        released = {}
+        for item in order.order_item:
+            released[item.product_id] = released.get(item.product_id, 0) - item.quantity
+            db.session.delete(item)
+        if order.invoice:
+            db.session.delete(order.invoice)
+        db.session.delete(order)
+        adjust_stock(released)
+        db.session.commit()
+
+
+def stock_ok(products):
+    total = db.session.query(func.sum(Product.product_quantity)).scalar()
+    return total == STOCK * products and Order.query.count() == 0 and OrderItems.query.count() == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--carts', type=int, default=5000)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    ok = True
+    with app.app_context():
+        db.create_all()
+        category = Category(category_name='Bench')
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all(Product(product_name=f'product {i}', product_quantity=STOCK, description='',
+                                   price=10, category_id=category.category_id) for i in range(args.products))
+        db.session.add_all(User(user_name=f'user{i}', email=f'user{i}@example.com', role='customer',
+                                password_hash='unused') for i in range(100))
+        db.session.commit()
+
+        rows = seed(args.carts, args.items, args.products)
+        started = time.perf_counter()
+        release_one_by_one()
+        elapsed = time.perf_counter() - started
+        print(f'per-item loop      {rows} rows in {elapsed:7.2f}s  {rows / elapsed:10.0f} rows/s  '
+              f'stock {"ok" if stock_ok(args.products) else "WRONG"}')
+        ok &= stock_ok(args.products)
+
+        rows = seed(args.carts, args.items, args.products)
+        report = expire_stale_carts(3600, batch_size=args.batch_size)
+        print(f'expire_stale_carts {rows} rows in {report["seconds"]:7.2f}s  {report["rows_per_second"]:10.0f} rows/s  '
+              f'stock {"ok" if stock_ok(args.products) else "WRONG"}')
+        ok &= stock_ok(args.products)
+
+    os.remove(DB_PATH)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Check that the cart endpoints run the same number of queries whatever the cart size.
+
+Usage:
+    python benchmarks/cart_queries.py [--sizes 1,3,10]
+
+Builds a throw-away SQLite database with the Alembic migrations, then fills
+a customer's cart with carts of every `--sizes` line count through the Flask
+test client: add new lines, add to the existing lines, update them, view the
+cart and clear it. The queries of each request are counted by the SQL
+instrumentation (the `Server-Timing` header). A cart loaded line by line (an
+N+1) shows up as a count growing with the number of lines; the script then
+exits with status 1.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_fd, DB_PATH = tempfile.mkstemp(suffix='.sqlite3')
+os.close(_fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from flask_migrate import upgrade  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from app import create_app, seed_data  # noqa: E402
+from models import db  # noqa: E402
+from models.category import Category  # noqa: E402
+from models.product import Product  # noqa: E402
+
+app = create_app({'SQL_INSTRUMENTATION': True, 'SLOW_QUERY_THRESHOLD_MS': 10_000})
+
+CUSTOMER = ('Ali.kareem@gmail.com', 'Ali321@')
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def seed(products):
+    upgrade()
+    seed_data(app)
+    db.session.add(Category(category_name='Cart Check'))
+    db.session.commit()
+    db.session.execute(insert(Product), [{
+        'product_name': f'Product {i}',
+        'description': 'cart check',
+        'product_quantity': 1000,
+        'price': 5 + i % 50,
+        'category_id': 1,
+    } for i in range(1, products + 1)])
+    db.session.commit()
+
+
+def scenarios(size):
+    """(operation, method, url, body) of one round with a cart of `size` lines."""
+    lines = [{'name': f'Product {i}', 'quantity': 1} for i in range(1, size + 1)]
+    return [
+        ('add new', 'POST', '/cart', {'products': lines}),
+        ('add existing', 'POST', '/cart', {'products': lines}),
+        ('update', 'PUT', '/cart', {'products': [{**line, 'quantity': 3} for line in lines]}),
+        ('view', 'GET', '/cart', None),
+        ('clear', 'DELETE', '/cart/clear', None),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,3,10', help='Cart line counts to compare.')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    client = app.test_client()
+    with app.app_context():
+        seed(max(sizes))
+    token = client.post('/login', json={'email': CUSTOMER[0], 'password': CUSTOMER[1]}).json['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    counts = {}
+    failures = 0
+    for size in sizes:
+        for operation, method, url, body in scenarios(size):
+            response = client.open(url, method=method, json=body, headers=headers)
+            match = QUERIES.search(response.headers.get('Server-Timing', ''))
+            if response.status_code != 200 or match is None:
+                print(f'FAIL  {operation} with {size} lines: {response.status_code} '
+                      f'{response.get_data(as_text=True)[:200]}')
+                failures += 1
+                continue
+            counts.setdefault(operation, {})[size] = int(match.group(1))
+
+    print(f"{'operation':<14}" + ''.join(f'{f"{size} lines":>10}' for size in sizes))
+    for operation, by_size in counts.items():
+        constant = len(set(by_size.values())) == 1
+        failures += not constant
+        print(f'{operation:<14}' + ''.join(f'{by_size.get(size, "-"):>10}' for size in sizes)
+              + ('' if constant else '  FAIL: grows with the cart'))
+
+    os.unlink(DB_PATH)
+    if failures:
+        print(f'{failures} problem(s) found')
+        sys.exit(1)
+    print('query counts do not depend on the cart size')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+"""
+Mixed-workload load test of the API with latency percentiles and saved baselines.
+
+Usage:
+    python benchmarks/loadtest.py [--target testclient|http://HOST:PORT] [--scale small]
+                                  [--concurrency 16] [--duration 30] [--ramp-up 10]
+                                  [--mix login=0.5,browse=20,...]
+                                  [--save-baseline FILE] [--baseline FILE] [--tolerance 0.5]
+
+Each virtual user is a thread that logs in as its own synthetic customer and
+then picks operations at random, weighted by `--mix`. The users start
+one after another over `--ramp-up` seconds, so their logins (deliberately slow
+password hashing) do not all land at once:
+
+    login        POST /login
+    browse       GET /products (keyset pages, random sort)
+    product      GET /products/<id>
+    search       GET /products/search
+    cart_get     GET /cart
+    cart_add     POST /cart
+    cart_update  PUT /cart
+    cart_clear   DELETE /cart/clear
+    checkout     POST /checkout
+
+With the default target the script builds a throw-away SQLite database with
+the migrations and `seed_synthetic` (`--scale`), and drives the app through
+the Flask test client. To load a running server, seed its database first with
+`flask seed synthetic` (and the demo admin from `seed_data`), then pass its
+URL. Queries per request come from the `Server-Timing` header, so start the
+server with SQL_INSTRUMENTATION=1 to get them (the test client target enables it).
+All virtual users share one client address, so the test client target keeps
+the per-address login limit (RATE_LIMIT_LOGIN) off; do the same on a server.
+
+The report lists the count, error count, p50/p95/p99 latency, throughput and
+queries per request of every operation. `--save-baseline` writes it as JSON
+and `--baseline` compares the run with a saved one. A regression fails the
+run with exit status 1. A regression is any of:
+    - a p95 more than `--tolerance` slower (and at least 5 ms slower)
+    - at least half a query more per request (an N+1 shows up here)
+    - lower total throughput
+    - new errors
+Latency baselines are only comparable on the same machine and settings.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN = ('Omar12.amjad@gmail.com', 'Omar123#')
+
+SCALES = {
+    'small': {'users': 200, 'categories': 10, 'products': 2000, 'orders': 1000},
+    'medium': {'users': 2000, 'categories': 20, 'products': 20000, 'orders': 10000},
+    'large': {'users': 20000, 'categories': 50, 'products': 200000, 'orders': 100000},
+}
+
+DEFAULT_MIX = 'login=0.5,browse=20,product=10,search=15,cart_get=15,cart_add=18,cart_update=10,cart_clear=5,checkout=5'
+
+SEARCH_TERMS = ('oak', 'walnut table', 'glass', 'leather sofa', 'lamp', 'mod', 'outdoor chair', 'rug')
+
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class TestClientTransport:
+    """Calls the app in-process through the Flask test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True), response.headers.get('Server-Timing')
+
+
+class HttpTransport:
+    """Calls a running server over one keep-alive HTTP connection."""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip('/')
+        self.connection = None
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = json.dumps(body) if body is not None else None
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self.connection_class(self.netloc, timeout=30)
+            try:
+                self.connection.request(method, self.prefix + path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The server closed an idle keep-alive connection; reconnect once
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        try:
+            data = json.loads(data) if data else None
+        except ValueError:
+            data = None
+        return response.status, data, response.getheader('Server-Timing')
+
+
+class VirtualUser:
+    """One simulated customer: its credentials, token and what it has in its cart."""
+
+    def __init__(self, transport, email, password, admin_token, product_ids, product_names, seed):
+        self.transport = transport
+        self.email = email
+        self.password = password
+        self.admin_token = admin_token
+        self.product_ids = product_ids
+        self.product_names = product_names
+        self.rng = random.Random(seed)
+        self.token = None
+        self.cart = set()
+        self.next_page = None
+        self.samples = {}
+
+    def call(self, operation, method, path, body=None, token=None, expected=(200,)):
+        started = time.perf_counter()
+        status, data, server_timing = self.transport.request(method, path, body, token)
+        elapsed = time.perf_counter() - started
+        match = _QUERIES.search(server_timing or '')
+        queries = int(match.group(1)) if match else None
+        self.samples.setdefault(operation, []).append((elapsed, status not in expected, queries))
+        return status, data
+
+    def login(self):
+        status, data = self.call('login', 'POST', '/login', {'email': self.email, 'password': self.password})
+        if status == 200:
+            self.token = data['token']
+            self.cart.clear()
+
+    def browse(self):
+        if self.next_page:
+            params = self.next_page
+        else:
+            params = {'limit': 20, 'fields': 'product_id,product_name,price'}
+            if self.rng.random() < 0.5:
+                params['sort'] = self.rng.choice(('price', '-price', 'name'))
+        status, data = self.call('browse', 'GET', f'/products?{urlencode(params)}', token=self.admin_token)
+        # Follow the next page half of the time, like a user scrolling
+        cursor = data.get('next_cursor') if status == 200 else None
+        self.next_page = {**params, 'cursor': cursor} if cursor and self.rng.random() < 0.5 else None
+
+    def product(self):
+        self.call('product', 'GET', f'/products/{self.rng.choice(self.product_ids)}', token=self.admin_token)
+
+    def search(self):
+        query = urlencode({'q': self.rng.choice(SEARCH_TERMS)})
+        self.call('search', 'GET', f'/products/search?{query}', token=self.token)
+
+    def cart_get(self):
+        self.call('cart_get', 'GET', '/cart', token=self.token, expected=(200, 404))
+
+    def cart_add(self):
+        names = self.rng.sample(self.product_names, self.rng.randint(1, 3))
+        body = {'products': [{'name': name, 'quantity': self.rng.randint(1, 2)} for name in names]}
+        status, _ = self.call('cart_add', 'POST', '/cart', body, token=self.token)
+        if status == 200:
+            self.cart.update(names)
+
+    def cart_update(self):
+        if not self.cart:
+            return self.cart_add()
+        body = {'products': [{'name': self.rng.choice(sorted(self.cart)), 'quantity': self.rng.randint(1, 4)}]}
+        self.call('cart_update', 'PUT', '/cart', body, token=self.token)
+
+    def cart_clear(self):
+        if not self.cart:
+            return self.cart_get()
+        status, _ = self.call('cart_clear', 'DELETE', '/cart/clear', token=self.token)
+        if status == 200:
+            self.cart.clear()
+
+    def checkout(self):
+        if not self.cart:
+            return self.cart_add()
+        status, _ = self.call('checkout', 'POST', '/checkout', {'way_of_buying': 'Card'}, token=self.token)
+        if status == 200:
+            self.cart.clear()
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if not hasattr(VirtualUser, name.strip()) or name.strip() == 'call':
+            raise SystemExit(f'Unknown operation in --mix: {name}')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample[0] for sample in samples)
+    queries = [sample[2] for sample in samples if sample[2] is not None]
+    return {
+        'count': len(samples),
+        'errors': sum(1 for sample in samples if sample[1]),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'throughput': round(len(samples) / elapsed, 1),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def print_report(report):
+    print(f"{'operation':<12} {'count':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>8} {'queries':>8}")
+    rows = list(report['operations'].items()) + [('all', report['total'])]
+    for name, stats in rows:
+        queries = '-' if stats['queries_per_request'] is None else f"{stats['queries_per_request']:.2f}"
+        print(f"{name:<12} {stats['count']:>7} {stats['errors']:>6} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+              f"{stats['p99_ms']:>8.2f} {stats['throughput']:>8.1f} {queries:>8}")
+
+
+def regressions(report, baseline, tolerance):
+    """Human-readable list of metrics that got worse than the baseline."""
+    found = []
+    for name, base in list(baseline['operations'].items()) + [('all', baseline['total'])]:
+        current = report['total'] if name == 'all' else report['operations'].get(name)
+        if current is None:
+            continue
+        if (current['count'] >= 20 and current['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+                and current['p95_ms'] - base['p95_ms'] >= 5):
+            found.append(f"{name}: p95 {base['p95_ms']} -> {current['p95_ms']} ms")
+        if (current['queries_per_request'] is not None and base['queries_per_request'] is not None
+                and current['queries_per_request'] >= base['queries_per_request'] + 0.5):
+            found.append(f"{name}: queries/request {base['queries_per_request']} -> {current['queries_per_request']}")
+        if current['errors'] and not base['errors']:
+            found.append(f"{name}: {current['errors']} errors (baseline had none)")
+    if report['total']['throughput'] < baseline['total']['throughput'] * (1 - tolerance):
+        found.append(f"throughput {baseline['total']['throughput']} -> {report['total']['throughput']} req/s")
+    return found
+
+
+def prepare_testclient(scale):
+    """Create and seed a throw-away database; returns the transport factory."""
+    _fd, db_path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(_fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+
+    from flask_migrate import upgrade
+    from app import create_app, seed_data
+    from services.seeding import seed_synthetic
+
+    app = create_app({'SQL_INSTRUMENTATION': True, 'SLOW_QUERY_THRESHOLD_MS': 10_000, 'RATE_LIMIT_LOGIN': ''})
+    with app.app_context():
+        upgrade()
+        seed_data(app)
+        started = time.perf_counter()
+        seeded = seed_synthetic(**scale)
+        print(f"seeded {seeded} in {time.perf_counter() - started:.1f}s")
+    return lambda: TestClientTransport(app), db_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', default='testclient', help="'testclient' or the base URL of a running server")
+    parser.add_argument('--scale', choices=SCALES, default='small', help='Dataset size (test client target).')
+    parser.add_argument('--concurrency', type=int, default=16, help='Virtual users (threads).')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run, including the ramp-up.')
+    parser.add_argument('--ramp-up', type=float, default=10, help='Seconds over which the users start.')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Operation weights.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-baseline', metavar='FILE')
+    parser.add_argument('--baseline', metavar='FILE')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed relative slowdown.')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    db_path = None
+    if args.target == 'testclient':
+        transport_factory, db_path = prepare_testclient(SCALES[args.scale])
+    else:
+        transport_factory = lambda: HttpTransport(args.target)  # noqa: E731
+
+    from services.seeding import SYNTHETIC_EMAIL, SYNTHETIC_PASSWORD
+
+    setup = transport_factory()
+    status, data, _ = setup.request('POST', '/login', {'email': ADMIN[0], 'password': ADMIN[1]})
+    if status != 200:
+        raise SystemExit(f'Admin login failed ({status}); seed the demo users with seed_data.')
+    admin_token = data['token']
+    _, data, _ = setup.request('GET', '/products?limit=200&fields=product_id,product_name', token=admin_token)
+    products = data['products'] if data else []
+    if not products:
+        raise SystemExit('No products found; seed the database with `flask seed synthetic`.')
+    product_ids = [product['product_id'] for product in products]
+    product_names = [product['product_name'] for product in products]
+
+    users = [VirtualUser(transport_factory(), SYNTHETIC_EMAIL.format(n), SYNTHETIC_PASSWORD, admin_token,
+                         product_ids, product_names, args.seed + n) for n in range(args.concurrency)]
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+    deadline = time.perf_counter() + args.duration
+
+    def run(index, user):
+        time.sleep(index * args.ramp_up / args.concurrency)
+        user.login()
+        while time.perf_counter() < deadline:
+            getattr(user, user.rng.choices(operations, weights)[0])()
+
+    threads = [threading.Thread(target=run, args=(index, user)) for index, user in enumerate(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    merged = {}
+    for user in users:
+        for name, samples in user.samples.items():
+            merged.setdefault(name, []).extend(samples)
+    report = {
+        'config': {'target': args.target, 'scale': args.scale if db_path else None, 'concurrency': args.concurrency,
+                   'duration': args.duration, 'ramp_up': args.ramp_up, 'mix': mix, 'seed': args.seed},
+        'operations': {name: summarize(merged[name], elapsed) for name in sorted(merged)},
+        'total': summarize([sample for samples in merged.values() for sample in samples], elapsed),
+    }
+    print_report(report)
+
+    if db_path:
+        os.remove(db_path)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f'baseline saved to {args.save_baseline}')
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}')
+        if found:
+            sys.exit(1)
+        print('no regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
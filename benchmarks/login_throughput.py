@@ -0,0 +1,102 @@
+"""
+Benchmark login throughput against the size of the password hashing pool.
+
+Usage:
+    python benchmarks/login_throughput.py [--threads 16] [--seconds 5] [--workers 0,1,2,4]
+
+Each run drives POST /login from `--threads` client threads through the Flask
+test client for `--seconds` seconds against a throw-away SQLite database and
+reports successful logins per second, 503 responses and the p50/p95 latency.
+PASSWORD_HASH_WORKERS=0 is the old behaviour of hashing on the request thread.
+The login rate limits are turned off, since every request logs in the same
+account from the same address.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_fd, DB_PATH = tempfile.mkstemp(suffix='.sqlite3')
+os.close(_fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+from services.passwords import password_hasher  # noqa: E402
+
+app = create_app({'RATE_LIMIT_LOGIN': '', 'RATE_LIMIT_LOGIN_ACCOUNT': ''})
+
+EMAIL = 'bench.user@example.com'
+PASSWORD = 'bench-password'
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(threads, seconds):
+    deadline = time.perf_counter() + seconds
+    latencies = []
+    rejected = [0]
+    lock = threading.Lock()
+
+    def client_loop():
+        client = app.test_client()
+        local_latencies = []
+        local_rejected = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.post('/login', json={'email': EMAIL, 'password': PASSWORD})
+            if response.status_code == 200:
+                local_latencies.append(time.perf_counter() - start)
+            elif response.status_code == 503:
+                local_rejected += 1
+            else:
+                raise RuntimeError(f'unexpected status {response.status_code}: {response.json}')
+        with lock:
+            latencies.extend(local_latencies)
+            rejected[0] += local_rejected
+
+    pool = [threading.Thread(target=client_loop) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, rejected[0], percentile(latencies, 0.5), percentile(latencies, 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', default=','.join(str(n) for n in sorted({0, 1, 2, os.cpu_count() or 1})))
+    parser.add_argument('--iterations', type=int, default=app.config['PASSWORD_HASH_ITERATIONS'])
+    args = parser.parse_args()
+
+    app.config['PASSWORD_HASH_ITERATIONS'] = args.iterations
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.post('/register', json={'name': 'Bench User', 'email': EMAIL, 'password': PASSWORD})
+
+    print(f'{"workers":>8} {"logins/s":>10} {"503s":>6} {"p50 ms":>8} {"p95 ms":>8}')
+    for workers in (int(n) for n in args.workers.split(',')):
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        throughput, rejected, p50, p95 = run(args.threads, args.seconds)
+        print(f'{workers:>8} {throughput:>10.1f} {rejected:>6} {p50 * 1000:>8.1f} {p95 * 1000:>8.1f}')
+
+    password_hasher.shutdown()
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
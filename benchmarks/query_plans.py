@@ -0,0 +1,178 @@
+"""
+Check the query plans of every route for full table scans.
+
+Usage:
+    python benchmarks/query_plans.py [--verbose]
+
+Builds a throw-away SQLite database with the Alembic migrations (so the check
+covers the migrated schema, not just the models), seeds users, a catalog and a
+cart, then calls each route through the Flask test client. Every SELECT,
+UPDATE and DELETE the route issues is captured and run again under
+`EXPLAIN QUERY PLAN`. A plain `SCAN <table>` step (no index) fails the check
+unless the scenario expects it, e.g. the export that reads the whole catalog.
+The script exits with status 1 when a route scans a table it should not.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_fd, DB_PATH = tempfile.mkstemp(suffix='.sqlite3')
+os.close(_fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from flask_migrate import upgrade  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+from app import create_app, seed_data  # noqa: E402
+from models import db  # noqa: E402
+from models.category import Category  # noqa: E402
+from models.product import Product  # noqa: E402
+
+app = create_app()
+
+ADMIN = ('Omar12.amjad@gmail.com', 'Omar123#')
+CUSTOMER = ('Ali.kareem@gmail.com', 'Ali321@')
+
+# (name, user, method, url, json body, tables the route may scan in full)
+SCENARIOS = [
+    ('register', None, 'POST', '/register',
+     {'name': 'Plan Check', 'email': 'plan.check@example.com', 'password': 'Secret123!'}, ()),
+    ('login', None, 'POST', '/login', {'email': CUSTOMER[0], 'password': CUSTOMER[1]}, ()),
+    ('profile', CUSTOMER, 'GET', '/profile', None, ()),
+    ('update profile', CUSTOMER, 'PUT', '/profile', {'name': 'Ali K.'}, ()),
+    # The unfiltered first page walks the primary key and stops after one page.
+    ('list products', ADMIN, 'GET', '/products', None, ('product',)),
+    ('list by category', ADMIN, 'GET', '/products?category_id=2', None, ()),
+    ('list by price', ADMIN, 'GET', '/products?category_id=3&sort=-price&min_price=10', None, ()),
+    ('list by name', ADMIN, 'GET', '/products?sort=name&fields=product_name,price', None, ()),
+    ('product details', ADMIN, 'GET', '/products/7', None, ()),
+    ('search', CUSTOMER, 'GET', '/products/search?q=oak%20ta', None, ()),
+    ('search in category', CUSTOMER, 'GET', '/products/search?q=chair&category_id=4', None, ()),
+    ('add product', ADMIN, 'POST', '/products',
+     {'name': 'Plan Check Lamp', 'price': 12.5, 'quantity': 3, 'category_id': 1, 'description': 'desk lamp'}, ()),
+    ('update product', ADMIN, 'PUT', '/products/8', {'price': 99.0}, ()),
+    ('delete product', ADMIN, 'DELETE', '/products/9', None, ()),
+    ('import products', ADMIN, 'POST', '/products/import',
+     '{"name": "Imported Stool", "price": 5, "quantity": 1, "category_id": 2, "description": "stool"}\n'
+     '{"product_id": 10, "price": 7.5}\n', ()),
+    # The export streams the whole catalog by design.
+    ('export products', ADMIN, 'GET', '/products/export', None, ('product',)),
+    ('add to cart', CUSTOMER, 'POST', '/cart',
+     {'products': [{'name': 'Product 11', 'quantity': 1}, {'name': 'Product 12', 'quantity': 2}]}, ()),
+    ('view cart', CUSTOMER, 'GET', '/cart', None, ()),
+    ('update cart', CUSTOMER, 'PUT', '/cart', {'products': [{'name': 'Product 12', 'quantity': 1}]}, ()),
+    ('clear cart', CUSTOMER, 'DELETE', '/cart/clear', None, ()),
+    ('refill cart', CUSTOMER, 'POST', '/cart', {'products': [{'name': 'Product 13', 'quantity': 1}]}, ()),
+    ('checkout', CUSTOMER, 'POST', '/checkout', {'way_of_buying': 'Card'}, ()),
+    ('order history', CUSTOMER, 'GET', '/orders', None, ()),
+    ('orders in range', CUSTOMER, 'GET', '/orders?from=2020-01-01&to=2100-01-01&status=Placed', None, ()),
+    ('order summary', CUSTOMER, 'GET', '/orders/summary', None, ()),
+    ('invoice history', CUSTOMER, 'GET', '/invoices?from=2020-01-01', None, ()),
+    ('revenue per day', ADMIN, 'GET', '/admin/analytics/revenue', None, ()),
+    ('revenue per category', ADMIN, 'GET', '/admin/analytics/revenue?group_by=category&from=2020-01-01', None, ()),
+    # The ranked subquery (at most `limit` rows) is read in full to join the product names.
+    ('top products', ADMIN, 'GET', '/admin/analytics/top-products?by=units', None, ('anon_1',)),
+    ('low stock', ADMIN, 'GET', '/admin/analytics/low-stock?threshold=100', None, ()),
+    ('delete profile', CUSTOMER, 'DELETE', '/profile', None, ()),
+]
+
+WORDS = 'oak pine glass steel table chair lamp shelf desk bench'.split()
+
+
+def seed():
+    upgrade()
+    seed_data(app)
+    db.session.add_all(Category(category_name=f'Category {i}') for i in range(1, 6))
+    db.session.commit()
+    db.session.execute(insert(Product), [{
+        'product_name': f'Product {i}',
+        'description': f'{WORDS[i % 10]} {WORDS[(i * 7) % 10]} {WORDS[(i * 3) % 10]}',
+        'product_quantity': 100,
+        'price': 5 + i % 50,
+        'category_id': 1 + i % 5,
+    } for i in range(1, 501)])
+    db.session.commit()
+
+
+def capture(statements):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+            if executemany:
+                parameters = parameters[0]
+            statements.append((statement, parameters))
+    return before_cursor_execute
+
+
+def full_scans(plan, allowed):
+    """Tables the plan reads without an index (virtual tables and subqueries are fine)."""
+    scans = []
+    for row in plan:
+        words = row[-1].split()
+        if words[0] != 'SCAN' or 'USING' in words or 'VIRTUAL' in words or len(words) > 2:
+            continue
+        table = words[1]
+        if table not in allowed and not table.startswith('('):
+            scans.append(table)
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verbose', action='store_true', help='print every statement with its plan')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    failures = 0
+    with app.app_context():
+        seed()
+        tokens = {}
+        for email, password in (ADMIN, CUSTOMER):
+            tokens[email] = client.post('/login', json={'email': email, 'password': password}).json['token']
+
+        engine = db.engine
+        for name, user, method, url, body, allowed in SCENARIOS:
+            statements = []
+            listener = capture(statements)
+            event.listen(engine, 'before_cursor_execute', listener)
+            headers = {'Authorization': f'Bearer {tokens[user[0]]}'} if user else {}
+            kwargs = {'data': body, 'content_type': 'application/x-ndjson'} if isinstance(body, str) else {'json': body}
+            try:
+                response = client.open(url, method=method, headers=headers, **kwargs)
+                response.get_data()
+            finally:
+                event.remove(engine, 'before_cursor_execute', listener)
+
+            problems = []
+            with engine.connect() as conn:
+                for statement, parameters in statements:
+                    plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                    scans = full_scans(plan, allowed)
+                    if scans:
+                        problems.append((statement, plan, scans))
+                    if args.verbose:
+                        print(f'    {" ".join(statement.split())}')
+                        for row in plan:
+                            print(f'        {row[-1]}')
+
+            status = 'ok' if not problems and response.status_code < 400 else 'FAIL'
+            print(f'{status:>4}  {method:<6} {url:<55} {response.status_code}  {len(statements)} statements')
+            if response.status_code >= 400:
+                print(f'        unexpected response: {response.get_data(as_text=True)[:200]}')
+                failures += 1
+            for statement, plan, scans in problems:
+                failures += 1
+                print(f'        full scan of {", ".join(scans)}: {" ".join(statement.split())}')
+                for row in plan:
+                    print(f'            {row[-1]}')
+
+    os.unlink(DB_PATH)
+    if failures:
+        print(f'{failures} problem(s) found')
+        sys.exit(1)
+    print('no unexpected full table scans')
+
+
+if __name__ == '__main__':
+    main()
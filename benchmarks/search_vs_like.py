@@ -0,0 +1,115 @@
+"""
+Benchmark FTS5 product search against naive LIKE scans.
+
+Usage:
+    python benchmarks/search_vs_like.py [--products 100000] [--queries 50]
+
+Generates a synthetic catalog in a throw-away SQLite database, then runs the
+same random one- and two-word prefix queries through services.search twice:
+once on the FTS5 index (bm25 ranking) and once on the LIKE '%word%' fallback
+used by other backends (a scan over name and description). Both paths return
+the same page, ranking and category facets. The script reports the mean and
+p95 latency of each.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_fd, DB_PATH = tempfile.mkstemp(suffix='.sqlite3')
+os.close(_fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from sqlalchemy import insert  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+from models.category import Category  # noqa: E402
+from models.product import Product  # noqa: E402
+from services import search  # noqa: E402
+
+app = create_app()
+
+WORDS = ('oak pine walnut glass steel leather linen velvet marble rattan bamboo modern rustic '
+         'classic compact folding outdoor office bedroom kitchen dining coffee side corner '
+         'table chair sofa lamp shelf desk bench stool cabinet dresser mirror rug cushion '
+         'bed wardrobe bookcase armchair ottoman sideboard console pendant floor wall').split()
+
+
+def seed(count, rng):
+    categories = [Category(category_name=f'Category {i}') for i in range(1, 11)]
+    db.session.add_all(categories)
+    db.session.commit()
+    rows = []
+    for _ in range(count):
+        rows.append({
+            'product_name': ' '.join(rng.choice(WORDS) for _ in range(3)).title(),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(12)),
+            'product_quantity': rng.randint(0, 100),
+            'price': round(rng.uniform(5, 2000), 2),
+            'category_id': rng.randint(1, 10),
+        })
+        if len(rows) == 10000:
+            db.session.execute(insert(Product), rows)
+            rows.clear()
+    if rows:
+        db.session.execute(insert(Product), rows)
+    db.session.commit()
+
+
+def like_search(query, limit):
+    """Run the search through the LIKE fallback even though the FTS5 index exists."""
+    uses_fts = search.uses_fts
+    search.uses_fts = lambda: False
+    try:
+        return search.search_products(query, limit=limit)
+    finally:
+        search.uses_fts = uses_fts
+
+
+def measure(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return sum(timings) / len(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(args.products, rng)
+        print(f'seeded {args.products} products in {time.perf_counter() - started:.1f}s')
+
+        queries = []
+        for _ in range(args.queries):
+            words = rng.sample(WORDS, rng.choice((1, 2)))
+            words[-1] = words[-1][:max(3, len(words[-1]) - 2)]  # prefix of the last word
+            queries.append(' '.join(words))
+
+        results = {
+            'fts5': measure(lambda q: search.search_products(q, limit=args.limit), queries),
+            'like': measure(lambda q: like_search(q, args.limit), queries),
+        }
+
+    print(f'{"method":>8} {"mean ms":>10} {"p95 ms":>10}')
+    for method, (mean, p95) in results.items():
+        print(f'{method:>8} {mean * 1000:>10.2f} {p95 * 1000:>10.2f}')
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of product serialization: marshmallow versus the compiled serializer.
+
+Usage:
+    python benchmarks/serialization.py [--repeat 20]
+
+Builds in-memory Product instances (no database round trips) and times the
+full response body encoding for 1, 100 and 10,000 products:
+    - marshmallow: ProductSchema(many=True).dump() + Flask's default JSON provider
+    - serializer: product_serializer.dump_many() + Flask's default JSON provider
+    - serializer+orjson: product_serializer.dump_many() + the orjson provider
+Reports the best time per call out of --repeat runs.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from app import create_app  # noqa: E402
+from models.product import Product  # noqa: E402
+from models.schemas import ProductSchema  # noqa: E402
+from models.serializers import product_serializer  # noqa: E402
+from services.json_provider import OrjsonProvider  # noqa: E402
+
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+
+def make_products(count):
+    now = datetime.utcnow()
+    return [Product(product_id=i, product_name=f'Product {i}', product_quantity=i % 100,
+                    description=f'Description of product {i}', price=Decimal(f'{i % 1000}.99'),
+                    category_id=1 + i % 10, updated_at=now) for i in range(1, count + 1)]
+
+
+def best_time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    default_json = DefaultJSONProvider(app)
+    orjson_json = OrjsonProvider(app)
+    schema = ProductSchema(many=True)
+    paths = {
+        'marshmallow': lambda products: default_json.dumps({'products': schema.dump(products)}),
+        'serializer': lambda products: default_json.dumps({'products': product_serializer.dump_many(products)}),
+        'serializer+orjson': lambda products: orjson_json.dumps({'products': product_serializer.dump_many(products)}),
+    }
+
+    with app.app_context():
+        print(f'{"products":>9}' + ''.join(f'{path + " ms":>22}' for path in paths) + f'{"speedup":>10}')
+        for count in (1, 100, 10000):
+            products = make_products(count)
+            repeat = args.repeat if count < 10000 else max(3, args.repeat // 4)
+            # Loop small payloads so the timer resolution does not dominate
+            loops = 10000 // count
+            results = [best_time(lambda: [fn(products) for _ in range(loops)], repeat) / loops
+                       for fn in paths.values()]
+            print(f'{count:>9}' + ''.join(f'{seconds * 1000:>22.4f}' for seconds in results)
+                  + f'{results[0] / results[-1]:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Compare SQLite connection profiles under concurrent reads and writes.
+
+Usage:
+    python benchmarks/sqlite_profiles.py [--readers 8] [--writers 4] [--seconds 10]
+
+Runs the same workload against a fresh database file once per profile:
+'default' (rollback journal and SQLite's default pragmas, the previous
+configuration) and 'production' (WAL, synchronous=NORMAL, busy timeout,
+mmap and a larger page cache, see services/database.py). Reader threads
+page through a category of the catalog; writer threads reserve stock and
+create an order in one transaction, like POST /cart. The script reports
+reads/s, writes/s, read latency and the number of "database is locked"
+errors for each profile.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+from models.category import Category  # noqa: E402
+from models.order import Order  # noqa: E402
+from models.product import Product  # noqa: E402
+from models.user import User  # noqa: E402
+from services.cart import InsufficientStock, adjust_stock  # noqa: E402
+
+CATEGORIES = 20
+
+
+def seed(app, products):
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(Category(category_name=f'Category {i}') for i in range(1, CATEGORIES + 1))
+        db.session.add(User(user_name='buyer', email='buyer@example.com', role='customer', password_hash='unused'))
+        db.session.commit()
+        db.session.execute(insert(Product), [{
+            'product_name': f'Product {i}',
+            'description': f'Description of product {i}',
+            'product_quantity': 1000000,
+            'price': 5 + i % 100,
+            'category_id': 1 + i % CATEGORIES,
+        } for i in range(1, products + 1)])
+        db.session.commit()
+
+
+def run(profile, args):
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path, 'SQLITE_PROFILE': profile})
+    seed(app, args.products)
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    totals = {'reads': 0, 'writes': 0, 'locked': 0, 'read_times': []}
+
+    def reader(seed_value):
+        rng = random.Random(seed_value)
+        reads, times = 0, []
+        with app.app_context():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    (Product.query.filter_by(category_id=rng.randint(1, CATEGORIES))
+                     .order_by(Product.product_id).limit(50).all())
+                    reads += 1
+                    times.append(time.perf_counter() - start)
+                except OperationalError:
+                    with lock:
+                        totals['locked'] += 1
+                finally:
+                    db.session.rollback()
+        with lock:
+            totals['reads'] += reads
+            totals['read_times'].extend(times)
+
+    def writer(seed_value):
+        rng = random.Random(seed_value)
+        writes = 0
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    order = Order(user_id=1, status='Pending')
+                    db.session.add(order)
+                    db.session.flush()
+                    adjust_stock({rng.randint(1, args.products): 1})
+                    db.session.commit()
+                    writes += 1
+                except (OperationalError, InsufficientStock):
+                    db.session.rollback()
+                    with lock:
+                        totals['locked'] += 1
+        with lock:
+            totals['writes'] += writes
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(args.writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        db.engine.dispose()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+    read_times = sorted(totals['read_times']) or [0.0]
+    return {
+        'reads/s': totals['reads'] / elapsed,
+        'writes/s': totals['writes'] / elapsed,
+        'read p50 ms': read_times[len(read_times) // 2] * 1000,
+        'read p99 ms': read_times[int(len(read_times) * 0.99) - 1] * 1000,
+        'locked': totals['locked'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--products', type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {profile: run(profile, args) for profile in ('default', 'production')}
+
+    print(f'readers={args.readers} writers={args.writers} seconds={args.seconds} products={args.products}')
+    columns = list(results['default'])
+    print(f'{"profile":>12}' + ''.join(f'{column:>14}' for column in columns))
+    for profile, result in results.items():
+        print(f'{profile:>12}' + ''.join(f'{result[column]:>14.1f}' for column in columns))
+
+
+if __name__ == '__main__':
+    main()
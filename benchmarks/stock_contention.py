@@ -0,0 +1,106 @@
+"""
+Concurrency stress test for stock reservation in POST /cart.
+
+Usage:
+    python benchmarks/stock_contention.py [--threads 32] [--stock 200] [--quantity 1]
+
+Many client threads, each logged in as a different customer, keep buying the
+same SKU until the shop runs out. At the end the script checks that nothing
+was oversold (units in carts == units taken from stock, stock never negative)
+and reports the request throughput. It exits non-zero on an oversell.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_fd, DB_PATH = tempfile.mkstemp(suffix='.sqlite3')
+os.close(_fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+from models.category import Category  # noqa: E402
+from models.order_items import OrderItems  # noqa: E402
+from models.product import Product  # noqa: E402
+from models.user import User  # noqa: E402
+
+app = create_app()
+
+
+def setup(threads, stock):
+    with app.app_context():
+        db.create_all()
+        category = Category(category_name='Stress')
+        db.session.add(category)
+        db.session.flush()
+        product = Product(product_name='Hot SKU', product_quantity=stock, description='contended product',
+                          price=10, category_id=category.category_id)
+        db.session.add(product)
+        users = [User(user_name=f'buyer{i}', email=f'buyer{i}@example.com', role='customer',
+                      password_hash='unused') for i in range(threads)]
+        db.session.add_all(users)
+        db.session.commit()
+        return product.product_id, [create_access_token(identity=user.user_id, additional_claims={'role': 'customer'})
+                                    for user in users]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--stock', type=int, default=200)
+    parser.add_argument('--quantity', type=int, default=1)
+    args = parser.parse_args()
+
+    product_id, tokens = setup(args.threads, args.stock)
+    counts = {'ok': 0, 'out_of_stock': 0, 'error': 0}
+    lock = threading.Lock()
+
+    def buyer(token):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        while True:
+            response = client.post('/cart', headers=headers,
+                                   json={'products': [{'name': 'Hot SKU', 'quantity': args.quantity}]})
+            key = 'ok' if response.status_code == 200 else 'out_of_stock' if response.status_code == 400 else 'error'
+            with lock:
+                counts[key] += 1
+            if key == 'out_of_stock':
+                return
+
+    pool = [threading.Thread(target=buyer, args=(token,)) for token in tokens]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        remaining = db.session.get(Product, product_id).product_quantity
+        in_carts = db.session.query(func.coalesce(func.sum(OrderItems.quantity), 0)).filter(
+            OrderItems.product_id == product_id).scalar()
+
+    total = sum(counts.values())
+    print(f'threads={args.threads} stock={args.stock} quantity={args.quantity}')
+    print(f'requests={total} ok={counts["ok"]} out_of_stock={counts["out_of_stock"]} errors={counts["error"]}')
+    print(f'elapsed={elapsed:.2f}s throughput={total / elapsed:.1f} req/s')
+    print(f'remaining stock={remaining} units in carts={in_carts}')
+
+    os.unlink(DB_PATH)
+    oversold = remaining < 0 or in_carts + remaining != args.stock or in_carts != counts['ok'] * args.quantity
+    if oversold:
+        print('OVERSOLD: stock accounting does not add up')
+        return 1
+    print('no oversell')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import json
+import multiprocessing
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from models import db
+from services.analytics import check_sales_rollups, rebuild_sales_rollups
+from services.cart import expire_stale_carts, reconcile_totals
+from services.jobs import Worker, enqueue, queue_stats
+from services.products import export_products, import_products, parse_csv, parse_ndjson
+from services.replica import sync_sqlite_replica
+from services.search import install_fts
+from services.seeding import seed_synthetic
+
+products_cli = AppGroup('products', help='Bulk product import/export.')
+
+
+def _format_for(path, fmt):
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+@products_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, default=None, help='Rows per transaction.')
+def import_command(path, fmt, batch_size):
+    """Upsert products from an NDJSON or CSV file."""
+    fmt = _format_for(path, fmt)
+    batch_size = batch_size or current_app.config.get('PRODUCTS_IMPORT_BATCH_SIZE', 1000)
+    with open(path, encoding='utf-8', newline='') as lines:
+        records = parse_csv(lines) if fmt == 'csv' else parse_ndjson(lines)
+        report = import_products(records, batch_size=batch_size)
+    click.echo(json.dumps(report, indent=2))
+
+
+@products_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), help='Defaults to the file extension.')
+def export_command(path, fmt):
+    """Write the whole catalog to an NDJSON or CSV file."""
+    fmt = _format_for(path, fmt)
+    batch_size = current_app.config.get('PRODUCTS_IMPORT_BATCH_SIZE', 1000)
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        for chunk in export_products(fmt, batch_size=batch_size):
+            output.write(chunk)
+    click.echo(f'Exported products to {path}.')
+
+
+@products_cli.command('reindex')
+def reindex_command():
+    """Create the SQLite FTS5 search index if missing and rebuild it from the product table."""
+    install_fts(rebuild=True)
+    click.echo('Product search index rebuilt.')
+
+
+replica_cli = AppGroup('replica', help='Read replica helpers.')
+
+
+@replica_cli.command('sync')
+def sync_command():
+    """Copy the primary SQLite database to the replica file (local replica testing)."""
+    if not current_app.config.get('DATABASE_REPLICA_URL'):
+        raise click.ClickException('DATABASE_REPLICA_URL is not set.')
+    try:
+        sync_sqlite_replica()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo('Replica synced from the primary.')
+
+
+orders_cli = AppGroup('orders', help='Order maintenance.')
+
+
+@orders_cli.command('reconcile-totals')
+@click.option('--status', 'statuses', multiple=True, default=['Pending'], show_default=True,
+              help='Order statuses to check (repeatable).')
+@click.option('--batch-size', type=int, default=500, show_default=True, help='Invoices per query.')
+@click.option('--fix', is_flag=True, help='Reset drifted totals to the sum of the order lines.')
+def reconcile_totals_command(statuses, batch_size, fix):
+    """Detect (and with --fix repair) invoice totals that differ from their order lines."""
+    report = reconcile_totals(statuses=statuses, batch_size=batch_size, fix=fix)
+    click.echo(json.dumps(report, indent=2))
+
+
+@orders_cli.command('expire-carts')
+@click.option('--ttl', type=int, default=None, help='Cart age in seconds (defaults to CART_TTL_SECONDS).')
+@click.option('--batch-size', type=int, default=None, help='Carts per transaction.')
+def expire_carts_command(ttl, batch_size):
+    """Delete stale Pending carts and return their reserved stock."""
+    ttl = ttl if ttl is not None else current_app.config['CART_TTL_SECONDS']
+    if ttl <= 0:
+        raise click.UsageError('Cart expiry is disabled (CART_TTL_SECONDS=0); pass --ttl.')
+    report = expire_stale_carts(ttl, batch_size=batch_size or current_app.config['CART_EXPIRY_BATCH_SIZE'])
+    click.echo(json.dumps(report, indent=2))
+
+
+jobs_cli = AppGroup('jobs', help='Background job queue.')
+
+
+def _work(max_jobs):
+    from app import create_app
+
+    Worker(create_app()).run(max_jobs=max_jobs)
+
+
+@jobs_cli.command('work')
+@click.option('--processes', type=int, default=1, show_default=True, help='Worker processes to run.')
+@click.option('--max-jobs', type=int, default=None, help='Exit after running this many jobs (per process).')
+def work_command(processes, max_jobs):
+    """Run background jobs until interrupted (set JOB_WORKER_THREADS=0 on the web servers)."""
+    if processes == 1:
+        Worker(current_app._get_current_object()).run(max_jobs=max_jobs)
+        return
+    workers = [multiprocessing.Process(target=_work, args=(max_jobs,)) for _ in range(processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+
+@jobs_cli.command('enqueue')
+@click.argument('name')
+@click.option('--payload', default='{}', help='JSON object passed to the handler as keyword arguments.')
+@click.option('--delay', type=float, default=0, help='Seconds to wait before running it.')
+def enqueue_command(name, payload, delay):
+    """Queue a job by name."""
+    job = enqueue(name, json.loads(payload), delay=delay)
+    db.session.commit()
+    click.echo(f'Queued job {job.job_id} ({name}).')
+
+
+@jobs_cli.command('stats')
+def stats_command():
+    """Print the number of jobs per status."""
+    click.echo(json.dumps(queue_stats(), indent=2))
+
+
+seed_cli = AppGroup('seed', help='Database seeding.')
+
+
+@seed_cli.command('synthetic')
+@click.option('--users', type=int, default=1000, show_default=True)
+@click.option('--categories', type=int, default=20, show_default=True)
+@click.option('--products', type=int, default=10000, show_default=True)
+@click.option('--orders', type=int, default=2000, show_default=True, help='Past orders to add (on every run).')
+@click.option('--items-per-order', type=int, default=3, show_default=True)
+@click.option('--seed', type=int, default=0, show_default=True, help='Random seed.')
+def seed_synthetic_command(users, categories, products, orders, items_per_order, seed):
+    """Bulk-insert a synthetic dataset for load tests (see benchmarks/loadtest.py)."""
+    report = seed_synthetic(users=users, categories=categories, products=products, orders=orders,
+                            items_per_order=items_per_order, seed=seed)
+    click.echo(json.dumps(report, indent=2))
+
+
+analytics_cli = AppGroup('analytics', help='Sales analytics rollups.')
+
+
+def _day_option(name, help):
+    return click.option(name, 'first' if name == '--from' else 'last', type=click.DateTime(['%Y-%m-%d']),
+                        default=None, help=help)
+
+
+@analytics_cli.command('backfill')
+@_day_option('--from', 'First day to rebuild (defaults to the first sale).')
+@_day_option('--to', 'Day after the last one to rebuild (defaults to the day after the last sale).')
+@click.option('--days-per-batch', type=int, default=31, show_default=True, help='Days per transaction.')
+def backfill_command(first, last, days_per_batch):
+    """Rebuild the sales rollups from the order tables."""
+    report = rebuild_sales_rollups(first and first.date(), last and last.date(), days_per_batch=days_per_batch)
+    click.echo(json.dumps(report, indent=2))
+
+
+@analytics_cli.command('check')
+@_day_option('--from', 'First day to check (defaults to the first sale).')
+@_day_option('--to', 'Day after the last one to check (defaults to the day after the last sale).')
+@click.option('--days-per-batch', type=int, default=31, show_default=True, help='Days per query.')
+@click.option('--fix', is_flag=True, help='Rebuild the drifted days.')
+def check_command(first, last, days_per_batch, fix):
+    """Compare the sales rollups with the order tables (and with --fix repair them); exits 1 on drift."""
+    report = check_sales_rollups(first and first.date(), last and last.date(), days_per_batch=days_per_batch,
+                                 fix=fix)
+    click.echo(json.dumps(report, indent=2))
+    if report['drifted'] > report['fixed']:
+        raise SystemExit(1)
+
+
+def register_commands(app):
+    app.cli.add_command(products_cli)
+    app.cli.add_command(orders_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(seed_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(replica_cli)
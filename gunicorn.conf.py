@@ -0,0 +1,60 @@
+# Gunicorn configuration for production serving: `gunicorn -c gunicorn.conf.py wsgi:app`
+# (or `... -k uvicorn.workers.UvicornWorker asgi:app` for the async read endpoints).
+# Every setting can be overridden through the environment variables below.
+# Send SIGHUP to the master process for a graceful reload (new workers are
+# started with the new code/configuration before the old ones are drained).
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Worker processes and threads per worker
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Load the application once in the master so workers fork with it already imported
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# Timeouts and keep-alive tuning
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth, staggered to avoid restarting all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Start from an empty multi-process metrics directory. This has to happen when the
+# configuration is first read, before the preloaded app creates its metric files,
+# and must not be repeated when the configuration is re-read on SIGHUP.
+_metrics_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if _metrics_dir and not os.getenv('_GUNICORN_METRICS_DIR_READY'):
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir, exist_ok=True)
+    os.environ['_GUNICORN_METRICS_DIR_READY'] = '1'
+
+
+def post_fork(server, worker):
+    """Drop DB connections inherited from the master; each worker opens its own and runs its job threads."""
+    from models import db
+    from services.jobs import start_worker_threads
+
+    # wsgi:app is the Flask app itself, asgi:app wraps it
+    app = server.app.wsgi()
+    app = getattr(app, 'flask_app', app)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    start_worker_threads(app)
+
+
+def child_exit(server, worker):
+    """Remove the live gauge samples of a worker that exited."""
+    from services.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
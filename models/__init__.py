@@ -1,7 +1,19 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from flask_migrate import Migrate
+from sqlalchemy import MetaData
+from models.routing import RoutingSession
 
-db = SQLAlchemy()
+# Deterministic constraint names so Alembic migrations can refer to (and drop) them.
+naming_convention = {
+    'ix': 'ix_%(column_0_label)s',
+    'uq': 'uq_%(table_name)s_%(column_0_name)s',
+    'ck': 'ck_%(table_name)s_%(constraint_name)s',
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+    'pk': 'pk_%(table_name)s',
+}
+
+db = SQLAlchemy(metadata=MetaData(naming_convention=naming_convention),
+                session_options={'class_': RoutingSession})
 ma = Marshmallow()
 migrate = Migrate()
@@ -3,7 +3,7 @@ from models import db
 class Category(db.Model):
     """ Represents a product category."""
     category_id = db.Column(db.Integer, primary_key=True)
-    category_name = db.Column(db.String(200), nullable=False)
+    category_name = db.Column(db.String(200), nullable=False, unique=True)
 
     product = db.relationship('Product',backref="product")
 
@@ -0,0 +1,24 @@
+from models import db
+from datetime import datetime
+
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a request sent with an Idempotency-Key header."""
+    idempotency_key_id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'))
+    request_hash = db.Column(db.String(64), nullable=False)
+    # Null while the first request is still being processed
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    # When the request holding the key started; another request may take over an expired lease
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key'),
+    )
+
+    def __repr__(self):
+        return (f"<IdempotencyKey(key='{self.key}', user_id={self.user_id}, "
+                f"status_code={self.status_code}, created_at='{self.created_at}')>")
@@ -4,12 +4,19 @@ from datetime import datetime
 class Invoice(db.Model):
     """Represents an invoice for an user-order."""
     invoice_id = db.Column(db.Integer, primary_key=True)
-    total_amount = db.Column(db.Float, nullable=False)
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False)
     invoice_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     payment_method = db.Column(db.String(50), nullable=False)
     
-    order_id = db.Column(db.Integer, db.ForeignKey('order.order_id'))
+    order_id = db.Column(db.Integer, db.ForeignKey('order.order_id'), unique=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'))
+
+    # Invoice history is paged by user and date; the index also serves lookups by user alone.
+    # Sales rollups are rebuilt and checked by date ranges (see services/analytics.py).
+    __table_args__ = (
+        db.Index('ix_invoice_user_id_invoice_date', 'user_id', 'invoice_date'),
+        db.Index('ix_invoice_invoice_date', 'invoice_date'),
+    )
     
     def __repr__(self):
         return (f"<Invoice(invoice_id={self.invoice_id}, total_amount={self.total_amount}, "
@@ -0,0 +1,39 @@
+from models import db
+from datetime import datetime
+
+
+class Job(db.Model):
+    """A unit of background work queued in the database (see services/jobs.py)."""
+    job_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    # queued -> running -> done, or back to queued for a retry, or failed after the last attempt
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # At most one queued job per unique_key (cleared when the job starts), to coalesce repeated requests
+    unique_key = db.Column(db.String(200), unique=True)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+    # Workers pick the next due job by status and run_at.
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+    def __repr__(self):
+        return (f"<Job(job_id={self.job_id}, name='{self.name}', status='{self.status}', "
+                f"attempts={self.attempts}, run_at='{self.run_at}')>")
+
+
+class JobSchedule(db.Model):
+    """Next due time of a periodic job; workers enqueue it when they win the conditional update."""
+    name = db.Column(db.String(100), primary_key=True)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<JobSchedule(name='{self.name}', next_run_at='{self.next_run_at}')>"
@@ -2,16 +2,37 @@ from models import db
 from datetime import datetime
 from .order_items import OrderItems
 
+# Order lifecycle: a Pending order is the user's cart; checkout places it.
+ORDER_TRANSITIONS = {
+    'Pending': ('Placed',),
+    'Placed': ('Paid',),
+    'Paid': ('Shipped',),
+    'Shipped': (),
+}
+# Statuses of checked-out orders (order history and sales)
+HISTORY_STATUSES = tuple(status for status in ORDER_TRANSITIONS if status != 'Pending')
+
 
 class Order(db.Model):
     """Model representing an order with attributes and relationships."""  
     order_id = db.Column(db.Integer, primary_key=True)
     status = db.Column(db.String(50), nullable=False)
     order_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Last cart change; abandoned Pending orders are expired by it (see expire_stale_carts)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     order_item = db.relationship('OrderItems',backref='order')
     invoice = db.relationship('Invoice',backref='order',uselist=False)
     user_id = db.Column(db.Integer,db.ForeignKey('user.user_id'))
+
+    # Carts are looked up by user and status, stale carts by status and age (see services/cart.py),
+    # and order history is paged by user and date (see services/orders.py).
+    __table_args__ = (
+        db.Index('ix_order_user_id_status', 'user_id', 'status'),
+        db.Index('ix_order_status_updated_at', 'status', 'updated_at'),
+        db.Index('ix_order_user_id_order_date', 'user_id', 'order_date'),
+    )
+
     def __repr__(self):
         return (f"<Order(order_id={self.order_id}, status='{self.status}', "
                 f"order_date='{self.order_date}', user_id={self.user_id})>")
@@ -5,16 +5,18 @@ class OrderItems(db.Model):
     """Represents an item in an order."""
     order_item_id = db.Column(db.Integer, primary_key=True)
     quantity = db.Column(db.Integer, nullable=False)
+    # Product price when the line was added; the invoice total is the sum of quantity * unit_price
+    unit_price = db.Column(db.Numeric(10, 2))
     
     # Add this line to establish foreign key relationship
-    product_id = db.Column(db.Integer, db.ForeignKey('product.product_id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.product_id'), nullable=False, index=True)
     
     product = db.relationship('Product', backref='order_items', uselist=False)
     
-    order_id = db.Column(db.Integer, db.ForeignKey('order.order_id'))
+    order_id = db.Column(db.Integer, db.ForeignKey('order.order_id'), index=True)
 
     def __repr__(self):
         return (f"<OrderItems(order_item_id={self.order_item_id}, "
-                f"quantity={self.quantity}, product_id={self.product_id}, "
+                f"quantity={self.quantity}, unit_price={self.unit_price}, product_id={self.product_id}, "
                 f"order_id={self.order_id})>")
 
@@ -1,15 +1,30 @@
 from models import db
+from datetime import datetime
 
 class Product(db.Model):
     """Model representing a product with attributes and relationships."""  
     product_id = db.Column(db.Integer, primary_key=True)
-    product_name = db.Column(db.String(255), nullable=False)
+    product_name = db.Column(db.String(255), nullable=False, unique=True)
     product_quantity = db.Column(db.Integer, nullable=False)
     description = db.Column(db.String(300), nullable=False)
     price = db.Column(db.Numeric(10, 2), nullable=False)
 
     category_id = db.Column(db.Integer, db.ForeignKey('category.category_id'))
 
+    # Bumped on every change; drives the ETag/Last-Modified of product responses.
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False,
+                           index=True)
+
+    # Indexes backing the keyset-paginated sort orders and filters of GET /products.
+    __table_args__ = (
+        db.Index('ix_product_category_id_product_id', 'category_id', 'product_id'),
+        db.Index('ix_product_category_id_price_product_id', 'category_id', 'price', 'product_id'),
+        db.Index('ix_product_price_product_id', 'price', 'product_id'),
+        db.Index('ix_product_product_name_product_id', 'product_name', 'product_id'),
+        # Low-stock report (see services/analytics.py)
+        db.Index('ix_product_product_quantity_product_id', 'product_quantity', 'product_id'),
+    )
+
     def __repr__(self):
         return (f"<Product(product_id={self.product_id}, product_name='{self.product_name}', "
                 f"price=${self.price}, category_id={self.category_id})>")
@@ -0,0 +1,12 @@
+from models import db
+
+
+class RateLimitCounter(db.Model):
+    """State of one rate limit counter, shared by all worker processes (see services/ratelimit.py)."""
+    key = db.Column(db.String(255), primary_key=True)
+    # JSON state of the limit's algorithm, replaced with a conditional UPDATE on every hit
+    state = db.Column(db.String(255), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<RateLimitCounter(key='{self.key}', state='{self.state}', expires_at='{self.expires_at}')>"
@@ -0,0 +1,35 @@
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+
+# Bind key of the read replica in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """
+    Session that sends plain SELECTs to the read replica when the request allows it.
+
+    A request opts in through `g.db_read_replica` (see services.replica). Flushes,
+    DML, raw SQL and SELECT ... FOR UPDATE always go to the primary, and once the
+    request has touched the primary for a write every later statement stays there
+    (`g.db_wrote`), so a request never reads older data than it just wrote.
+
+    While `info['defer_commit']` is set, `commit()` only flushes, leaving the
+    transaction open for the code that set it (see services.idempotency) to
+    commit together with its own writes.
+    """
+
+    def commit(self):
+        if self.info.get('defer_commit'):
+            self.flush()
+            return
+        super().commit()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            if self._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None:
+                g.db_wrote = True
+            elif g.get('db_read_replica') and not g.get('db_wrote') and REPLICA_BIND in self._db.engines:
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
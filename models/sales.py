@@ -0,0 +1,26 @@
+from models import db
+
+
+class DailySales(db.Model):
+    """Sales rollup per day: checked-out orders, units and revenue (see services/analytics.py)."""
+    day = db.Column(db.Date, primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return (f"<DailySales(day={self.day}, order_count={self.order_count}, units={self.units}, "
+                f"revenue={self.revenue})>")
+
+
+class ProductDailySales(db.Model):
+    """Sales rollup per day and product, with the product's category at the time of the sale."""
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return (f"<ProductDailySales(day={self.day}, product_id={self.product_id}, "
+                f"category_id={self.category_id}, units={self.units}, revenue={self.revenue})>")
@@ -0,0 +1,70 @@
+# Fast serializers for the hot read endpoints. They produce the same output as the
+# marshmallow schemas in models/schemas.py, without per-call schema introspection.
+from operator import attrgetter
+from sqlalchemy import inspect
+from sqlalchemy.types import Date, DateTime, Numeric
+from models.product import Product
+from models.user import User
+from models.schemas import ProductSchema, UserSchema
+
+
+def _decimal(value):
+    # Decimals are sent as strings so prices keep their exact scale ("19.90")
+    return str(value)
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _converter(column_type):
+    """Conversion applied to non-null values of a column type, or None to send the value as is."""
+    if isinstance(column_type, Numeric) and column_type.asdecimal:
+        return _decimal
+    if isinstance(column_type, (Date, DateTime)):
+        return _isoformat
+    return None
+
+
+class Serializer:
+    """
+    Dump model instances or result rows to dicts with getters and converters
+    computed once per field.
+
+    Works on anything exposing the fields as attributes, so it serializes both
+    ORM objects and the rows of column-only queries.
+    """
+
+    def __init__(self, model, fields):
+        columns = inspect(model).columns
+        self.model = model
+        self.fields = tuple(fields)
+        self._getters = tuple((field, attrgetter(field), _converter(columns[field].type)) for field in self.fields)
+        self._subsets = {}
+
+    def only(self, fields):
+        """Serializer for a subset of the fields (cached per field tuple)."""
+        fields = tuple(fields)
+        if fields == self.fields:
+            return self
+        subset = self._subsets.get(fields)
+        if subset is None:
+            subset = self._subsets[fields] = Serializer(self.model, fields)
+        return subset
+
+    def dump(self, obj):
+        data = {}
+        for field, getter, convert in self._getters:
+            value = getter(obj)
+            if convert is not None and value is not None:
+                value = convert(value)
+            data[field] = value
+        return data
+
+    def dump_many(self, objs):
+        dump = self.dump
+        return [dump(obj) for obj in objs]
+
+
+product_serializer = Serializer(Product, ProductSchema().fields)
+user_serializer = Serializer(User, UserSchema().fields)
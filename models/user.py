@@ -10,8 +10,9 @@ class User(db.Model):
     user_name = db.Column(db.String(120), nullable=False,index=True)
     email = db.Column(db.String(150), unique=True, nullable=False)
     role = db.Column(db.String(50), nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     address = db.relationship('Address',backref='user',uselist=False)
     invoice = db.relationship('Invoice',backref='user')
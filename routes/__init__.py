@@ -1,9 +1,15 @@
 from .user_routes import user_routes
 from .product_routes import product_routes
 from .cart_routes import cart_routes
+from .order_routes import order_routes
+from .health_routes import health_routes
+from .analytics_routes import analytics_routes
 
 def register_routes(app):
     app.register_blueprint(user_routes)
     app.register_blueprint(product_routes)
     app.register_blueprint(cart_routes)
+    app.register_blueprint(order_routes)
+    app.register_blueprint(health_routes)
+    app.register_blueprint(analytics_routes)
 
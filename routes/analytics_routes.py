@@ -0,0 +1,108 @@
+from flask import Blueprint, current_app, request, jsonify
+from routes.pagination import PaginationError, get_arg, get_date_range
+from services.analytics import day_range, low_stock, revenue_by_category, revenue_by_day, top_products
+from services.auth import admin_required
+from services.replica import read_replica
+
+# Create a Blueprint for the admin sales analytics, served from the rollup tables
+analytics_routes = Blueprint('analytics_routes', __name__)
+
+
+def _day_range():
+    """The whole days covered by the from/to query parameters (the last 30 days by default)."""
+    return day_range(*get_date_range())
+
+
+@analytics_routes.route('/admin/analytics/revenue', methods=['GET'])
+@admin_required()
+@read_replica()
+def get_revenue():
+    """
+    Get the revenue per day or per category.
+
+    Query parameters:
+        - from, to: optional ISO 8601 date range, widened to whole days (default: the last 30 days)
+        - group_by: `day` (default) or `category`
+
+    Returns:
+        JSON response with the `from`/`to` days covered and the `rows`: per
+        day the orders, units and revenue, per category the units and revenue.
+    """
+    group_by = request.args.get('group_by', 'day')
+    if group_by not in ('day', 'category'):
+        return jsonify({"message": "Invalid group_by, expected one of: day, category."}), 400
+    try:
+        first, last = _day_range()
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if group_by == 'day':
+        rows = [{'day': day.isoformat(), 'order_count': order_count, 'units': units, 'revenue': str(revenue)}
+                for day, order_count, units, revenue in revenue_by_day(first, last)]
+    else:
+        rows = [{'category_id': category_id, 'category_name': category_name, 'units': units,
+                 'revenue': str(revenue)}
+                for category_id, category_name, units, revenue in revenue_by_category(first, last)]
+    return jsonify({'from': first.isoformat(), 'to': last.isoformat(), 'rows': rows}), 200
+
+
+@analytics_routes.route('/admin/analytics/top-products', methods=['GET'])
+@admin_required()
+@read_replica()
+def get_top_products():
+    """
+    Get the best-selling products.
+
+    Query parameters:
+        - from, to: optional ISO 8601 date range, widened to whole days (default: the last 30 days)
+        - by: `revenue` (default) or `units`
+        - limit: number of products (default 10, at most 100)
+
+    Returns:
+        JSON response with the `products`: ID, name, units sold and revenue.
+    """
+    by = request.args.get('by', 'revenue')
+    if by not in ('revenue', 'units'):
+        return jsonify({"message": "Invalid by, expected one of: revenue, units."}), 400
+    try:
+        first, last = _day_range()
+        limit = get_arg('limit', int, "limit must be an integer.") or 10
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    products = [{'product_id': product_id, 'product_name': product_name, 'units': units, 'revenue': str(revenue)}
+                for product_id, product_name, units, revenue
+                in top_products(first, last, limit=max(1, min(limit, 100)), by=by)]
+    return jsonify({'from': first.isoformat(), 'to': last.isoformat(), 'products': products}), 200
+
+
+@analytics_routes.route('/admin/analytics/low-stock', methods=['GET'])
+@admin_required()
+@read_replica()
+def get_low_stock():
+    """
+    Get the products running out of stock, fewest units first.
+
+    Query parameters:
+        - threshold: highest stock reported (default LOW_STOCK_THRESHOLD)
+        - days: window of the sales pace used to estimate the days of stock left (default 30)
+        - limit: number of products (default 50, at most 200)
+
+    Returns:
+        JSON response with the `products`: stock, units sold in the window and days of stock left.
+    """
+    try:
+        threshold = get_arg('threshold', int, "threshold must be an integer.")
+        days = get_arg('days', int, "days must be an integer.")
+        limit = get_arg('limit', int, "limit must be an integer.") or 50
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+    if threshold is None:
+        threshold = current_app.config['LOW_STOCK_THRESHOLD']
+    if days is None:
+        days = 30
+    if days <= 0:
+        return jsonify({"message": "days must be a positive integer."}), 400
+
+    return jsonify({'threshold': threshold, 'days': days,
+                    'products': low_stock(threshold, days=days, limit=max(1, min(limit, 200)))}), 200
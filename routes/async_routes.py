@@ -0,0 +1,99 @@
+"""
+Async implementations of the read-heavy endpoints, served by services.asgi.
+
+Each view here replaces the sync view registered under the same Flask
+endpoint when the app runs behind the ASGI server; the WSGI server keeps
+using the sync views. Both share the argument parsing, queries and response
+building of their blueprint module, so only the database round trips
+differ: here they go through the async engine (services.async_db) and the
+event loop serves other requests while they wait.
+"""
+from functools import wraps
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from models.product import Product
+from models.serializers import product_serializer
+from models.user import User
+from routes.cart_routes import cart_response
+from routes.conditional import make_etag, not_modified
+from routes.pagination import PaginationError
+from routes.product_routes import (catalog_version_query, parse_product_list_args, product_list_query,
+                                   product_page_response, product_response)
+from routes.user_routes import profile_response
+from services.async_db import async_session
+from services.auth import known_role, remember_role, role_query
+from services.cache import product_cache
+from services.cart import cart_query
+from services.replica import use_replica
+
+# Async views keyed by the Flask endpoint they replace
+ASYNC_VIEWS = {}
+
+
+def async_view(endpoint, roles=None, replica=True):
+    """
+    Register a coroutine as the async implementation of `endpoint`.
+
+    Like the sync view's decorators it requires a valid access token, with
+    one of `roles` when given, and lets the view read from the replica. The
+    view receives an AsyncSession as its first argument.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            verify_jwt_in_request()
+            if roles:
+                user_id = get_jwt_identity()
+                role = known_role(user_id)
+                if role is None:
+                    async with async_session() as session:
+                        role = remember_role(user_id, await session.scalar(role_query(user_id)))
+                if role not in roles:
+                    return jsonify({"message": "You are not authorized to perform this action."}), 403
+            if replica:
+                use_replica()
+            async with async_session() as session:
+                return await fn(session, *args, **kwargs)
+        ASYNC_VIEWS[endpoint] = wrapper
+        return wrapper
+    return decorator
+
+
+@async_view('product_routes.get_all_products', roles=('admin',))
+async def get_all_products(session):
+    try:
+        args = parse_product_list_args()
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    product_count, catalog_updated_at = (await session.execute(catalog_version_query())).one()
+    etag = make_etag('products', product_count, catalog_updated_at, request.query_string.decode())
+    response = not_modified(etag, catalog_updated_at, 'PRODUCTS_CACHE_CONTROL')
+    if response is not None:
+        return response
+
+    rows = (await session.execute(product_list_query(args))).all()
+    return product_page_response(args, rows, etag, catalog_updated_at)
+
+
+@async_view('product_routes.get_product_by_id', roles=('admin',))
+async def get_product_by_id(session, product_id):
+    async def load_product_snapshot(product_id):
+        product = await session.get(Product, product_id)
+        if not product:
+            return None
+        return product_serializer.dump(product)
+
+    product = await product_cache.get_product_async(product_id, load_product_snapshot)
+    return product_response(product_id, product)
+
+
+@async_view('cart_routes.get_cart')
+async def get_cart(session):
+    order = (await session.execute(cart_query(get_jwt_identity()))).scalars().first()
+    return cart_response(order)
+
+
+@async_view('user_routes.profile')
+async def profile(session):
+    return profile_response(await session.get(User, get_jwt_identity()))
@@ -1,10 +1,16 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.product import Product
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import insert
 from models.order import Order
 from models.order_items import OrderItems
 from models.invoice import Invoice
 from models import db
+from services.cart import InsufficientStock, adjust_stock, find_products_by_name, load_cart
+from services.cache import product_cache
+from services.replica import read_replica
+from services.idempotency import idempotent
 
 # Create a Blueprint for cart-related routes
 cart_routes = Blueprint('cart_routes', __name__)
@@ -12,9 +18,10 @@ cart_routes = Blueprint('cart_routes', __name__)
 
 @cart_routes.route('/cart', methods=['GET'])
 @jwt_required()
+@read_replica()
 def get_cart():
     """
-    Retrieve the current user's cart details, including order items and invoice.
+    Retrieve the current user's cart (their Pending order), including order items and invoice.
 
     Returns:
         JSON response with order details including:
@@ -29,35 +36,42 @@ def get_cart():
     """
     current_user = get_jwt_identity()
 
-    # Fetch the order and its items
-    order = Order.query.filter_by(user_id=current_user).first()
-    if not order:
-        return jsonify({'message': 'No active order found for user'}), 404
+    # Fetch the order with its invoice, items and products in a fixed number of queries
+    return cart_response(load_cart(current_user))
 
-    invoice = Invoice.query.filter_by(order_id=order.order_id).first()
-    if not invoice:
-        return jsonify({'message': 'No invoice found for the order'}), 404
- 
-    # Fetch order items and product details
-    order_items = OrderItems.query.filter_by(order_id=order.order_id).all()
+
+def order_products(order):
+    """The lines of an order (with its items and products loaded) as returned by GET /cart and GET /orders."""
     products = []
-    for item in order_items:
-        product = Product.query.get(item.product_id)
+    for item in order.order_item:
+        product = item.product
         if product:
             products.append({
                 'product_id': product.product_id,
                 'name': product.product_name,
                 'quantity': item.quantity,
-                'price': str(product.price)
+                'price': str(item.unit_price if item.unit_price is not None else product.price)
             })
+    return products
+
+
+def cart_response(order):
+    """The GET /cart response for a cart loaded by `cart_query` (None when there is none)."""
+    if not order:
+        return jsonify({'message': 'No active order found for user'}), 404
+
+    invoice = order.invoice
+    if not invoice:
+        return jsonify({'message': 'No invoice found for the order'}), 404
 
+    products = order_products(order)
    
     formatted_date = invoice.invoice_date.strftime('%Y-%m-%d %H:%M:%S')
 
     # Return order and invoice details
     return jsonify({
         'order_id': order.order_id,
-        'total_amount': invoice.total_amount,
+        'total_amount': str(invoice.total_amount),
         'products': products,
         'date': formatted_date
     })
@@ -65,10 +79,14 @@ def get_cart():
     
 @cart_routes.route('/cart', methods=['POST'])
 @jwt_required()
+@idempotent()
 def add_to_cart():
     """
     Add products to the current user's cart or create a new order if none exists.
     
+    Send an `Idempotency-Key` header to make retries safe: a retry returns the
+    stored response instead of adding the items (and taking the stock) twice.
+    
     Returns:
         JSON response with a success message and order ID.
     
@@ -94,40 +112,40 @@ def add_to_cart():
 
 
     # Check if an order already exists for the user, otherwise create a new one
-    order = Order.query.filter_by(user_id=current_user, status='Pending').first()
+    order = load_cart(current_user)
     if not order:
         order = Order(user_id=current_user, status='Pending')
         db.session.add(order)
-        db.session.commit()
+        db.session.flush()
+    else:
+        # Keep an active cart from being expired as stale
+        order.updated_at = datetime.utcnow()
     
-    total_amount = 0
+    # Resolve every requested product in one query
+    products_by_name = find_products_by_name(product_info['name'] for product_info in products)
+
+    total_amount = Decimal('0')
+    new_items = []
+    reserved = {}
     
     for product_info in products:
         product_name = product_info['name']
         quantity = product_info['quantity']
         
-        product = Product.query.filter_by(product_name=product_name).first()
+        product = products_by_name.get(product_name)
         
         if not product:
+            db.session.rollback()
             return jsonify({'error': f'Product {product_name} not found'}), 404
         
-        if product.product_quantity < quantity:
-            return jsonify({'message': f'Insufficient stock for product {product_name}'}), 400
+        new_items.append({'quantity': quantity, 'unit_price': product.price, 'product_id': product.product_id,
+                          'order_id': order.order_id})
         
-        order_item = OrderItems(quantity=quantity, product_id=product.product_id, order_id=order.order_id)
-        db.session.add(order_item)
-        
-        product.product_quantity -= quantity
+        reserved[product.product_id] = reserved.get(product.product_id, 0) + quantity
         
         total_amount += product.price * quantity
 
-    try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
-    
-    invoice = Invoice.query.filter_by(order_id=order.order_id).first()
+    invoice = order.invoice
     
     if not invoice:
         invoice = Invoice(
@@ -138,16 +156,30 @@ def add_to_cart():
         )
         db.session.add(invoice)
     else:
-        invoice.total_amount = total_amount
+        # Add the new lines to the stored total in SQL instead of re-summing the whole cart
+        invoice.total_amount = Invoice.total_amount + total_amount
         invoice.payment_method = way_of_buying
 
+    order_id = order.order_id
+    names_by_id = {product.product_id: name for name, product in products_by_name.items()}
+
+    # Reserve stock, insert the lines and write the invoice in a single transaction
     try:
+        adjust_stock(reserved)
+        # Insert all new lines with a single executemany
+        if new_items:
+            db.session.execute(insert(OrderItems), new_items)
+        # Cached product snapshots carry the stock quantity that changes with the commit
+        product_cache.invalidate_on_commit(db.session, product_ids=reserved)
         db.session.commit()
-        return jsonify({'message': 'Products added to cart successfully', 'order_id': order.order_id}), 200
+    except InsufficientStock as e:
+        return jsonify({'message': f'Insufficient stock for product {names_by_id[e.product_ids[0]]}'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
     
+    return jsonify({'message': 'Products added to cart successfully', 'order_id': order_id}), 200
+    
     
 @cart_routes.route('/cart', methods=['PUT'])
 @jwt_required()
@@ -171,54 +203,64 @@ def update_cart():
     if not products:
         return jsonify({'error': 'No products provided'}), 400
     
-    order = Order.query.filter_by(user_id=current_user, status='Pending').first()
+    order = load_cart(current_user)
     if not order:
         return jsonify({'error': 'No pending order found for user'}), 404
 
-    total_amount = 0
+    products_by_name = find_products_by_name(product_info['name'] for product_info in products)
+    items_by_product = {item.product_id: item for item in order.order_item}
+
+    total_change = Decimal('0')
+    reserved = {}
+    names_by_id = {}
 
     for product_info in products:
         product_name = product_info['name']
         new_quantity = product_info['quantity']
         
-        product = Product.query.filter_by(product_name=product_name).first()
+        if not isinstance(new_quantity, int) or new_quantity <= 0:
+            return jsonify({'error': 'Invalid quantity provided'}), 400
+        
+        product = products_by_name.get(product_name)
         if not product:
             return jsonify({'error': f'Product {product_name} not found'}), 404
         
 
-        order_item = OrderItems.query.filter_by(order_id=order.order_id, product_id=product.product_id).first()
+        order_item = items_by_product.get(product.product_id)
         if not order_item:
             return jsonify({'error': f'Product {product_name} is not in the cart'}), 404
         
     
         stock_change = new_quantity - order_item.quantity
         
-        if product.product_quantity < stock_change:
-            return jsonify({'message': f'Insufficient stock for product {product_name}'}), 400
+        reserved[product.product_id] = reserved.get(product.product_id, 0) + stock_change
+        names_by_id[product.product_id] = product_name
         
+        # Lines keep the price they were added at
+        unit_price = order_item.unit_price if order_item.unit_price is not None else product.price
+        total_change += unit_price * stock_change
         
         order_item.quantity = new_quantity
-        
-        product.product_quantity -= stock_change
 
-        total_amount += product.price * new_quantity
+    invoice = order.invoice
+    if invoice and total_change:
+        invoice.total_amount = Invoice.total_amount + total_change
+    order.updated_at = datetime.utcnow()
+
+    order_id = order.order_id
 
+    # Adjust stock, item quantities and the invoice in a single transaction
     try:
+        adjust_stock(reserved)
+        product_cache.invalidate_on_commit(db.session, product_ids=reserved)
         db.session.commit()
+    except InsufficientStock as e:
+        return jsonify({'message': f'Insufficient stock for product {names_by_id[e.product_ids[0]]}'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-    invoice = Invoice.query.filter_by(order_id=order.order_id).first()
-    if invoice:
-        invoice.total_amount = total_amount
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': str(e)}), 500
-
-    return jsonify({'message': 'Cart updated successfully', 'order_id': order.order_id}), 200
+    return jsonify({'message': 'Cart updated successfully', 'order_id': order_id}), 200
 
 
 @cart_routes.route('/cart/clear', methods=['DELETE'])
@@ -237,42 +279,31 @@ def clear_cart():
     """
     current_user = get_jwt_identity()
 
-    order = Order.query.filter_by(user_id=current_user, status='Pending').first()
+    order = load_cart(current_user)
     if not order:
         return jsonify({'error': 'No pending order found for user'}), 404
 
-    order_items = OrderItems.query.filter_by(order_id=order.order_id).all()
-    total_amount = 0
+    invoice = order.invoice
+    released = {}
 
-    for item in order_items:
-        product = Product.query.get(item.product_id)
-        if not product:
+    for item in order.order_item:
+        if not item.product:
             continue
         
-        product.product_quantity += item.quantity
-        
-        total_amount += product.price * item.quantity
+        # Negative deltas put the units back on the shelf
+        released[item.product_id] = released.get(item.product_id, 0) - item.quantity
 
         db.session.delete(item)
 
-    try:
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
-
-    invoice = Invoice.query.filter_by(order_id=order.order_id).first()
     if invoice:
         db.session.delete(invoice)
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': str(e)}), 500
 
     db.session.delete(order)
     
+    # Restore stock and delete the items, invoice and order in a single transaction
     try:
+        adjust_stock(released)
+        product_cache.invalidate_on_commit(db.session, product_ids=released)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
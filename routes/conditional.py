@@ -0,0 +1,41 @@
+import hashlib
+from flask import current_app, request
+
+
+def make_etag(*parts):
+    """Build an ETag value from the parts identifying a representation's version."""
+    raw = '|'.join(str(part) for part in parts).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+def _apply_headers(response, etag, last_modified, cache_control_key):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = current_app.config.get(cache_control_key, 'private, no-cache')
+    response.vary.add('Authorization')
+    return response
+
+
+def not_modified(etag, last_modified=None, cache_control_key=None):
+    """
+    Answer a conditional GET whose validators still match.
+
+    Returns:
+        A 304 response when `If-None-Match` matches `etag` (or, without
+        `If-None-Match`, when `If-Modified-Since` is not older than
+        `last_modified`), otherwise None and the caller builds the full response.
+    """
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    else:
+        matched = (last_modified is not None and request.if_modified_since is not None
+                   and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None))
+    if not matched:
+        return None
+    return _apply_headers(current_app.response_class(status=304), etag, last_modified, cache_control_key)
+
+
+def cacheable(response, etag, last_modified=None, cache_control_key=None):
+    """Attach the ETag, Last-Modified and Cache-Control headers to a full response."""
+    return _apply_headers(response, etag, last_modified, cache_control_key)
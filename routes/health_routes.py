@@ -0,0 +1,23 @@
+from flask import Blueprint, jsonify
+from sqlalchemy import text
+from models import db
+
+# Create a Blueprint for liveness/readiness probes
+health_routes = Blueprint('health_routes', __name__)
+
+
+@health_routes.route('/healthz', methods=['GET'])
+def health():
+    """Liveness probe: the worker process is up and serving requests."""
+    return jsonify({"status": "ok"}), 200
+
+
+@health_routes.route('/readyz', methods=['GET'])
+def ready():
+    """Readiness probe: the worker can reach the database."""
+    try:
+        db.session.execute(text('SELECT 1'))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"status": "unavailable", "error": str(e)}), 503
+    return jsonify({"status": "ok"}), 200
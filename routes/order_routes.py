@@ -0,0 +1,271 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+from models.invoice import Invoice
+from models.order import HISTORY_STATUSES, Order
+from models.order_items import OrderItems
+from models import db
+from routes.cart_routes import order_products
+from routes.pagination import (PaginationError, decode_cursor, encode_cursor, get_date_range,
+                               get_page_size, keyset_after)
+from services.auth import admin_required
+from services.cart import load_cart
+from services.idempotency import idempotent
+from services.orders import InvalidTransition, history_filters, order_summary, place_order, transition
+from services.replica import read_replica
+
+# Create a Blueprint for checkout and order status routes
+order_routes = Blueprint('order_routes', __name__)
+
+
+def _order_status(order, invoice=None):
+    invoice = invoice or order.invoice
+    return {
+        'order_id': order.order_id,
+        'status': order.status,
+        'total_amount': str(invoice.total_amount) if invoice else None,
+    }
+
+
+@order_routes.route('/checkout', methods=['POST'])
+@jwt_required()
+@idempotent()
+def checkout():
+    """
+    Place the current user's cart (their Pending order) and finalize its invoice.
+
+    Send an `Idempotency-Key` header to make retries safe: a retried checkout
+    returns the stored response instead of placing the order again.
+
+    Returns:
+        JSON response with a success message, the order ID, its status and the invoice total.
+
+    HTTP Status Codes:
+        - 200 OK: If the order is placed
+        - 400 Bad Request: If the cart is empty
+        - 404 Not Found: If the user has no pending order
+        - 409 Conflict: If the order was checked out concurrently
+    """
+    current_user = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+
+    order = load_cart(current_user)
+    if not order:
+        return jsonify({'error': 'No pending order found for user'}), 404
+    if not order.order_item:
+        return jsonify({'error': 'Cart is empty'}), 400
+
+    try:
+        invoice = place_order(order, data.get('way_of_buying'))
+        db.session.commit()
+    except InvalidTransition as e:
+        return jsonify({'message': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({'message': 'Order placed successfully', **_order_status(order, invoice)}), 200
+
+
+def _change_status(order, status):
+    try:
+        transition(order, status)
+        db.session.commit()
+    except InvalidTransition as e:
+        return jsonify({'message': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'message': f'Order marked as {status}', **_order_status(order)}), 200
+
+
+@order_routes.route('/orders/<int:order_id>/pay', methods=['POST'])
+@admin_required()
+@idempotent()
+def pay_order(order_id):
+    """Mark a Placed order as Paid once its payment has been confirmed (admin only)."""
+    order = db.session.get(Order, order_id)
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
+    return _change_status(order, 'Paid')
+
+
+@order_routes.route('/orders/<int:order_id>/ship', methods=['POST'])
+@admin_required()
+@idempotent()
+def ship_order(order_id):
+    """Mark a Paid order as Shipped (admin only)."""
+    order = db.session.get(Order, order_id)
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
+    return _change_status(order, 'Shipped')
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+def _history_page_args():
+    """
+    Validate the limit, from/to and cursor parameters of a history listing.
+
+    Returns:
+        (limit, start, end, after) where `after` is the (date, id) keyset of
+        the previous page's last row, or None on the first page.
+
+    Raises:
+        PaginationError: With the message of the 400 response.
+    """
+    limit = get_page_size('HISTORY_PAGE_SIZE', 'HISTORY_MAX_PAGE_SIZE')
+    start, end = get_date_range()
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            after = (datetime.fromisoformat(values[0]), int(values[1]))
+        except (ValueError, TypeError, IndexError):
+            raise PaginationError("Invalid cursor.")
+    return limit, start, end, after
+
+
+def order_history_query(user_id, statuses, start, end, after, limit):
+    """
+    SELECT of a page of a user's orders, newest first, with their invoice, items and products.
+
+    The page walks ix_order_user_id_order_date from the keyset `after` and
+    fetches one extra row to tell whether another page follows; the items
+    and products of the whole page come from one more query.
+    """
+    query = select(Order).options(
+        joinedload(Order.invoice),
+        selectinload(Order.order_item).joinedload(OrderItems.product),
+    ).where(*history_filters(Order.order_date, user_id, statuses, start, end))
+    if after:
+        query = query.where(keyset_after((Order.order_date, Order.order_id), after, True))
+    return query.order_by(Order.order_date.desc(), Order.order_id.desc()).limit(limit + 1)
+
+
+def invoice_history_query(user_id, start, end, after, limit):
+    """SELECT of a page of a user's invoices of checked-out orders, newest first (see `order_history_query`)."""
+    query = (
+        select(Invoice)
+        .join(Order, Order.order_id == Invoice.order_id)
+        .where(Invoice.user_id == user_id,
+               *history_filters(Invoice.invoice_date, user_id, HISTORY_STATUSES, start, end))
+    )
+    if after:
+        query = query.where(keyset_after((Invoice.invoice_date, Invoice.invoice_id), after, True))
+    return query.order_by(Invoice.invoice_date.desc(), Invoice.invoice_id.desc()).limit(limit + 1)
+
+
+@order_routes.route('/orders', methods=['GET'])
+@jwt_required()
+@read_replica()
+def get_orders():
+    """
+    Get a page of the current user's checked-out orders, newest first.
+
+    Query parameters:
+        - limit: page size, capped at HISTORY_MAX_PAGE_SIZE
+        - cursor: opaque `next_cursor` value returned by the previous page
+        - from, to: optional ISO 8601 order date range (a plain `to` date includes that day)
+        - status: optional status filter (Placed, Paid or Shipped)
+
+    Returns:
+        JSON response with the `orders` of the page (status, date, total and
+        products of each) and the `next_cursor` (null on the last page).
+    """
+    status = request.args.get('status')
+    if status is not None and status not in HISTORY_STATUSES:
+        return jsonify({"message": f"Invalid status, expected one of: {', '.join(HISTORY_STATUSES)}."}), 400
+    try:
+        limit, start, end, after = _history_page_args()
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    statuses = (status,) if status else HISTORY_STATUSES
+    orders = db.session.execute(
+        order_history_query(get_jwt_identity(), statuses, start, end, after, limit)).scalars().all()
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor([orders[-1].order_date.isoformat(), orders[-1].order_id])
+
+    return jsonify({
+        "orders": [{
+            'order_id': order.order_id,
+            'status': order.status,
+            'date': _format_date(order.order_date),
+            'total_amount': str(order.invoice.total_amount) if order.invoice else None,
+            'products': order_products(order),
+        } for order in orders],
+        "next_cursor": next_cursor,
+    }), 200
+
+
+@order_routes.route('/orders/summary', methods=['GET'])
+@jwt_required()
+@read_replica()
+def get_order_summary():
+    """
+    Get the order count and total spent of the current user's checked-out orders.
+
+    Query parameters:
+        - from, to: optional ISO 8601 order date range; without them the summary covers the whole history
+
+    Returns:
+        JSON response with the `order_count`, `total_spent` and the dates of the first and last order.
+    """
+    try:
+        start, end = get_date_range()
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    summary = order_summary(get_jwt_identity(), start, end)
+    return jsonify({
+        'order_count': summary['order_count'],
+        'total_spent': str(summary['total_spent']),
+        'first_order_date': _format_date(summary['first_order_date']),
+        'last_order_date': _format_date(summary['last_order_date']),
+    }), 200
+
+
+@order_routes.route('/invoices', methods=['GET'])
+@jwt_required()
+@read_replica()
+def get_invoices():
+    """
+    Get a page of the current user's invoices for checked-out orders, newest first.
+
+    Query parameters:
+        - limit, cursor: pagination, as for GET /orders
+        - from, to: optional ISO 8601 invoice date range (a plain `to` date includes that day)
+
+    Returns:
+        JSON response with the `invoices` of the page and the `next_cursor` (null on the last page).
+    """
+    try:
+        limit, start, end, after = _history_page_args()
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    invoices = db.session.execute(
+        invoice_history_query(get_jwt_identity(), start, end, after, limit)).scalars().all()
+    next_cursor = None
+    if len(invoices) > limit:
+        invoices = invoices[:limit]
+        next_cursor = encode_cursor([invoices[-1].invoice_date.isoformat(), invoices[-1].invoice_id])
+
+    return jsonify({
+        "invoices": [{
+            'invoice_id': invoice.invoice_id,
+            'order_id': invoice.order_id,
+            'total_amount': str(invoice.total_amount),
+            'payment_method': invoice.payment_method,
+            'date': _format_date(invoice.invoice_date),
+        } for invoice in invoices],
+        "next_cursor": next_cursor,
+    }), 200
@@ -0,0 +1,100 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+
+class PaginationError(ValueError):
+    """Raised when a pagination/filter query parameter is malformed."""
+
+
+def encode_cursor(values):
+    """Encode the keyset values of the last row of a page into an opaque cursor."""
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back into its list of values."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise PaginationError("Invalid cursor.")
+    if not isinstance(values, list):
+        raise PaginationError("Invalid cursor.")
+    return values
+
+
+def keyset_after(columns, values, descending):
+    """Build the WHERE clause selecting rows strictly after `values` in the sort order."""
+    clauses = []
+    for i, column in enumerate(columns):
+        prefix = [columns[j] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*prefix, step))
+    return or_(*clauses)
+
+
+def get_page_size(default_key, max_key):
+    """Read the `limit` query parameter, bounded by the configured maximum page size."""
+    default = current_app.config.get(default_key, 50)
+    maximum = current_app.config.get(max_key, 200)
+    limit = request.args.get('limit')
+    if limit is None:
+        return min(default, maximum)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise PaginationError("limit must be an integer.")
+    if limit <= 0:
+        raise PaginationError("limit must be a positive integer.")
+    return min(limit, maximum)
+
+
+def get_arg(name, cast, message):
+    """Read an optional query parameter and convert it, raising PaginationError on bad input."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return cast(value)
+    except (ValueError, ArithmeticError):
+        raise PaginationError(message)
+
+
+def parse_bool(value):
+    """Parse the usual truthy/falsy spellings of a boolean query parameter."""
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(value)
+
+
+def _parse_datetime(value):
+    """Parse an ISO 8601 date or datetime into a naive UTC datetime."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def get_date_range(start_name='from', end_name='to'):
+    """
+    Read an optional date range from ISO 8601 dates or datetimes.
+
+    Returns:
+        (start, end) as naive UTC datetimes, either None when not given. The
+        start is inclusive and the end exclusive, except that a plain date as
+        the end covers that whole day.
+    """
+    start = get_arg(start_name, _parse_datetime, f"{start_name} must be an ISO 8601 date or datetime.")
+    end = get_arg(end_name, _parse_datetime, f"{end_name} must be an ISO 8601 date or datetime.")
+    if end is not None and len(request.args[end_name]) == 10:
+        end += timedelta(days=1)
+    if start is not None and end is not None and start >= end:
+        raise PaginationError(f"{start_name} must be before {end_name}.")
+    return start, end
@@ -1,74 +1,271 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from models.product import Product
-from models.user import User
-from models.schemas import ProductSchema
+from models.serializers import product_serializer
 from models import db
-
+from flask_jwt_extended import jwt_required
+from services.auth import admin_required
+from services.cache import product_cache
+from services.products import export_products, import_products, parse_csv, parse_ndjson, validate_product
+from services.replica import read_replica
+from services.search import search_products
+from routes.conditional import cacheable, make_etag, not_modified
+from routes.pagination import (PaginationError, decode_cursor, encode_cursor, get_arg,
+                               get_page_size, keyset_after, parse_bool)
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from decimal import Decimal
+import io
 
 # Create a Blueprint for product-related routes
 product_routes = Blueprint('product_routes', __name__)
 
+# Sort orders accepted by GET /products: the keyset columns (ending with the primary key
+# so every cursor position is unique) and whether the order is descending.
+PRODUCT_SORTS = {
+    'id': ((Product.product_id,), False),
+    'price': ((Product.price, Product.product_id), False),
+    '-price': ((Product.price, Product.product_id), True),
+    'name': ((Product.product_name, Product.product_id), False),
+}
+
+PRODUCT_FIELDS = product_serializer.fields
+
+
+def _cursor_values(columns, values):
+    """Convert decoded cursor values back to the Python types of their columns."""
+    converted = []
+    for column, value in zip(columns, values):
+        if column is Product.price:
+            value = Decimal(str(value))
+        elif column is Product.product_id:
+            value = int(value)
+        elif not isinstance(value, str):
+            raise ValueError(value)
+        converted.append(value)
+    return converted
+
+
+class ProductListArgs:
+    """Validated query parameters of GET /products (shared by the sync and async views)."""
+
+    def __init__(self, sort_columns, descending, fields, limit, category_id, min_price, max_price, in_stock,
+                 cursor):
+        self.sort_columns = sort_columns
+        self.descending = descending
+        self.fields = fields
+        self.limit = limit
+        self.category_id = category_id
+        self.min_price = min_price
+        self.max_price = max_price
+        self.in_stock = in_stock
+        self.cursor = cursor
+
+
+def parse_product_list_args():
+    """
+    Validate the GET /products query parameters.
+
+    Raises:
+        PaginationError: With the message of the 400 response.
+    """
+    sort = request.args.get('sort', 'id')
+    if sort not in PRODUCT_SORTS:
+        raise PaginationError(f"Invalid sort, expected one of: {', '.join(PRODUCT_SORTS)}.")
+    sort_columns, descending = PRODUCT_SORTS[sort]
+
+    fields = request.args.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in PRODUCT_FIELDS]
+        if unknown or not fields:
+            raise PaginationError(f"Invalid fields: {', '.join(unknown)}.")
+    else:
+        fields = list(PRODUCT_FIELDS)
+
+    limit = get_page_size('PRODUCTS_PAGE_SIZE', 'PRODUCTS_MAX_PAGE_SIZE')
+    category_id = get_arg('category_id', int, "category_id must be an integer.")
+    min_price = get_arg('min_price', Decimal, "min_price must be a number.")
+    max_price = get_arg('max_price', Decimal, "max_price must be a number.")
+    in_stock = get_arg('in_stock', parse_bool, "in_stock must be true or false.")
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor = _cursor_values(sort_columns, decode_cursor(cursor))
+        except (ValueError, ArithmeticError):
+            raise PaginationError("Invalid cursor.")
+        if len(cursor) != len(sort_columns):
+            raise PaginationError("Invalid cursor.")
+    return ProductListArgs(sort_columns, descending, fields, limit, category_id, min_price, max_price, in_stock,
+                           cursor)
+
+
+def catalog_version_query():
+    """SELECT of the product count and latest change, which version every product list page."""
+    return select(func.count(Product.product_id), func.max(Product.updated_at))
+
+
+def product_list_query(args):
+    """SELECT of one GET /products page (plus one row telling whether another page follows)."""
+    # Only load the requested columns plus the keyset columns needed to build the next cursor.
+    selected = [getattr(Product, field) for field in args.fields]
+    selected += [column for column in args.sort_columns if column.key not in args.fields]
+    query = select(*selected)
+
+    if args.category_id is not None:
+        query = query.where(Product.category_id == args.category_id)
+    if args.min_price is not None:
+        query = query.where(Product.price >= args.min_price)
+    if args.max_price is not None:
+        query = query.where(Product.price <= args.max_price)
+    if args.in_stock is not None:
+        query = query.where(Product.product_quantity > 0 if args.in_stock else Product.product_quantity <= 0)
+    if args.cursor:
+        query = query.where(keyset_after(args.sort_columns, args.cursor, args.descending))
+
+    order_by = [column.desc() if args.descending else column.asc() for column in args.sort_columns]
+    # Fetch one extra row to know whether another page follows without a COUNT query.
+    return query.order_by(*order_by).limit(args.limit + 1)
+
+
+def product_page_response(args, rows, etag, catalog_updated_at):
+    """The GET /products response for the rows of `product_list_query`."""
+    next_cursor = None
+    if len(rows) > args.limit:
+        rows = rows[:args.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in args.sort_columns])
+
+    serializer = product_serializer.only(args.fields)
+    response = jsonify({"products": serializer.dump_many(rows), "next_cursor": next_cursor})
+    return cacheable(response, etag, catalog_updated_at, 'PRODUCTS_CACHE_CONTROL'), 200
+
+
 @product_routes.route('/products',methods=['GET'])
-@jwt_required()
+@admin_required()
+@read_replica()
 def get_all_products():
-    """Get all products."""
-     
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    if user.role != 'admin':
-        return jsonify ({"message": "You are not authorized to perform this action."}),403
-    
-    products = Product.query.all()
-    product_schema = ProductSchema(many=True)
-    return jsonify(product_schema.dump(products)), 200
+    """
+    Get a page of products.
 
+    Query parameters:
+        - limit: page size, capped at PRODUCTS_MAX_PAGE_SIZE
+        - cursor: opaque `next_cursor` value returned by the previous page
+        - category_id, min_price, max_price, in_stock: optional filters
+        - sort: one of `id` (default), `price`, `-price`, `name`
+        - fields: comma separated list of product fields to return
 
-@product_routes.route('/products/<int:product_id>', methods=['GET'])
+    Returns:
+        JSON response with the `products` of the page and the `next_cursor`
+        to request the following page (null on the last page).
+    """
+    try:
+        args = parse_product_list_args()
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    # Any product change moves the catalog-wide version, so an unchanged page is answered with 304
+    product_count, catalog_updated_at = db.session.execute(catalog_version_query()).one()
+    etag = make_etag('products', product_count, catalog_updated_at, request.query_string.decode())
+    response = not_modified(etag, catalog_updated_at, 'PRODUCTS_CACHE_CONTROL')
+    if response is not None:
+        return response
+
+    rows = db.session.execute(product_list_query(args)).all()
+    return product_page_response(args, rows, etag, catalog_updated_at)
+
+
+def _load_product_snapshot(product_id):
+    """Load and serialize a product for the product cache (None if it does not exist)."""
+    product = db.session.get(Product, product_id)
+    if not product:
+        return None
+    return product_serializer.dump(product)
+
+
+@product_routes.route('/products/search', methods=['GET'])
 @jwt_required()
+@read_replica()
+def search():
+    """
+    Search products by name and description.
+
+    Query parameters:
+        - q: search words; every word must match, the last one as a prefix
+        - category_id: optional category filter
+        - limit, cursor: pagination, as for GET /products
+
+    Returns:
+        JSON response with the ranked `products`, the `facets` (match count
+        per category) and the `next_cursor` (null on the last page).
+    """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"message": "Search query 'q' is required."}), 400
+
+    try:
+        limit = get_page_size('PRODUCTS_PAGE_SIZE', 'PRODUCTS_MAX_PAGE_SIZE')
+        category_id = get_arg('category_id', int, "category_id must be an integer.")
+        cursor = request.args.get('cursor')
+        offset = 0
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+                raise PaginationError("Invalid cursor.")
+            offset = values[0]
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+
+    products, facets, has_more = search_products(q, category_id=category_id, limit=limit, offset=offset)
+    next_cursor = encode_cursor([offset + limit]) if has_more else None
+
+    return jsonify({
+        "products": product_serializer.dump_many(products),
+        "facets": {"category_id": facets},
+        "next_cursor": next_cursor,
+    }), 200
+
+
+@product_routes.route('/products/<int:product_id>', methods=['GET'])
+@admin_required()
+@read_replica()
 def get_product_by_id(product_id):
     """Get a product by its ID."""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    if user.role != 'admin':
-        return jsonify({"message": "You are not authorized to perform this action."}), 403
-    
-    # Retrieve the product by its ID
-    product = Product.query.get(product_id)
-    
+    # Retrieve the serialized product through the read-through product cache
+    product = product_cache.get_product(product_id, _load_product_snapshot)
+    return product_response(product_id, product)
+
+
+def product_response(product_id, product):
+    """The GET /products/<id> response for a product snapshot (None when not found)."""
     if not product:
         return jsonify({"message": "Product not found."}), 404
     
-    # Serialize the single product object
-    product_schema = ProductSchema()
-    return jsonify(product_schema.dump(product)), 200
+    updated_at = datetime.fromisoformat(product['updated_at'])
+    etag = make_etag('product', product_id, product['updated_at'])
+    response = not_modified(etag, updated_at, 'PRODUCTS_CACHE_CONTROL')
+    if response is not None:
+        return response
+    
+    return cacheable(jsonify(product), etag, updated_at, 'PRODUCTS_CACHE_CONTROL'), 200
+
+
+@product_routes.route('/products/cache-stats', methods=['GET'])
+@admin_required()
+def get_product_cache_stats():
+    """Get the hit/miss counts and hit ratio of this worker's product cache."""
+    return jsonify(product_cache.stats()), 200
 
 
 @product_routes.route('/products', methods=['POST'])
-@jwt_required()
+@admin_required()
 def add_product():
     """Add a new product."""
     data = request.json
     
-    if not data.get('name') or not isinstance(data.get('name'), str):
-        return jsonify({"message": "Product name must be a non-empty string."}), 400
-    
-    if not data.get('price') or not isinstance(data.get('price'), (int, float)) or data.get('price') < 0:
-        return jsonify({"message": "Invalid price"}), 400
-    
-    if not data.get('quantity') or not isinstance(data.get('quantity'), int) or data.get('quantity') < 0:
-        return jsonify({"message": "Invalid quantity"}), 400
-    
-    if not data.get('category_id') or not isinstance(data.get('category_id'), int) or data.get('category_id') < 0:
-        return jsonify({"message": "Invalid category ID"}), 400
-    
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-    
-    if current_user.role != 'admin':
-        return jsonify({"message": "You are not authorized to perform this action."}), 403
+    error = validate_product(data)
+    if error:
+        return jsonify({"message": error}), 400
     
     new_product = Product(
         product_name=data['name'],
@@ -81,43 +278,35 @@ def add_product():
     try:
         db.session.add(new_product)
         db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"message": "A product with this name already exists."}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "An error occurred while adding the product.", "error": str(e)}), 500
     
+    product_cache.invalidate(names=[data['name']])
     return jsonify({"message": "Product created successfully.", "product_id": new_product.product_id}), 201
 
     
 @product_routes.route('/products/<int:product_id>', methods=['PUT'])
-@jwt_required()
+@admin_required()
 def update_product(product_id):
     """Update an existing product by its ID."""
     data = request.json
     
     # Input Validation
-    if 'name' in data and (not isinstance(data['name'], str)):
-        return jsonify({"message": "Invalid product name."}), 400
-    
-    if 'price' in data and (not isinstance(data['price'], (int, float)) or data['price'] < 0):
-        return jsonify({"message": "Invalid price."}), 400
-    
-    if 'quantity' in data and (not isinstance(data['quantity'], int) or data['quantity'] < 0):
-        return jsonify({"message": "Invalid quantity."}), 400
-    
-    if 'category_id' in data and (not isinstance(data['category_id'], int) or data['category_id'] < 0):
-        return jsonify({"message": "Invalid category ID."}), 400
-    
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    if user.role != 'admin':
-        return jsonify({"message": "Access forbidden: Admins Only."}), 403
+    error = validate_product(data, partial=True)
+    if error:
+        return jsonify({"message": error}), 400
     
     updated_product = Product.query.filter_by(product_id=product_id).first()
     
     if not updated_product:
         return jsonify({"message": "Product not found."}), 404
     
+    old_name = updated_product.product_name
+    
     # Update the product's attributes
     if 'name' in data:
         updated_product.product_name = data['name']
@@ -136,31 +325,30 @@ def update_product(product_id):
     
     try:
         db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"message": "A product with this name already exists."}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "An error occurred while updating the product.", "error": str(e)}), 500
     
-    product_schema = ProductSchema()
-    return jsonify(product_schema.dump(updated_product)), 200
+    product_cache.invalidate(product_ids=[product_id], names={old_name, updated_product.product_name})
+    
+    return jsonify(product_serializer.dump(updated_product)), 200
 
 
 @product_routes.route('/products/<int:product_id>',methods=['DELETE'])
-@jwt_required()
+@admin_required()
 def delete_product(product_id):
     """Delete a product by its ID."""
 
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    
-    if user.role != 'admin':
-        return jsonify({"message": "Access forbidden: Admins Only."}), 403
-    
     delete_product = Product.query.get(product_id)
     
     if not delete_product:
         return jsonify({"message": "Product not found."}), 404
 
+    product_name = delete_product.product_name
+
     try:
         db.session.delete(delete_product)
         db.session.commit()
@@ -168,4 +356,45 @@ def delete_product(product_id):
         db.session.rollback()
         return jsonify({"message": "An error occurred while deleting the product.", "error": str(e)}), 500
     
+    product_cache.invalidate(product_ids=[product_id], names=[product_name])
+    
     return jsonify({"message": "Product successfully deleted."}), 200
+
+
+@product_routes.route('/products/import', methods=['POST'])
+@admin_required()
+def bulk_import_products():
+    """
+    Create or update products in bulk from an NDJSON or CSV request body.
+
+    The body is streamed and upserted in batched transactions; rows are
+    validated with the same rules as `add_product`/`update_product`. The
+    format comes from `?format=ndjson|csv` or the Content-Type
+    (`application/x-ndjson` or `text/csv`).
+
+    Returns:
+        JSON report with processed/inserted/updated counts and per-row errors.
+    """
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"message": "Invalid format, expected ndjson or csv."}), 400
+
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    records = parse_csv(lines) if fmt == 'csv' else parse_ndjson(lines)
+    report = import_products(records, batch_size=current_app.config.get('PRODUCTS_IMPORT_BATCH_SIZE', 1000))
+    return jsonify(report), 200
+
+
+@product_routes.route('/products/export', methods=['GET'])
+@admin_required()
+def bulk_export_products():
+    """Stream the whole catalog as NDJSON (default) or CSV (`?format=csv`)."""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"message": "Invalid format, expected ndjson or csv."}), 400
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    chunks = export_products(fmt, batch_size=current_app.config.get('PRODUCTS_IMPORT_BATCH_SIZE', 1000))
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=products.{fmt}'
+    return response
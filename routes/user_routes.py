@@ -1,9 +1,14 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
 from models.user import User
-from models.schemas import UserSchema
+from models.idempotency_key import IdempotencyKey
+from models.serializers import user_serializer
 from models import db
+from services.auth import principal_cache
+from routes.conditional import cacheable, make_etag, not_modified
+from services.passwords import HashingUnavailable, hash_password, needs_rehash, verify_password
+from services.ratelimit import json_field, rate_limit
+from services.replica import read_replica
 import re
 
 # Create a Blueprint for user-related routes
@@ -15,7 +20,15 @@ def is_valid_email(email):
 def is_strong_password(password):
     return len(password) >= 8
 
+@user_routes.errorhandler(HashingUnavailable)
+def hashing_unavailable(e):
+    """Shed load when the password hashing pool is saturated."""
+    response = jsonify({"message": "Server is busy, please retry shortly."})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @user_routes.route('/register', methods=['POST'])
+@rate_limit('register')
 def register():
     """ Registers a new user."""
     data = request.json
@@ -41,7 +54,7 @@ def register():
     if User.query.filter_by(email=data['email']).first():
         return jsonify({"message": "Email already exists."}), 409
 
-    hashed_password = generate_password_hash(data['password'], method='pbkdf2:sha256')
+    hashed_password = hash_password(data['password'])
 
     new_user = User(
         user_name=data['name'],
@@ -61,9 +74,14 @@ def register():
 
 
 @user_routes.route('/login', methods=['POST'])
+@rate_limit('login')
+@rate_limit('login_account', key=json_field('email'))
 def login():
     """
     Authenticates a user by checking email and password.
+
+    Attempts are rate limited per client address and per account before any
+    password is hashed, so credential stuffing cannot tie up the hashing pool.
     """
     data = request.json
     
@@ -82,27 +100,44 @@ def login():
 
     user = User.query.filter_by(email=data['email']).first()
 
-    if not user or not check_password_hash(user.password_hash, data['password']):
+    if not user or not verify_password(user.password_hash, data['password']):
         return jsonify({"message": "Invalid email or password."}), 401
+
+    # Transparently upgrade hashes made with outdated parameters
+    if needs_rehash(user.password_hash):
+        try:
+            user.password_hash = hash_password(data['password'])
+            db.session.commit()
+        except HashingUnavailable:
+            pass
+        except Exception:
+            db.session.rollback()
     
-    # Generate a JWT token
-    access_token = create_access_token(identity=user.user_id)
+    # Generate a JWT token carrying the role so authorization needs no lookup
+    access_token = create_access_token(identity=user.user_id, additional_claims={'role': user.role})
     
     return jsonify({"message": "Login successful.", "token": access_token}), 200
 
 
 @user_routes.route('/profile', methods=['GET'])
 @jwt_required()
+@read_replica()
 def profile():
     """Fetch user profile details."""
-    current_user_id = get_jwt_identity()
-    
-    user = User.query.get(current_user_id)
+    return profile_response(db.session.get(User, get_jwt_identity()))
+
+
+def profile_response(user):
+    """The GET /profile response for a user (None when the user is gone)."""
     if not user:
         return jsonify({"message": "User not found."}), 404
     
-    user_schema = UserSchema()
-    return jsonify(user_schema.dump(user)), 200
+    etag = make_etag('user', user.user_id, user.updated_at)
+    response = not_modified(etag, user.updated_at, 'PROFILE_CACHE_CONTROL')
+    if response is not None:
+        return response
+    
+    return cacheable(jsonify(user_serializer.dump(user)), etag, user.updated_at, 'PROFILE_CACHE_CONTROL'), 200
 
 
 @user_routes.route('/profile', methods=['PUT'])
@@ -134,7 +169,7 @@ def update_profile():
         if not is_strong_password(data['password']):
             return jsonify({"message": "Password must be at least 8 characters long."}), 400
         
-        hashed_password = generate_password_hash(data['password'], method='pbkdf2:sha256')
+        hashed_password = hash_password(data['password'])
         user.password_hash = hashed_password
         
     if 'role' in data:
@@ -147,9 +182,10 @@ def update_profile():
         db.session.rollback()
         return jsonify({"message": "An error occurred while updating the profile.", "error": str(e)}), 500
 
+    principal_cache.invalidate(user.user_id)
+
     # Serialize the updated user profile
-    user_schema = UserSchema()
-    return jsonify({"message": "Profile updated successfully.", "profile": user_schema.dump(user)}), 200
+    return jsonify({"message": "Profile updated successfully.", "profile": user_serializer.dump(user)}), 200
 
 
 @user_routes.route('/profile',methods=['DELETE'])
@@ -160,12 +196,14 @@ def delete_profile():
     if not user:
         return jsonify({"message": "User not found."}), 404
     try:
+        IdempotencyKey.query.filter_by(user_id=user.user_id).delete()
         db.session.delete(user)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "An error occurred while deleting the profile.", "error": str(e)}), 500
     
+    principal_cache.invalidate(current_user_id)
     return jsonify({"message": "Profile deleted successfully."}), 200
 
 
@@ -0,0 +1,66 @@
+import threading
+from flask import current_app, g, request
+from services.metrics import REQUESTS_SHED
+from services.ratelimit import check_rate_limit, client_ip, retry_later
+
+# Probes and scrapes are always answered, so an overloaded process still reports its state
+EXEMPT_BLUEPRINTS = ('health_routes',)
+EXEMPT_ENDPOINTS = ('metrics', 'static')
+
+
+class AdmissionGate:
+    """Thread-safe count of the requests in flight in this process, turning away those above a cap."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def try_enter(self, limit):
+        with self._lock:
+            if limit and self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+admission_gate = AdmissionGate()
+
+
+def _exempt():
+    return request.blueprint in EXEMPT_BLUEPRINTS or request.endpoint in EXEMPT_ENDPOINTS
+
+
+def _admit():
+    """
+    Shed the request before it runs when the process is saturated or the client is over RATE_LIMIT_DEFAULT.
+
+    Never waits for a slot: under the ASGI server this holds a thread of the
+    event loop's executor, and a quick 503 lets the client (or load balancer)
+    retry elsewhere.
+    """
+    if _exempt():
+        return None
+    config = current_app.config
+    if not admission_gate.try_enter(config.get('MAX_IN_FLIGHT_REQUESTS', 0)):
+        REQUESTS_SHED.labels('in_flight').inc()
+        return retry_later("Server is busy, please retry shortly.", 503, config.get('ADMISSION_RETRY_AFTER', 1))
+    g.admission_entered = True
+    retry_after = check_rate_limit('default', client_ip())
+    if retry_after:
+        return retry_later("Too many requests, please retry later.", 429, retry_after)
+    return None
+
+
+def _leave(exception):
+    if g.pop('admission_entered', False):
+        admission_gate.leave()
+
+
+def init_admission(app):
+    """Register the admission hooks; call after `init_metrics` so shed requests are still counted."""
+    app.before_request(_admit)
+    app.teardown_request(_leave)
@@ -0,0 +1,309 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import Date, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from models import db
+from models.category import Category
+from models.invoice import Invoice
+from models.order import HISTORY_STATUSES, Order
+from models.order_items import OrderItems
+from models.product import Product
+from models.sales import DailySales, ProductDailySales
+
+# Sales are dated by their invoice, which checkout dates at the moment the order is placed
+SALE_DAY = func.date(Invoice.invoice_date, type_=Date)
+LINE_REVENUE = OrderItems.quantity * OrderItems.unit_price
+
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE, which adds to a rollup row in a single statement
+_UPSERT_DIALECTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+
+def _add_to_rollup(model, keys, rows):
+    """
+    Add each row's `units`, `revenue` (and `order_count`) to the rollup row with its `keys`.
+
+    Rows are changed with `SET col = col + n`, so concurrent checkouts never
+    lose each other's sales. SQLite and PostgreSQL upsert every row with one
+    INSERT ... ON CONFLICT DO UPDATE; other databases update each row and
+    insert it when missing, and when two checkouts create the same row at
+    once, the one whose INSERT fails adds to the row the other created.
+    """
+    table = model.__table__
+    increments = [name for name in ('order_count', 'units', 'revenue') if name in rows[0]]
+    upsert = _UPSERT_DIALECTS.get(db.session.get_bind(model).dialect.name)
+    if upsert is not None:
+        statement = upsert(table)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=keys,
+            set_={name: table.c[name] + statement.excluded[name] for name in increments},
+        ), rows)
+        return
+    for row in rows:
+        where = [table.c[name] == row[name] for name in keys]
+        values = {name: table.c[name] + row[name] for name in increments}
+        if db.session.execute(update(table).where(*where).values(values)).rowcount:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table).values(**row))
+        except IntegrityError:
+            db.session.execute(update(table).where(*where).values(values))
+
+
+def record_sale(order_id, sold_at):
+    """
+    Add a checked-out order to the sales rollups.
+
+    Called by checkout in the transaction that places the order, so the
+    rollups commit (or roll back) together with it. The order lines are
+    aggregated per product by one query.
+    """
+    lines = db.session.execute(
+        select(OrderItems.product_id, Product.category_id, func.sum(OrderItems.quantity), func.sum(LINE_REVENUE))
+        .join(Product, Product.product_id == OrderItems.product_id)
+        .where(OrderItems.order_id == order_id)
+        .group_by(OrderItems.product_id, Product.category_id)
+    ).all()
+    if not lines:
+        return
+    day = sold_at.date()
+    _add_to_rollup(ProductDailySales, ['day', 'product_id'], [
+        {'day': day, 'product_id': product_id, 'category_id': category_id, 'units': units, 'revenue': revenue}
+        for product_id, category_id, units, revenue in lines
+    ])
+    _add_to_rollup(DailySales, ['day'], [
+        {'day': day, 'order_count': 1, 'units': sum(line[2] for line in lines),
+         'revenue': sum(line[3] for line in lines)}
+    ])
+
+
+def _sales_lines(start, end):
+    """SELECT joining checked-out orders sold on days [start, end) to their lines and products."""
+    return (
+        select()
+        .select_from(Invoice)
+        .join(Order, Order.order_id == Invoice.order_id)
+        .join(OrderItems, OrderItems.order_id == Order.order_id)
+        .join(Product, Product.product_id == OrderItems.product_id)
+        .where(Order.status.in_(HISTORY_STATUSES),
+               Invoice.invoice_date >= datetime.combine(start, datetime.min.time()),
+               Invoice.invoice_date < datetime.combine(end, datetime.min.time()))
+    )
+
+
+def _raw_product_sales(start, end):
+    return _sales_lines(start, end).add_columns(
+        SALE_DAY, OrderItems.product_id, Product.category_id,
+        func.sum(OrderItems.quantity), func.sum(LINE_REVENUE),
+    ).group_by(SALE_DAY, OrderItems.product_id, Product.category_id)
+
+
+def _raw_daily_sales(start, end):
+    return _sales_lines(start, end).add_columns(
+        SALE_DAY, func.count(func.distinct(Order.order_id)),
+        func.sum(OrderItems.quantity), func.sum(LINE_REVENUE),
+    ).group_by(SALE_DAY)
+
+
+def sales_date_range():
+    """First and last day with an invoice, or (None, None) when there are none."""
+    first, last = db.session.execute(select(func.min(Invoice.invoice_date), func.max(Invoice.invoice_date))).one()
+    if first is None:
+        return None, None
+    return first.date(), last.date()
+
+
+def _windows(start, end, days_per_batch):
+    while start < end:
+        yield start, min(start + timedelta(days=days_per_batch), end)
+        start += timedelta(days=days_per_batch)
+
+
+def _rebuild_window(start, end):
+    """Replace the rollups of days [start, end) with aggregates of the raw tables, in one transaction."""
+    # Deleting first takes the write lock, so a checkout cannot slip between the aggregate and the insert
+    db.session.execute(delete(ProductDailySales).where(ProductDailySales.day >= start, ProductDailySales.day < end))
+    db.session.execute(delete(DailySales).where(DailySales.day >= start, DailySales.day < end))
+    db.session.execute(insert(ProductDailySales).from_select(
+        ['day', 'product_id', 'category_id', 'units', 'revenue'], _raw_product_sales(start, end)))
+    db.session.execute(insert(DailySales).from_select(
+        ['day', 'order_count', 'units', 'revenue'], _raw_daily_sales(start, end)))
+    db.session.commit()
+
+
+def rebuild_sales_rollups(start=None, end=None, days_per_batch=31):
+    """
+    Rebuild the sales rollups of days [start, end) from the raw order tables.
+
+    Days are processed `days_per_batch` at a time, each batch with set-based
+    INSERT ... SELECT statements in its own transaction, so the history
+    streams through the database without being loaded into the process and
+    checkouts keep going between batches. Defaults to every day with sales.
+
+    Returns:
+        Dict with the number of `days` and `batches` and the elapsed `seconds`.
+    """
+    started = time.perf_counter()
+    if start is None or end is None:
+        first, last = sales_date_range()
+        if first is None:
+            return {'days': 0, 'batches': 0, 'seconds': 0.0}
+        start = start or first
+        end = end or last + timedelta(days=1)
+    batches = 0
+    for window_start, window_end in _windows(start, end, days_per_batch):
+        _rebuild_window(window_start, window_end)
+        batches += 1
+    return {'days': (end - start).days, 'batches': batches, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def check_sales_rollups(start=None, end=None, days_per_batch=31, fix=False):
+    """
+    Compare the sales rollups with aggregates of the raw order tables, a batch of days at a time.
+
+    With `fix`, every drifted day is rebuilt from the raw tables.
+
+    Returns:
+        Dict with the number of `checked` and `drifted` days, the days `fixed`
+        and the first differences (`day`, `product_id` or None for the day
+        total, `rollup` and `expected` as [units, revenue]).
+    """
+    report = {'checked': 0, 'drifted': 0, 'fixed': 0, 'examples': []}
+    if start is None or end is None:
+        first, last = sales_date_range()
+        if first is None:
+            return report
+        start = start or first
+        end = end or last + timedelta(days=1)
+
+    for window_start, window_end in _windows(start, end, days_per_batch):
+        expected = {(day, product_id): (units, revenue) for day, product_id, _, units, revenue
+                    in db.session.execute(_raw_product_sales(window_start, window_end))}
+        expected.update({(day, None): (units, revenue) for day, _, units, revenue
+                         in db.session.execute(_raw_daily_sales(window_start, window_end))})
+        rolled = {(row.day, row.product_id): (row.units, row.revenue) for row in db.session.execute(
+            select(ProductDailySales.day, ProductDailySales.product_id, ProductDailySales.units,
+                   ProductDailySales.revenue)
+            .where(ProductDailySales.day >= window_start, ProductDailySales.day < window_end))}
+        rolled.update({(row.day, None): (row.units, row.revenue) for row in db.session.execute(
+            select(DailySales.day, DailySales.units, DailySales.revenue)
+            .where(DailySales.day >= window_start, DailySales.day < window_end))})
+        db.session.rollback()
+
+        drifted = set()
+        for key in sorted(expected.keys() | rolled.keys(), key=lambda key: (key[0], key[1] or 0)):
+            if _normalized(rolled.get(key)) != _normalized(expected.get(key)):
+                drifted.add(key[0])
+                if len(report['examples']) < 20:
+                    report['examples'].append({'day': key[0].isoformat(), 'product_id': key[1],
+                                               'rollup': _normalized(rolled.get(key)),
+                                               'expected': _normalized(expected.get(key))})
+        report['checked'] += (window_end - window_start).days
+        report['drifted'] += len(drifted)
+        if fix:
+            for day in sorted(drifted):
+                _rebuild_window(day, day + timedelta(days=1))
+                report['fixed'] += 1
+    return report
+
+
+def _normalized(totals):
+    if totals is None:
+        return [0, '0.00']
+    units, revenue = totals
+    return [int(units or 0), f'{revenue or 0:.2f}']
+
+
+def day_range(start, end, default_days=30):
+    """
+    Whole days [first, last) covering the datetimes [start, end) of a request.
+
+    The rollups are daily, so a range starting or ending mid-day is widened
+    to the whole day. Without a start the range covers the last
+    `default_days` days up to today (UTC).
+    """
+    if end is None:
+        last = datetime.utcnow().date() + timedelta(days=1)
+    else:
+        last = end.date() if end.time() == datetime.min.time() else end.date() + timedelta(days=1)
+    first = start.date() if start else last - timedelta(days=default_days)
+    return first, last
+
+
+def revenue_by_day(first, last):
+    """Orders, units and revenue of every day with sales in [first, last)."""
+    return db.session.execute(
+        select(DailySales.day, DailySales.order_count, DailySales.units, DailySales.revenue)
+        .where(DailySales.day >= first, DailySales.day < last)
+        .order_by(DailySales.day)
+    ).all()
+
+
+def revenue_by_category(first, last):
+    """Units and revenue per category over [first, last), highest revenue first."""
+    revenue = func.sum(ProductDailySales.revenue)
+    return db.session.execute(
+        select(ProductDailySales.category_id, Category.category_name, func.sum(ProductDailySales.units),
+               revenue.label('revenue'))
+        .outerjoin(Category, Category.category_id == ProductDailySales.category_id)
+        .where(ProductDailySales.day >= first, ProductDailySales.day < last)
+        .group_by(ProductDailySales.category_id, Category.category_name)
+        .order_by(revenue.desc())
+    ).all()
+
+
+def top_products(first, last, limit=10, by='revenue'):
+    """The `limit` best-selling products over [first, last), by revenue or units."""
+    units = func.sum(ProductDailySales.units)
+    revenue = func.sum(ProductDailySales.revenue)
+    ranked = (
+        select(ProductDailySales.product_id, units.label('units'), revenue.label('revenue'))
+        .where(ProductDailySales.day >= first, ProductDailySales.day < last)
+        .group_by(ProductDailySales.product_id)
+        .order_by((units if by == 'units' else revenue).desc(), ProductDailySales.product_id)
+        .limit(limit)
+        .subquery()
+    )
+    return db.session.execute(
+        select(ranked.c.product_id, Product.product_name, ranked.c.units, ranked.c.revenue)
+        .outerjoin(Product, Product.product_id == ranked.c.product_id)
+        .order_by((ranked.c.units if by == 'units' else ranked.c.revenue).desc(), ranked.c.product_id)
+    ).all()
+
+
+def low_stock(threshold, days=30, limit=50):
+    """
+    Products with at most `threshold` units in stock, fewest first, with their recent sales.
+
+    Returns:
+        List of dicts with the product, its stock, the units sold over the
+        last `days` days and the days of stock left at that pace (None
+        without recent sales).
+    """
+    products = db.session.execute(
+        select(Product.product_id, Product.product_name, Product.product_quantity)
+        .where(Product.product_quantity <= threshold)
+        .order_by(Product.product_quantity, Product.product_id)
+        .limit(limit)
+    ).all()
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    sold = dict(db.session.execute(
+        select(ProductDailySales.product_id, func.sum(ProductDailySales.units))
+        .where(ProductDailySales.day >= since,
+               ProductDailySales.product_id.in_([product.product_id for product in products]))
+        .group_by(ProductDailySales.product_id)
+    ).all()) if products else {}
+    report = []
+    for product in products:
+        units_sold = int(sold.get(product.product_id) or 0)
+        report.append({
+            'product_id': product.product_id,
+            'product_name': product.product_name,
+            'quantity': product.product_quantity,
+            'units_sold': units_sold,
+            'days_of_stock': round(product.product_quantity * days / units_sold, 1) if units_sold else None,
+        })
+    return report
@@ -0,0 +1,260 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from flask import request, request_started
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
+from routes.async_routes import ASYNC_VIEWS
+from services.async_db import dispose_async_db, init_async_db
+from services.metrics import REQUESTS_SHED
+
+# WSGI response chunks buffered between a request thread and the event loop
+WSGI_QUEUE_SIZE = 16
+
+BUSY_BODY = b'{"message":"Server is busy, please retry shortly."}'
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ of an ASGI HTTP request whose body has been read into `body`."""
+    script_name = scope.get('root_path', '')
+    path_info = scope['path']
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path_info.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name != 'CONTENT_TYPE':
+            name = f'HTTP_{name}'
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+def _start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+
+
+def _fixed_environ(environ, start_response):
+    # Innermost "app" of the ProxyFix applied to the environ of async views, which only rewrites it
+    return environ
+
+
+def run_wsgi(app, environ, emit):
+    """
+    Run a WSGI request to completion on the calling thread.
+
+    The response is handed to `emit` as ASGI messages, then None. Every step,
+    including iterating a streamed body, stays on this thread, so thread-bound
+    state (the Flask contexts, the scoped database session) works as under a
+    WSGI server.
+    """
+    state = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and state.get('started'):
+            raise exc_info[1].with_traceback(exc_info[2])
+        state['start'] = _start_message(status, headers)
+        return write
+
+    def write(chunk):
+        if not state.get('started'):
+            emit(state['start'])
+            state['started'] = True
+        if chunk:
+            emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+    try:
+        result = app(environ, start_response)
+        try:
+            for chunk in result:
+                write(chunk)
+            write(b'')
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        emit({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        emit(None)
+
+
+class AsgiApp:
+    """
+    ASGI application serving a Flask app.
+
+    Endpoints with an async implementation in routes.async_routes run on the
+    event loop with the async database engine, so one process keeps many of
+    those requests in flight while they wait on the database. Every other
+    request runs the regular WSGI app on a pool of ASYNC_WSGI_THREADS threads;
+    when ASYNC_WSGI_MAX_PENDING of them are already running or waiting for a
+    thread, further ones get 503 instead of queueing without bound.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(max_workers=flask_app.config['ASYNC_WSGI_THREADS'],
+                                           thread_name_prefix='wsgi')
+        self.max_pending = flask_app.config.get('ASYNC_WSGI_MAX_PENDING', 0)
+        # Async views build their request context from the environ, skipping flask_app.wsgi_app, so the
+        # app's ProxyFix (PROXY_FIX_HOPS) is applied to their environ here
+        fix = flask_app.wsgi_app
+        self.proxy_fix = None
+        if isinstance(fix, ProxyFix):
+            self.proxy_fix = ProxyFix(_fixed_environ, x_for=fix.x_for, x_proto=fix.x_proto, x_host=fix.x_host,
+                                      x_port=fix.x_port, x_prefix=fix.x_prefix)
+        # Only touched on the event loop, so no lock is needed
+        self.pending = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}.")
+
+        if 'async_db' not in self.flask_app.extensions:
+            init_async_db(self.flask_app)
+
+        body = await self._read_body(receive)
+        environ = wsgi_environ(scope, body)
+        view = self._async_view(environ)
+        if view is None:
+            if self.max_pending and self.pending >= self.max_pending:
+                REQUESTS_SHED.labels('wsgi_threads').inc()
+                await self._send_busy(send)
+                return
+            self.pending += 1
+            try:
+                await self._call_wsgi(environ, send)
+            finally:
+                self.pending -= 1
+        else:
+            if self.proxy_fix is not None:
+                self.proxy_fix(environ, None)
+            await self._call_async(view, environ, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    init_async_db(self.flask_app)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await dispose_async_db(self.flask_app)
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    def _async_view(self, environ):
+        """The async implementation of the endpoint matching `environ`, None when it has none."""
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return None
+        return ASYNC_VIEWS.get(endpoint)
+
+    async def _call_async(self, view, environ, send):
+        """
+        Serve a request with an async view, going through the same hooks as Flask's dispatch.
+
+        The before_request hooks run on a thread of the loop's default
+        executor; the after_request and teardown hooks only touch memory and
+        run on the event loop.
+        """
+        app = self.flask_app
+        ctx = app.request_context(environ)
+        error = None
+        ctx.push()
+        try:
+            try:
+                request_started.send(app, _async_wrapper=app.ensure_sync)
+                # before_request hooks may block (rate limit counters in the database or Redis), so they run
+                # on a thread; to_thread copies the context, so they see this request and its `g`
+                rv = await asyncio.to_thread(app.preprocess_request)
+                if rv is None:
+                    rv = await view(**request.view_args)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        try:
+            app_iter, status, headers = response.get_wsgi_response(environ)
+            body = b''.join(app_iter)
+        finally:
+            ctx.pop(error)
+
+        await send(_start_message(status, headers))
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _send_busy(self, send):
+        retry_after = str(self.flask_app.config.get('ADMISSION_RETRY_AFTER', 1)).encode()
+        await send({'type': 'http.response.start', 'status': 503,
+                    'headers': [(b'content-type', b'application/json'), (b'retry-after', retry_after),
+                                (b'content-length', str(len(BUSY_BODY)).encode())]})
+        await send({'type': 'http.response.body', 'body': BUSY_BODY})
+
+    async def _call_wsgi(self, environ, send):
+        """Serve a request with the WSGI app on the thread pool, streaming its response back."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(WSGI_QUEUE_SIZE)
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+        future = loop.run_in_executor(self.executor, run_wsgi, self.flask_app, environ, emit)
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                await send(message)
+        finally:
+            # If sending failed, keep taking messages so the request thread is never left blocked
+            while not future.done():
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait([future, getter], return_when=asyncio.FIRST_COMPLETED)
+                getter.cancel()
+        await future
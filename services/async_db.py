@@ -0,0 +1,65 @@
+from flask import current_app, g
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from models.routing import REPLICA_BIND
+from services.database import _is_memory_sqlite, apply_sqlite_pragmas, engine_options, sqlite_pragmas
+
+# Async driver (and the package providing it) used for each backend of SQLALCHEMY_DATABASE_URI
+ASYNC_DRIVERS = {
+    'sqlite': ('sqlite+aiosqlite', 'aiosqlite'),
+    'postgresql': ('postgresql+asyncpg', 'asyncpg'),
+    'mysql': ('mysql+aiomysql', 'aiomysql'),
+}
+
+
+def async_url(uri):
+    """The URL of `uri` with the async driver of its backend."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for the {backend!r} database backend.")
+    return url.set(drivername=ASYNC_DRIVERS[backend][0])
+
+
+def _create_engine(config, uri):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_url(uri)
+    options = engine_options(config, uri)
+    # aiosqlite defaults to opening a connection (and a thread) per checkout; pool them like the sync engine
+    if url.get_backend_name() == 'sqlite' and not _is_memory_sqlite(url):
+        options['poolclass'] = AsyncAdaptedQueuePool
+    try:
+        engine = create_async_engine(url, **options)
+    except ImportError:
+        raise RuntimeError(f"Async serving requires the '{ASYNC_DRIVERS[url.get_backend_name()][1]}' package.")
+    apply_sqlite_pragmas(engine.sync_engine, sqlite_pragmas(config))
+    return engine
+
+
+def init_async_db(app):
+    """Create the async engines (primary and optional read replica) used by the async views."""
+    engines = {None: _create_engine(app.config, app.config['SQLALCHEMY_DATABASE_URI'])}
+    if app.config.get('DATABASE_REPLICA_URL'):
+        engines[REPLICA_BIND] = _create_engine(app.config, app.config['DATABASE_REPLICA_URL'])
+    app.extensions['async_db'] = engines
+
+
+def async_session():
+    """
+    New AsyncSession for the current request.
+
+    It reads from the async replica engine when the request opted in through
+    `use_replica` (same read-your-writes rules as the sync views), otherwise
+    from the primary.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    engines = current_app.extensions['async_db']
+    engine = engines.get(REPLICA_BIND) if g.get('db_read_replica') else None
+    return AsyncSession(engine or engines[None], expire_on_commit=False)
+
+
+async def dispose_async_db(app):
+    for engine in app.extensions.get('async_db', {}).values():
+        await engine.dispose()
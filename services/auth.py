@@ -0,0 +1,96 @@
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import select
+from models import db
+from models.user import User
+
+
+class PrincipalCache:
+    """Small thread-safe in-process cache of user roles with a time-to-live."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            role, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return role
+
+    def set(self, user_id, role, ttl):
+        with self._lock:
+            self._entries[user_id] = (role, time.monotonic() + ttl)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+def role_query(user_id):
+    """SELECT of a user's current role (no row if the user is gone)."""
+    return select(User.role).where(User.user_id == user_id)
+
+
+def known_role(user_id):
+    """
+    The role of the authenticated user without a query, or None when it must be loaded.
+
+    With AUTH_PRINCIPAL_CACHE_TTL > 0 the role comes from the principal cache,
+    so role changes and deleted users take effect within the TTL. Otherwise the
+    role signed into the token at login is trusted. Tokens issued without a
+    role claim always fall back to the database.
+    """
+    if current_app.config.get('AUTH_PRINCIPAL_CACHE_TTL', 0) > 0:
+        return principal_cache.get(user_id)
+    return get_jwt().get('role')
+
+
+def remember_role(user_id, role):
+    """Keep a role loaded from the database in the principal cache (when enabled)."""
+    ttl = current_app.config.get('AUTH_PRINCIPAL_CACHE_TTL', 0)
+    if ttl > 0 and role is not None:
+        principal_cache.set(user_id, role, ttl)
+    return role
+
+
+def get_current_role():
+    """Resolve the role of the authenticated user (see `known_role`), loading it on a miss."""
+    user_id = get_jwt_identity()
+    role = known_role(user_id)
+    if role is None:
+        role = remember_role(user_id, db.session.execute(role_query(user_id)).scalar())
+    return role
+
+
+def role_required(*roles):
+    """Require a valid access token whose user has one of `roles`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            verify_jwt_in_request()
+            if get_current_role() not in roles:
+                return jsonify({"message": "You are not authorized to perform this action."}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def admin_required():
+    """Require a valid access token belonging to an admin."""
+    return role_required('admin')
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from prometheus_client import Counter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger('cache')
+
+CACHE_REQUESTS = Counter(
+    'product_cache_requests_total', 'Product cache lookups.',
+    ['lookup', 'result'],
+)
+
+
+class LocalCacheBackend:
+    """In-process LRU cache with a per-entry time-to-live."""
+
+    # Calls only touch memory, so the async views make them on the event loop
+    blocking = False
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, mapping, ttl):
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCacheBackend:
+    """
+    Cache shared by all worker processes through a Redis-compatible server.
+
+    Requires the optional `redis` package. Values are stored as JSON.
+    """
+
+    # Calls wait on the network, so the async views make them on a thread
+    blocking = True
+
+    def __init__(self, url, prefix='product-cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PRODUCT_CACHE_BACKEND='redis' requires the 'redis' package.")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget([self.prefix + key for key in keys])
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, mapping, ttl):
+        pipeline = self.client.pipeline()
+        for key, value in mapping.items():
+            pipeline.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+        pipeline.execute()
+
+    def delete_many(self, keys):
+        keys = [self.prefix + key for key in keys]
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ProductCache:
+    """
+    Read-through cache of product rows keyed by product_id and product_name.
+
+    Entries are JSON-friendly snapshots, never ORM instances, and only serve
+    reads that may be briefly stale (catalog details, name to ID resolution).
+    Anything that checks or changes stock must re-read the product row.
+    """
+
+    # Session.info key of the entries to drop when the session commits
+    PENDING_KEY = 'product_cache_invalidate'
+
+    def __init__(self, app=None):
+        self.hits = 0
+        self.misses = 0
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_soft_rollback', self._after_soft_rollback)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('PRODUCT_CACHE_BACKEND', 'local')
+        if backend == 'redis':
+            cache = RedisCacheBackend(app.config['PRODUCT_CACHE_REDIS_URL'])
+        elif backend == 'local':
+            cache = LocalCacheBackend(app.config.get('PRODUCT_CACHE_MAXSIZE', 10000))
+        else:
+            raise ValueError(f"Unknown PRODUCT_CACHE_BACKEND {backend!r}.")
+        app.extensions['product_cache'] = cache
+
+    @property
+    def backend(self):
+        return current_app.extensions['product_cache']
+
+    @property
+    def ttl(self):
+        return current_app.config.get('PRODUCT_CACHE_TTL', 60)
+
+    def _count(self, lookup, hits, misses):
+        self.hits += hits
+        self.misses += misses
+        if hits:
+            CACHE_REQUESTS.labels(lookup, 'hit').inc(hits)
+        if misses:
+            CACHE_REQUESTS.labels(lookup, 'miss').inc(misses)
+
+    def get_product(self, product_id, loader):
+        """
+        Return the snapshot of a product, calling `loader(product_id)` on a miss.
+
+        `loader` returns the snapshot dict or None when the product does not exist.
+        """
+        key = f'id:{product_id}'
+        found = self.backend.get_many([key])
+        if key in found:
+            self._count('id', 1, 0)
+            return found[key]
+        self._count('id', 0, 1)
+        snapshot = loader(product_id)
+        if snapshot is not None:
+            self.backend.set_many({key: snapshot}, self.ttl)
+        return snapshot
+
+    async def get_product_async(self, product_id, loader):
+        """`get_product` for the async views: `loader` is a coroutine function."""
+        backend = self.backend
+
+        async def call(method, *args):
+            return await asyncio.to_thread(method, *args) if backend.blocking else method(*args)
+
+        key = f'id:{product_id}'
+        found = await call(backend.get_many, [key])
+        if key in found:
+            self._count('id', 1, 0)
+            return found[key]
+        self._count('id', 0, 1)
+        snapshot = await loader(product_id)
+        if snapshot is not None:
+            await call(backend.set_many, {key: snapshot}, self.ttl)
+        return snapshot
+
+    def resolve_names(self, names, loader):
+        """
+        Map product names to product IDs, calling `loader(missing_names)` once for the misses.
+
+        `loader` returns a dict of name to product_id for the names that exist.
+        """
+        keys = {f'name:{name}': name for name in names}
+        found = self.backend.get_many(keys)
+        ids = {keys[key]: product_id for key, product_id in found.items()}
+        missing = [name for key, name in keys.items() if key not in found]
+        self._count('name', len(ids), len(missing))
+        if missing:
+            loaded = loader(missing)
+            if loaded:
+                self.backend.set_many({f'name:{name}': product_id for name, product_id in loaded.items()},
+                                      self.ttl)
+            ids.update(loaded)
+        return ids
+
+    @staticmethod
+    def _keys(product_ids, names):
+        return [f'id:{product_id}' for product_id in product_ids] + [f'name:{name}' for name in names]
+
+    def invalidate(self, product_ids=(), names=()):
+        """Drop the cached entries of the given products (by ID and/or by name)."""
+        keys = self._keys(product_ids, names)
+        if keys:
+            self.backend.delete_many(keys)
+
+    def invalidate_on_commit(self, session, product_ids=(), names=()):
+        """
+        Drop the cached entries of the given products once `session` commits.
+
+        For writes still in an open transaction, which the caller may not
+        commit itself (under `idempotent` the view's commit only flushes):
+        dropped any earlier, the entries could be cached again from the old
+        rows before the new ones are visible. Call it before the commit.
+        """
+        session.info.setdefault(self.PENDING_KEY, set()).update(self._keys(product_ids, names))
+
+    def _after_commit(self, session):
+        keys = session.info.pop(self.PENDING_KEY, None)
+        if not keys:
+            return
+        # The writes are committed: a failure here must not fail the request, the entries expire anyway
+        try:
+            self.backend.delete_many(keys)
+        except Exception:
+            logger.warning('product cache invalidation failed, entries expire after PRODUCT_CACHE_TTL',
+                           exc_info=True)
+
+    def _after_soft_rollback(self, session, previous_transaction):
+        # Nothing was written; a rolled back SAVEPOINT leaves the outer transaction's entries pending
+        if previous_transaction.parent is None:
+            session.info.pop(self.PENDING_KEY, None)
+
+    def stats(self):
+        """Hit/miss counts of this process and the resulting hit ratio."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+        }
+
+
+product_cache = ProductCache()
@@ -0,0 +1,281 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import joinedload, selectinload
+from models import db
+from models.invoice import Invoice
+from models.order import Order
+from models.order_items import OrderItems
+from models.product import Product
+from services.cache import product_cache
+from services.jobs import job
+
+logger = logging.getLogger('jobs')
+
+
+class InsufficientStock(Exception):
+    """Raised when a stock reservation cannot be satisfied; carries the short product IDs."""
+
+    def __init__(self, product_ids):
+        super().__init__(product_ids)
+        self.product_ids = product_ids
+
+
+def load_cart(user_id, status='Pending'):
+    """
+    Load a user's order together with its invoice, items and their products.
+
+    The order and its invoice come back in one joined query and all items with
+    their products in a single `IN (...)` query, so the number of round trips
+    does not depend on how many lines the cart holds.
+
+    Args:
+        user_id: ID of the user owning the order.
+        status: Order status to match, or None to take the user's first order.
+
+    Returns:
+        The Order instance or None when the user has no matching order.
+    """
+    return db.session.execute(cart_query(user_id, status)).scalars().first()
+
+
+def cart_query(user_id, status='Pending'):
+    """The SELECT behind `load_cart`, also run by the async cart view."""
+    query = select(Order).options(
+        joinedload(Order.invoice),
+        selectinload(Order.order_item).joinedload(OrderItems.product),
+    ).where(Order.user_id == user_id)
+    if status is not None:
+        query = query.where(Order.status == status)
+    return query.limit(1)
+
+
+def _lowest_product_ids(names):
+    """Map each existing name to the lowest product_id carrying it, in one grouped query."""
+    rows = (db.session.query(Product.product_name, func.min(Product.product_id))
+            .filter(Product.product_name.in_(names))
+            .group_by(Product.product_name)
+            .all())
+    return dict(rows)
+
+
+def find_products_by_name(names):
+    """
+    Look up several products by name in a single query.
+
+    Names are resolved to product IDs through the product cache and the rows
+    themselves are then read by primary key, so stock and price always come
+    from the database.
+
+    Returns:
+        Dict mapping each found product name to its Product; when several rows
+        share a name the one with the lowest product_id wins.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    ids = product_cache.resolve_names(names, _lowest_product_ids)
+    products = Product.query.filter(Product.product_id.in_(set(ids.values()))).all() if ids else []
+    by_id = {product.product_id: product for product in products}
+
+    found = {}
+    for name, product_id in ids.items():
+        product = by_id.get(product_id)
+        if product is not None and product.product_name == name:
+            found[name] = product
+
+    # A stale cache entry (renamed or deleted product) falls back to the database.
+    stale = [name for name in ids if name not in found]
+    if stale:
+        product_cache.invalidate(names=stale)
+        fresh = _lowest_product_ids(stale)
+        if fresh:
+            for product in Product.query.filter(Product.product_id.in_(fresh.values())).all():
+                found[product.product_name] = product
+    return found
+
+
+def adjust_stock(deltas):
+    """
+    Atomically take stock for several products with one conditional UPDATE.
+
+    Each product's quantity is decreased by its delta (a negative delta puts
+    units back) only if enough stock is left, i.e.
+    `UPDATE product SET product_quantity = product_quantity - n WHERE product_quantity >= n`,
+    so concurrent reservations can never oversell whatever the backend. The
+    statement joins the caller's transaction; nothing is committed here.
+
+    Args:
+        deltas: Dict mapping product_id to the number of units to take.
+
+    Raises:
+        InsufficientStock: If any product lacks stock. The session has been
+            rolled back so no partial reservation survives.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    change = case(deltas, value=Product.product_id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.product_id.in_(deltas), Product.product_quantity >= change)
+        .values(product_quantity=Product.product_quantity - change)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == len(deltas):
+        return
+
+    db.session.rollback()
+    rows = (db.session.query(Product.product_id, Product.product_quantity)
+            .filter(Product.product_id.in_(deltas))
+            .all())
+    stock = dict(rows)
+    short = [product_id for product_id, delta in deltas.items() if stock.get(product_id, 0) < delta]
+    raise InsufficientStock(short or list(deltas))
+
+
+def order_total_expression(order_id):
+    """SQL expression summing quantity * unit_price over the lines of an order (0 without lines)."""
+    return (select(func.coalesce(func.sum(OrderItems.quantity * OrderItems.unit_price), 0))
+            .where(OrderItems.order_id == order_id)
+            .scalar_subquery())
+
+
+def order_total(order_id):
+    """Recompute an order's total from its lines with one aggregate query."""
+    return Decimal(db.session.execute(select(order_total_expression(order_id))).scalar()).quantize(Decimal('0.01'))
+
+
+def reconcile_totals(statuses=('Pending',), batch_size=500, fix=False):
+    """
+    Compare stored invoice totals with the sum of their order lines, in batches.
+
+    Invoices are scanned in primary key order, `batch_size` at a time, each
+    batch with one query that computes the line totals next to the stored
+    totals. With `fix`, drifted invoices are reset to the aggregate inside the
+    UPDATE itself, so a concurrent cart change is never overwritten with an
+    older total.
+
+    Returns:
+        Dict with the number of `checked`, `drifted` and `fixed` invoices and
+        the first drifted ones (`invoice_id`, `order_id`, `stored`, `expected`).
+    """
+    report = {'checked': 0, 'drifted': 0, 'fixed': 0, 'examples': []}
+    expected = order_total_expression(Invoice.order_id)
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Invoice.invoice_id, Invoice.order_id, Invoice.total_amount, expected)
+            .join(Order, Order.order_id == Invoice.order_id)
+            .where(Order.status.in_(statuses), Invoice.invoice_id > last_id)
+            .order_by(Invoice.invoice_id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].invoice_id
+        report['checked'] += len(rows)
+
+        drifted = []
+        for invoice_id, order_id, stored, total in rows:
+            total = Decimal(total).quantize(Decimal('0.01'))
+            if stored is None or Decimal(stored).quantize(Decimal('0.01')) != total:
+                drifted.append(invoice_id)
+                if len(report['examples']) < 20:
+                    report['examples'].append({'invoice_id': invoice_id, 'order_id': order_id,
+                                               'stored': str(stored), 'expected': str(total)})
+        report['drifted'] += len(drifted)
+
+        if fix and drifted:
+            result = db.session.execute(
+                update(Invoice)
+                .where(Invoice.invoice_id.in_(drifted))
+                .values(total_amount=expected)
+                .execution_options(synchronize_session=False)
+            )
+            report['fixed'] += result.rowcount
+        db.session.commit()
+    return report
+
+
+@job('reconcile_cart_totals', every=3600)
+def reconcile_cart_totals():
+    """Hourly job: reset drifted cart totals to the sum of their lines."""
+    report = reconcile_totals(fix=True)
+    if report['drifted']:
+        logger.warning('reconciled %s drifted cart totals', report['fixed'])
+
+
+def expire_stale_carts(ttl_seconds, batch_size=500):
+    """
+    Delete Pending orders untouched for `ttl_seconds` and put their reserved stock back.
+
+    Carts are processed `batch_size` at a time, one transaction per batch:
+    the batch is first claimed with a conditional UPDATE that re-checks status
+    and age (a cart changed in the meantime is skipped), the stock is returned
+    with one `UPDATE product ... FROM (SELECT product_id, SUM(quantity) ...)`
+    and the items, invoices and orders are deleted with one statement each.
+
+    Returns:
+        Dict with the number of expired `orders`, deleted `items`, released
+        `units`, the elapsed `seconds` and the deleted `rows_per_second`.
+    """
+    report = {'orders': 0, 'items': 0, 'units': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl_seconds)
+    stale = (Order.status == 'Pending') & (Order.updated_at < cutoff)
+    started = time.perf_counter()
+    rows = 0
+    while True:
+        order_ids = db.session.execute(
+            select(Order.order_id).where(stale).order_by(Order.updated_at).limit(batch_size)
+        ).scalars().all()
+        if not order_ids:
+            break
+        # Move the batch out of Pending first so concurrent cart changes and checkouts cannot touch it
+        db.session.execute(
+            update(Order)
+            .where(Order.order_id.in_(order_ids), stale)
+            .values(status='Expired')
+            .execution_options(synchronize_session=False)
+        )
+        claimed = select(Order.order_id).where(Order.order_id.in_(order_ids), Order.status == 'Expired')
+
+        released = (select(OrderItems.product_id, func.sum(OrderItems.quantity).label('quantity'))
+                    .where(OrderItems.order_id.in_(claimed))
+                    .group_by(OrderItems.product_id)
+                    .subquery())
+        units = dict(db.session.execute(select(released.c.product_id, released.c.quantity)).all())
+        db.session.execute(
+            update(Product)
+            .where(Product.product_id == released.c.product_id)
+            .values(product_quantity=Product.product_quantity + released.c.quantity)
+            .execution_options(synchronize_session=False)
+        )
+
+        items = db.session.execute(delete(OrderItems).where(OrderItems.order_id.in_(claimed))).rowcount
+        invoices = db.session.execute(delete(Invoice).where(Invoice.order_id.in_(claimed))).rowcount
+        orders = db.session.execute(delete(Order).where(Order.order_id.in_(claimed))).rowcount
+        db.session.commit()
+        product_cache.invalidate(product_ids=units)
+
+        report['orders'] += orders
+        report['items'] += items
+        report['units'] += sum(units.values())
+        rows += items + invoices + orders
+
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['rows_per_second'] = round(rows / report['seconds'], 1) if report['seconds'] else 0.0
+    return report
+
+
+@job('expire_stale_carts', every=900)
+def expire_stale_carts_job():
+    """Every 15 minutes: expire carts older than CART_TTL_SECONDS (0 disables it)."""
+    ttl = current_app.config['CART_TTL_SECONDS']
+    if ttl:
+        report = expire_stale_carts(ttl, batch_size=current_app.config['CART_EXPIRY_BATCH_SIZE'])
+        if report['orders']:
+            logger.info('expired %s stale carts (%s rows/s)', report['orders'], report['rows_per_second'])
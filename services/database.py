@@ -0,0 +1,96 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from models.routing import REPLICA_BIND
+
+# journal_mode and synchronous values accepted by SQLITE_JOURNAL_MODE / SQLITE_SYNCHRONOUS
+SQLITE_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SQLITE_SYNCHRONOUS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def _is_memory_sqlite(url):
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+
+def engine_options(config, uri=None):
+    """
+    Engine options (pool strategy) for `uri`, by default the configured database URI.
+
+    File-backed SQLite gets a thread-safe queue pool sized for the request
+    threads; in-memory SQLite keeps SQLAlchemy's default single-connection
+    pool. Server databases get a queue pool that recycles and pre-pings its
+    connections so restarts and idle timeouts on the server side are survived.
+    """
+    url = make_url(uri or config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        if _is_memory_sqlite(url):
+            return {}
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+        }
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def replica_binds(config):
+    """SQLALCHEMY_BINDS with the read replica (see services.replica), empty when none is configured."""
+    uri = config['DATABASE_REPLICA_URL']
+    if not uri:
+        return {}
+    return {REPLICA_BIND: {'url': uri, **engine_options(config, uri)}}
+
+
+def sqlite_pragmas(config):
+    """PRAGMA statements of the configured SQLite profile, in execution order."""
+    if config['SQLITE_PROFILE'] == 'default':
+        return []
+    if config['SQLITE_PROFILE'] != 'production':
+        raise ValueError(f"Unknown SQLITE_PROFILE {config['SQLITE_PROFILE']!r}.")
+
+    journal_mode = config['SQLITE_JOURNAL_MODE'].upper()
+    synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"Unknown SQLITE_JOURNAL_MODE {journal_mode!r}.")
+    if synchronous not in SQLITE_SYNCHRONOUS:
+        raise ValueError(f"Unknown SQLITE_SYNCHRONOUS {synchronous!r}.")
+    return [
+        # Wait for a competing writer instead of failing with "database is locked"
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        # WAL lets readers run while a writer commits; NORMAL only syncs at checkpoints
+        f"PRAGMA journal_mode = {journal_mode}",
+        f"PRAGMA synchronous = {synchronous}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size = -{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run `pragmas` on every new connection of `engine` if it is a file-backed SQLite engine."""
+    if not pragmas or engine.dialect.name != 'sqlite' or _is_memory_sqlite(engine.url):
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', set_pragmas)
+
+
+def init_database(app, db):
+    """Apply the SQLite profile pragmas to every new connection of the app's SQLite engines."""
+    pragmas = sqlite_pragmas(app.config)
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, pragmas)
@@ -0,0 +1,163 @@
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from models import db
+from models.idempotency_key import IdempotencyKey
+from services.jobs import job
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def _request_hash():
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode(), request.get_data()):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _claim(key, user_id, request_hash):
+    """
+    Record the key as in progress, or return the row of an earlier request with the same key.
+
+    A key still in progress after IDEMPOTENCY_LOCK_TIMEOUT seconds belonged to
+    a request that never finished (e.g. its worker was killed); a retry of the
+    same request takes it over with a conditional UPDATE, so of several
+    retries only one does.
+
+    Returns:
+        None when this request owns the key, otherwise the existing IdempotencyKey.
+    """
+    now = datetime.utcnow()
+    expired_before = now - timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+    for _ in range(2):
+        db.session.add(IdempotencyKey(key=key, user_id=user_id, request_hash=request_hash, locked_at=now))
+        try:
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+        existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        if existing is None:
+            continue
+        if existing.created_at < expired_before:
+            # An expired key is forgotten and the request runs again
+            db.session.delete(existing)
+            db.session.commit()
+            continue
+        lease_expired = now - timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+        if existing.status_code is None and existing.request_hash == request_hash and existing.locked_at < lease_expired:
+            taken = db.session.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.idempotency_key_id == existing.idempotency_key_id,
+                       IdempotencyKey.status_code.is_(None), IdempotencyKey.locked_at == existing.locked_at)
+                .values(locked_at=now)
+            ).rowcount
+            db.session.commit()
+            if taken:
+                return None
+            db.session.refresh(existing)
+        return existing
+    return IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+
+
+def _store(key, user_id, response):
+    """
+    Save the response for replays, committing it with the view's writes.
+
+    The view's commits were deferred (see `idempotent`), so a successful
+    response and the writes behind it are committed together: either both
+    persist or neither does. Error responses are stored after rolling back
+    whatever the view left uncommitted; server errors release the key so the
+    client can retry.
+
+    Returns:
+        The response to send, a 500 when the final commit failed.
+    """
+    if response is None or response.status_code >= 400:
+        db.session.rollback()
+    record = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if record is not None:
+        if response is None or response.status_code >= 500:
+            db.session.delete(record)
+        else:
+            record.status_code = response.status_code
+            record.response_body = response.get_data(as_text=True)
+            record.locked_at = None
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        _release(key, user_id)
+        response = current_app.make_response((jsonify({'error': str(e)}), 500))
+    return response
+
+
+def _release(key, user_id):
+    db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key))
+    db.session.commit()
+
+
+def idempotent():
+    """
+    Make a view safe to retry with an `Idempotency-Key` request header.
+
+    The first request with a key runs the view and stores its status and JSON
+    body; retries with the same key and the same request get the stored
+    response back (marked with `Idempotent-Replayed: true`) without running the
+    view again. Reusing a key for a different request is rejected with 422 and a
+    retry that arrives while the first request is still running gets 409,
+    until IDEMPOTENCY_LOCK_TIMEOUT has passed. The view's commits only flush:
+    its writes are committed together with the stored response. Keys are
+    scoped per user and expire after IDEMPOTENCY_KEY_TTL seconds. Requests
+    without the header are not affected. Place it below `jwt_required`.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None:
+                return fn(*args, **kwargs)
+            if not key or len(key) > 255:
+                return jsonify({"message": f"{IDEMPOTENCY_HEADER} must be 1 to 255 characters."}), 400
+
+            user_id = get_jwt_identity()
+            request_hash = _request_hash()
+            existing = _claim(key, user_id, request_hash)
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    return jsonify({"message": f"{IDEMPOTENCY_HEADER} was already used for a different request."}), 422
+                if existing.status_code is None:
+                    response = jsonify({"message": "A request with this Idempotency-Key is still being processed."})
+                    response.headers['Retry-After'] = '1'
+                    return response, 409
+                response = current_app.response_class(existing.response_body, status=existing.status_code,
+                                                      mimetype='application/json')
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            response = None
+            db.session.info['defer_commit'] = True
+            try:
+                response = current_app.make_response(fn(*args, **kwargs))
+            finally:
+                db.session.info.pop('defer_commit', None)
+                if response is None:
+                    _store(key, user_id, None)
+            return _store(key, user_id, response)
+        return wrapper
+    return decorator
+
+
+@job('purge_idempotency_keys', every=3600)
+def purge_expired_keys():
+    """Hourly job: delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL."""
+    expired_before = datetime.utcnow() - timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+    result = db.session.execute(
+        IdempotencyKey.__table__.delete().where(IdempotencyKey.created_at < expired_before))
+    db.session.commit()
+    return result.rowcount
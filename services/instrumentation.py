@@ -0,0 +1,106 @@
+import json
+import logging
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger = logging.getLogger('sql.slow')
+
+_listeners_installed = False
+
+
+class RequestSQLStats:
+    """SQL statistics collected while serving a single request."""
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.query_count = 0
+        self.total_time = 0.0
+        self.slowest = []
+
+    def record(self, statement, duration):
+        self.query_count += 1
+        self.total_time += duration
+        # Keep only the `keep` slowest statements, sorted slowest first.
+        if len(self.slowest) < self.keep or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+            del self.slowest[self.keep:]
+
+
+def _enabled():
+    return has_app_context() and current_app.config.get('SQL_INSTRUMENTATION', False)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _enabled():
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get('query_start_time')
+    if not start_times or not _enabled():
+        return
+    duration = time.perf_counter() - start_times.pop()
+
+    if has_request_context():
+        stats = g.get('sql_stats')
+        if stats is not None:
+            stats.record(statement, duration)
+
+    threshold = current_app.config.get('SLOW_QUERY_THRESHOLD_MS', 100) / 1000.0
+    if duration >= threshold:
+        entry = {
+            'event': 'slow_query',
+            'duration_ms': round(duration * 1000, 3),
+            'statement': statement,
+            'executemany': executemany,
+        }
+        if has_request_context():
+            entry.update(method=request.method, path=request.path, endpoint=request.endpoint)
+        slow_query_logger.warning(json.dumps(entry))
+
+
+def _handle_error(exception_context):
+    # Drop the start time of a statement that raised so the stack stays balanced.
+    start_times = exception_context.connection.info.get('query_start_time') \
+        if exception_context.connection is not None else None
+    if start_times:
+        start_times.pop()
+
+
+def _start_request():
+    g.sql_stats = RequestSQLStats(current_app.config.get('SQL_INSTRUMENTATION_TOP_N', 3))
+
+
+def _add_server_timing(response):
+    stats = g.get('sql_stats')
+    if stats is None:
+        return response
+    metrics = [f'db;dur={stats.total_time * 1000:.3f};desc="{stats.query_count} queries"']
+    for rank, (duration, _statement) in enumerate(stats.slowest, start=1):
+        metrics.append(f'db-slow-{rank};dur={duration * 1000:.3f}')
+    response.headers.add('Server-Timing', ', '.join(metrics))
+    return response
+
+
+def init_sql_instrumentation(app):
+    """
+    Record per-request query count, DB time and slowest statements when
+    SQL_INSTRUMENTATION is enabled, report them in a `Server-Timing` response
+    header and log statements slower than SLOW_QUERY_THRESHOLD_MS as JSON on
+    the `sql.slow` logger.
+    """
+    global _listeners_installed
+    if not app.config.get('SQL_INSTRUMENTATION', False):
+        return
+
+    if not _listeners_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _listeners_installed = True
+
+    app.before_request(_start_request)
+    app.after_request(_add_server_timing)
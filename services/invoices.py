@@ -0,0 +1,47 @@
+import os
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from models import db
+from models.invoice import Invoice
+from models.order import Order
+from models.order_items import OrderItems
+from services.jobs import job
+
+
+def invoice_path(invoice_id):
+    """Path of the rendered document of an invoice."""
+    return os.path.join(current_app.config['INVOICE_DIR'], f'invoice-{invoice_id}.txt')
+
+
+def render_invoice_text(invoice):
+    """Plain-text invoice document: one line per order item and the total."""
+    lines = [
+        f"Invoice #{invoice.invoice_id}",
+        f"Order #{invoice.order_id}",
+        f"Date: {invoice.invoice_date:%Y-%m-%d %H:%M}",
+        f"Payment method: {invoice.payment_method}",
+        '',
+    ]
+    for item in invoice.order.order_item:
+        unit_price = item.unit_price if item.unit_price is not None else item.product.price
+        lines.append(f"{item.quantity:>4} x {item.product.product_name:<40} {unit_price:>10} "
+                     f"{unit_price * item.quantity:>12}")
+    lines += ['', f"Total: {invoice.total_amount}", '']
+    return '\n'.join(lines)
+
+
+@job('render_invoice')
+def render_invoice(invoice_id):
+    """Write the invoice document of a placed order (queued by checkout)."""
+    invoice = Invoice.query.options(
+        joinedload(Invoice.order).selectinload(Order.order_item).joinedload(OrderItems.product),
+    ).filter_by(invoice_id=invoice_id).first()
+    if invoice is None:
+        return
+    path = invoice_path(invoice_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first so a retried or concurrent run never leaves a partial document
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        f.write(render_invoice_text(invoice))
+    os.replace(f'{path}.tmp', path)
+    db.session.rollback()
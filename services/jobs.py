@@ -0,0 +1,255 @@
+import importlib
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from models import db
+from models.job import Job, JobSchedule
+
+logger = logging.getLogger('jobs')
+
+# Modules defining job handlers, imported by init_jobs so every process knows all of them
+HANDLER_MODULES = ('services.cart', 'services.idempotency', 'services.invoices', 'services.ratelimit',
+                   'services.search')
+
+# Seconds between a worker's checks for due periodic jobs and lost running jobs
+MAINTENANCE_INTERVAL = 15
+
+# Registered job handlers and the run interval (seconds) of the periodic ones
+_handlers = {}
+_schedules = {}
+
+
+def job(name, every=None, max_attempts=5):
+    """
+    Register a function as the handler of the background job `name`.
+
+    The handler is called with the job's payload as keyword arguments inside
+    an app context and commits its own work. `every` makes the job periodic:
+    workers enqueue it every `every` seconds.
+    """
+    def decorator(fn):
+        _handlers[name] = (fn, max_attempts)
+        if every is not None:
+            _schedules[name] = every
+        return fn
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    """
+    Add a job to the session; it is queued when the caller commits.
+
+    Enqueueing inside the caller's transaction means the job exists if and
+    only if the work that triggered it was committed.
+    """
+    if max_attempts is None:
+        max_attempts = _handlers[name][1] if name in _handlers else 5
+    new_job = Job(name=name, payload=json.dumps(payload or {}), max_attempts=max_attempts,
+                  run_at=datetime.utcnow() + timedelta(seconds=delay))
+    db.session.add(new_job)
+    return new_job
+
+
+def enqueue_unique(name, unique_key, payload=None, delay=0):
+    """
+    Queue a job and commit, unless a job with the same `unique_key` is still queued.
+
+    Used to coalesce repeated requests for the same work (e.g. one reindex
+    after several imports). Returns whether a new job was queued.
+    """
+    new_job = enqueue(name, payload, delay)
+    new_job.unique_key = unique_key
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def _backoff(attempts):
+    """Exponential retry delay with jitter, capped at JOB_RETRY_MAX_SECONDS."""
+    base = current_app.config['JOB_RETRY_BASE_SECONDS']
+    delay = min(base * 2 ** (attempts - 1), current_app.config['JOB_RETRY_MAX_SECONDS'])
+    return delay * random.uniform(0.8, 1.2)
+
+
+def schedule_due_jobs():
+    """Queue the periodic jobs that are due; of several workers only one wins each run."""
+    now = datetime.utcnow()
+    next_runs = dict(db.session.execute(select(JobSchedule.name, JobSchedule.next_run_at)).all())
+    for name, every in _schedules.items():
+        if name not in next_runs:
+            db.session.add(JobSchedule(name=name, next_run_at=now))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+        elif next_runs[name] > now:
+            continue
+        result = db.session.execute(
+            update(JobSchedule)
+            .where(JobSchedule.name == name, JobSchedule.next_run_at <= now)
+            .values(next_run_at=now + timedelta(seconds=every))
+        )
+        if result.rowcount == 1:
+            enqueue(name)
+        db.session.commit()
+
+
+def requeue_stuck_jobs():
+    """Release jobs whose worker died: running for longer than JOB_TIMEOUT seconds."""
+    stuck_before = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_TIMEOUT'])
+    stuck = (Job.status == 'running') & (Job.locked_at < stuck_before)
+    db.session.execute(update(Job).where(stuck, Job.attempts >= Job.max_attempts)
+                       .values(status='failed', finished_at=datetime.utcnow(), last_error='Timed out.'))
+    db.session.execute(update(Job).where(stuck).values(status='queued', locked_by=None))
+    db.session.commit()
+
+
+def claim_job(worker_id):
+    """
+    Take the next due job, or return None when nothing is due.
+
+    A job is claimed with a conditional `UPDATE ... WHERE status = 'queued'`,
+    so concurrent workers never run the same job twice.
+    """
+    now = datetime.utcnow()
+    candidates = db.session.execute(
+        select(Job.job_id)
+        .where(Job.status == 'queued', Job.run_at <= now)
+        .order_by(Job.run_at)
+        .limit(5)
+    ).scalars().all()
+    for job_id in candidates:
+        result = db.session.execute(
+            update(Job)
+            .where(Job.job_id == job_id, Job.status == 'queued')
+            .values(status='running', locked_by=worker_id, locked_at=now,
+                    attempts=Job.attempts + 1, unique_key=None)
+        )
+        if result.rowcount == 1:
+            db.session.commit()
+            return db.session.get(Job, job_id)
+    db.session.commit()
+    return None
+
+
+def run_job(claimed):
+    """Run a claimed job and record the outcome: done, retried later with backoff, or failed."""
+    job_id, name = claimed.job_id, claimed.name
+    try:
+        if name not in _handlers:
+            raise LookupError(f"No handler registered for job {name!r}.")
+        _handlers[name][0](**json.loads(claimed.payload))
+    except Exception:
+        db.session.rollback()
+        failed = db.session.get(Job, job_id)
+        failed.last_error = traceback.format_exc()[-4000:]
+        failed.locked_by = None
+        if failed.attempts >= failed.max_attempts:
+            failed.status = 'failed'
+            failed.finished_at = datetime.utcnow()
+            logger.error('job %s (%s) failed after %s attempts', job_id, name, failed.attempts)
+        else:
+            failed.status = 'queued'
+            failed.run_at = datetime.utcnow() + timedelta(seconds=_backoff(failed.attempts))
+            logger.warning('job %s (%s) failed, retrying at %s', job_id, name, failed.run_at)
+        db.session.commit()
+        return False
+
+    done = db.session.get(Job, job_id)
+    done.status = 'done'
+    done.locked_by = None
+    done.finished_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+def purge_finished_jobs():
+    """Delete done and failed jobs older than JOB_RETENTION_DAYS."""
+    finished_before = datetime.utcnow() - timedelta(days=current_app.config['JOB_RETENTION_DAYS'])
+    result = db.session.execute(
+        Job.__table__.delete().where(Job.status.in_(('done', 'failed')), Job.finished_at < finished_before))
+    db.session.commit()
+    return result.rowcount
+
+
+job('purge_finished_jobs', every=86400)(purge_finished_jobs)
+
+
+class Worker:
+    """Polls the job table and runs due jobs, each iteration in a fresh app context."""
+
+    def __init__(self, app, worker_id=None):
+        self.app = app
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+        self.poll_interval = app.config['JOB_POLL_INTERVAL']
+        self._next_maintenance = 0
+        self._stop = threading.Event()
+
+    def run_once(self):
+        """Schedule due periodic jobs and run at most one job. Returns whether a job ran."""
+        with self.app.app_context():
+            try:
+                if time.monotonic() >= self._next_maintenance:
+                    schedule_due_jobs()
+                    requeue_stuck_jobs()
+                    self._next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+                claimed = claim_job(self.worker_id)
+                if claimed is None:
+                    return False
+                run_job(claimed)
+                return True
+            except Exception:
+                db.session.rollback()
+                logger.exception('job worker %s iteration failed', self.worker_id)
+                return False
+
+    def run(self, max_jobs=None):
+        """Work until stopped (or after `max_jobs` jobs), sleeping between polls when idle."""
+        done = 0
+        while not self._stop.is_set():
+            if self.run_once():
+                done += 1
+                if max_jobs is not None and done >= max_jobs:
+                    return
+            else:
+                self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_worker_threads(app):
+    """Run JOB_WORKER_THREADS in-process worker threads (daemon threads of this process)."""
+    workers = []
+    for index in range(app.config['JOB_WORKER_THREADS']):
+        worker = Worker(app)
+        thread = threading.Thread(target=worker.run, name=f'job-worker-{index}', daemon=True)
+        thread.start()
+        workers.append(worker)
+    return workers
+
+
+def init_jobs(app):
+    """Register all job handlers and default the invoice directory to the instance folder."""
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+    if not app.config.get('INVOICE_DIR'):
+        app.config['INVOICE_DIR'] = os.path.join(app.instance_path, 'invoices')
+
+
+def queue_stats():
+    """Number of jobs per status."""
+    rows = db.session.execute(select(Job.status, db.func.count()).group_by(Job.status)).all()
+    return dict(rows)
@@ -0,0 +1,64 @@
+import dataclasses
+import decimal
+import uuid
+from datetime import date
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+
+def _default(o):
+    # Same conversions as Flask's default provider for the types orjson leaves to us
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    Requires the optional `orjson` package. Output matches Flask's default
+    provider: sorted keys, dates as HTTP dates and Decimals as strings.
+    """
+
+    sort_keys = True
+    mimetype = 'application/json'
+
+    def __init__(self, app):
+        try:
+            import orjson
+        except ImportError:
+            raise RuntimeError("JSON_PROVIDER='orjson' requires the 'orjson' package.")
+        super().__init__(app)
+        self._orjson = orjson
+        self._options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+    def _dumps_bytes(self, obj):
+        options = self._options | self._orjson.OPT_SORT_KEYS if self.sort_keys else self._options
+        return self._orjson.dumps(obj, default=_default, option=options)
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Write the encoded bytes straight into the response, skipping the str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install the JSON provider selected by JSON_PROVIDER ('orjson' or 'default')."""
+    provider = app.config.get('JSON_PROVIDER', 'default')
+    if provider == 'orjson':
+        app.json = OrjsonProvider(app)
+    elif provider != 'default':
+        raise ValueError(f"Unknown JSON_PROVIDER {provider!r}.")
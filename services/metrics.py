@@ -0,0 +1,124 @@
+import os
+import time
+from contextlib import contextmanager
+from flask import Response, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from sqlalchemy import event
+
+# When PROMETHEUS_MULTIPROC_DIR is set before this module is imported, every worker
+# process writes its samples to files in that directory and /metrics aggregates them.
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'Total HTTP requests.',
+    ['blueprint', 'endpoint', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency in seconds.',
+    ['blueprint', 'endpoint', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being served.',
+    multiprocess_mode='livesum',
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a connection from the DB pool.',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+PASSWORD_HASH_TIME = Histogram(
+    'password_hash_duration_seconds', 'Time spent hashing or verifying passwords.',
+    ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+RATE_LIMITED = Counter(
+    'rate_limited_requests_total', 'Requests rejected with 429 by a rate limit.',
+    ['limit'],
+)
+REQUESTS_SHED = Counter(
+    'requests_shed_total', 'Requests rejected with 503 by admission control.',
+    ['reason'],
+)
+
+
+@contextmanager
+def password_hash_timer(operation):
+    """Observe the duration of a password hash `operation` ('generate' or 'check')."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PASSWORD_HASH_TIME.labels(operation=operation).observe(time.perf_counter() - start)
+
+
+def _endpoint_labels():
+    endpoint = request.endpoint or 'unknown'
+    blueprint = request.blueprint or ''
+    return blueprint, endpoint
+
+
+def _start_request():
+    g.metrics_start_time = time.perf_counter()
+    g.metrics_in_flight = True
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _record_request(response):
+    start = g.get('metrics_start_time')
+    if start is not None:
+        blueprint, endpoint = _endpoint_labels()
+        REQUEST_LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+
+def _finish_request(exception):
+    if g.pop('metrics_in_flight', False):
+        REQUESTS_IN_FLIGHT.dec()
+
+
+def _instrument_pool(engine):
+    """Wrap the engine's pool checkout to observe how long callers wait for a connection."""
+    pool = engine.pool
+    checkout = pool.connect
+
+    def timed_checkout():
+        start = time.perf_counter()
+        try:
+            return checkout()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+    pool.connect = timed_checkout
+
+
+def metrics():
+    """Expose the collected metrics in the Prometheus text exposition format."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        from prometheus_client import REGISTRY as registry
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app, db):
+    """Register the request hooks, pool instrumentation and the /metrics endpoint."""
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.teardown_request(_finish_request)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            _instrument_pool(engine)
+            # engine.dispose() replaces the pool, so wrap the new one as well.
+            event.listen(engine, 'engine_disposed', _instrument_pool)
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
+
+
+def mark_process_dead(pid):
+    """Clean up the live gauge files of a worker that exited (multi-process mode only)."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
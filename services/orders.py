@@ -0,0 +1,110 @@
+from datetime import datetime
+from sqlalchemy import func, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db
+from models.invoice import Invoice
+from models.order import HISTORY_STATUSES, ORDER_TRANSITIONS, Order
+from services.analytics import record_sale
+from services.cart import order_total
+from services.jobs import enqueue
+
+
+class InvalidTransition(Exception):
+    """Raised when an order cannot move to the requested status (or another request moved it first)."""
+
+    def __init__(self, current, requested):
+        super().__init__(f"Cannot change order status from {current} to {requested}.")
+        self.current = current
+        self.requested = requested
+
+
+def transition(order, status):
+    """
+    Move an order to `status` if the state machine allows it.
+
+    The change is a conditional `UPDATE ... WHERE status = <current>`, so of
+    two concurrent requests moving the same order only one succeeds. The
+    statement joins the caller's transaction; nothing is committed here.
+
+    Raises:
+        InvalidTransition: If the move is not allowed or the order changed
+            concurrently. The session has been rolled back.
+    """
+    current = order.status
+    if status not in ORDER_TRANSITIONS.get(current, ()):
+        raise InvalidTransition(current, status)
+    result = db.session.execute(
+        update(Order)
+        .where(Order.order_id == order.order_id, Order.status == current)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        raise InvalidTransition(current, status)
+    set_committed_value(order, 'status', status)
+
+
+def place_order(order, payment_method=None):
+    """
+    Check out a Pending order: mark it Placed and finalize its invoice.
+
+    The invoice total is recomputed from the order lines (at the prices they
+    were added at) and the invoice is dated now. Stock was already reserved
+    when the items were added. The sale is added to the analytics rollups and
+    rendering the invoice document is queued as a background job, both
+    committing together with the order.
+
+    Returns:
+        The finalized Invoice.
+    """
+    # Closing the cart first takes the write lock, so no line can be added after the total is taken
+    transition(order, 'Placed')
+    total = order_total(order.order_id)
+
+    invoice = order.invoice
+    if invoice is None:
+        invoice = Invoice(order_id=order.order_id, user_id=order.user_id,
+                          payment_method=payment_method or 'Online Payment')
+        db.session.add(invoice)
+    elif payment_method:
+        invoice.payment_method = payment_method
+    invoice.total_amount = total
+    invoice.invoice_date = datetime.utcnow()
+    db.session.flush()
+    record_sale(order.order_id, invoice.invoice_date)
+    enqueue('render_invoice', {'invoice_id': invoice.invoice_id})
+    return invoice
+
+
+def history_filters(date_column, user_id, statuses, start, end):
+    """WHERE clauses of a user's orders in `statuses`, with `date_column` in [start, end)."""
+    filters = [Order.user_id == user_id, Order.status.in_(statuses)]
+    if start is not None:
+        filters.append(date_column >= start)
+    if end is not None:
+        filters.append(date_column < end)
+    return filters
+
+
+def order_summary(user_id, start=None, end=None):
+    """
+    Aggregates of a user's checked-out orders, computed by the database in one query.
+
+    Returns:
+        Dict with the `order_count`, the `total_spent` (sum of the invoice
+        totals) and the dates of the first and last order.
+    """
+    order_count, total_spent, first_order_date, last_order_date = db.session.execute(
+        select(func.count(Order.order_id), func.sum(Invoice.total_amount),
+               func.min(Order.order_date), func.max(Order.order_date))
+        .select_from(Order)
+        .outerjoin(Invoice, Invoice.order_id == Order.order_id)
+        .where(*history_filters(Order.order_date, user_id, HISTORY_STATUSES, start, end))
+    ).one()
+    return {
+        'order_count': order_count,
+        'total_spent': total_spent or 0,
+        'first_order_date': first_order_date,
+        'last_order_date': last_order_date,
+    }
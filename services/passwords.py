@@ -0,0 +1,122 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+from services.metrics import password_hash_timer
+
+logger = logging.getLogger('passwords')
+
+
+class HashingUnavailable(Exception):
+    """Raised when too many password hashes are already queued, one exceeds PASSWORD_HASH_TIMEOUT or the pool broke."""
+
+
+class PasswordHasher:
+    """
+    Runs PBKDF2 password hashing on a bounded pool of worker processes.
+
+    Hashing is CPU bound and holds the GIL, so running it on request threads
+    stalls every other request served by the same worker. Jobs are handed to a
+    dedicated process pool instead, and at most PASSWORD_HASH_MAX_PENDING jobs
+    may be queued or running at once; further callers get HashingUnavailable
+    so the route can answer 503 instead of piling up. A job counts until it
+    finishes, even when its caller gave up after PASSWORD_HASH_TIMEOUT. With
+    PASSWORD_HASH_WORKERS set to 0 hashing runs inline on the calling thread.
+
+    The pool is started with forkserver: it is created lazily in processes
+    that already run threads (request and job threads), which fork() would
+    copy in an inconsistent state. When a worker process dies the pool is
+    broken for good: it is dropped, and the next call builds a new one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._workers = None
+        self._pending = None
+
+    def _get_executor(self, workers, max_pending):
+        with self._lock:
+            # The pool cannot be shared across fork(), so each process builds its own lazily.
+            if self._executor is None or self._pid != os.getpid() or self._workers != workers:
+                if self._executor is not None and self._pid == os.getpid():
+                    self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(max_workers=workers,
+                                                     mp_context=multiprocessing.get_context('forkserver'))
+                self._pid = os.getpid()
+                self._workers = workers
+                self._pending = threading.BoundedSemaphore(max_pending)
+            return self._executor, self._pending
+
+    def _discard(self, executor):
+        with self._lock:
+            # Another thread may already have replaced the broken pool
+            if self._executor is executor:
+                logger.warning('password hashing pool broken, starting a new one')
+                executor.shutdown(wait=False)
+                self._executor = None
+
+    def run(self, operation, fn, *args):
+        config = current_app.config
+        workers = config.get('PASSWORD_HASH_WORKERS', 0)
+        with password_hash_timer(operation):
+            if workers <= 0:
+                return fn(*args)
+
+            executor, pending = self._get_executor(workers, config.get('PASSWORD_HASH_MAX_PENDING', 32))
+            if not pending.acquire(blocking=False):
+                raise HashingUnavailable()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                pending.release()
+                self._discard(executor)
+                raise HashingUnavailable()
+            except BaseException:
+                pending.release()
+                raise
+            # Released when the job is done, not when the caller stops waiting for it
+            future.add_done_callback(lambda _: pending.release())
+            try:
+                return future.result(timeout=config.get('PASSWORD_HASH_TIMEOUT', 10))
+            except FuturesTimeoutError:
+                raise HashingUnavailable()
+            except BrokenProcessPool:
+                self._discard(executor)
+                raise HashingUnavailable()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
+
+
+def password_method():
+    """The werkzeug hashing method string built from the configured PBKDF2 parameters."""
+    config = current_app.config
+    return (f"pbkdf2:{config.get('PASSWORD_HASH_ALGORITHM', 'sha256')}:"
+            f"{config.get('PASSWORD_HASH_ITERATIONS', 600000)}")
+
+
+def hash_password(password):
+    """Hash a password with the configured PBKDF2 parameters."""
+    return password_hasher.run('generate', generate_password_hash, password, password_method())
+
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash."""
+    return password_hasher.run('check', check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with parameters other than the configured ones."""
+    return password_hash.split('$', 1)[0] != password_method()
@@ -0,0 +1,308 @@
+import csv
+import json
+from datetime import datetime
+from io import StringIO
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db
+from models.product import Product
+from services.cache import product_cache
+from services.jobs import enqueue_unique
+
+# Field names used by the product API, the bulk import and the export, mapped to model columns.
+PRODUCT_COLUMNS = {
+    'product_id': 'product_id',
+    'name': 'product_name',
+    'description': 'description',
+    'price': 'price',
+    'quantity': 'product_quantity',
+    'category_id': 'category_id',
+}
+
+
+def validate_product(data, partial=False):
+    """
+    Validate product input with the rules of `add_product` (partial=False)
+    or `update_product` (partial=True, only the given fields are checked).
+
+    Returns:
+        The error message, or None when the data is valid.
+    """
+    if not partial:
+        if not data.get('name') or not isinstance(data.get('name'), str):
+            return "Product name must be a non-empty string."
+
+        if not data.get('price') or not isinstance(data.get('price'), (int, float)) or data.get('price') < 0:
+            return "Invalid price"
+
+        if not data.get('quantity') or not isinstance(data.get('quantity'), int) or data.get('quantity') < 0:
+            return "Invalid quantity"
+
+        if not data.get('category_id') or not isinstance(data.get('category_id'), int) or data.get('category_id') < 0:
+            return "Invalid category ID"
+
+        if not isinstance(data.get('description'), str):
+            return "Product description is required."
+        return None
+
+    if 'name' in data and (not isinstance(data['name'], str)):
+        return "Invalid product name."
+
+    if 'price' in data and (not isinstance(data['price'], (int, float)) or data['price'] < 0):
+        return "Invalid price."
+
+    if 'quantity' in data and (not isinstance(data['quantity'], int) or data['quantity'] < 0):
+        return "Invalid quantity."
+
+    if 'category_id' in data and (not isinstance(data['category_id'], int) or data['category_id'] < 0):
+        return "Invalid category ID."
+
+    if 'description' in data and (not isinstance(data['description'], str)):
+        return "Invalid description."
+    return None
+
+
+def parse_ndjson(lines):
+    """Yield (line_number, row, error) for each non-blank line of an NDJSON stream."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Each line must be a JSON object."
+            continue
+        # The export writes prices as exact strings ("1.50"); read them back like CSV cells
+        if isinstance(row.get('price'), str):
+            row['price'] = _csv_value('price', row['price'])
+        yield line_number, row, None
+
+
+def _csv_value(field, value):
+    """Convert a CSV cell to the type the validators expect; leave it as is when it does not parse."""
+    if field in ('product_id', 'quantity', 'category_id'):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    if field == 'price':
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def parse_csv(lines):
+    """Yield (line_number, row, error) for each record of a CSV stream with a header row."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # Empty cells mean "not provided" so partial updates can leave columns untouched.
+        row = {field: _csv_value(field, value) for field, value in row.items()
+               if field is not None and value not in (None, '')}
+        yield reader.line_num, row, None
+
+
+NAME_TAKEN = "A product with this name already exists."
+
+
+def _write_rows(writes, report):
+    """
+    Write rows one by one, each in a SAVEPOINT, after the batch as a whole was rejected.
+
+    Rows the database refuses (e.g. a name taken by a concurrent import) are
+    reported; the others are kept. Returns the written (inserts, updates).
+    """
+    inserts, updates = [], []
+    for line_number, values in writes:
+        statement, written = (update(Product), updates) if 'product_id' in values else (insert(Product), inserts)
+        try:
+            with db.session.begin_nested():
+                db.session.execute(statement, [values])
+        except IntegrityError as e:
+            error = NAME_TAKEN if 'product_name' in str(e.orig) else f"Rejected by the database: {e.orig}"
+            report['errors'].append({'line': line_number, 'error': error})
+            continue
+        written.append(values)
+    db.session.commit()
+    return inserts, updates
+
+
+def _apply_batch(batch, report):
+    """
+    Validate and upsert one batch of parsed rows in a single transaction.
+
+    Name collisions (a rename or a new product taking a name that another
+    product has, in the database or earlier in the batch) are rejected per
+    row up front. If the database still refuses the batch, it is written
+    again row by row so only the offending rows are rejected.
+    """
+    ids = {row['product_id'] for _, row in batch if isinstance(row.get('product_id'), int)}
+    names = {row['name'] for _, row in batch if isinstance(row.get('name'), str)}
+
+    # Two lookups per batch: existing rows by ID and the lowest ID per name.
+    existing = {}
+    if ids:
+        existing.update(db.session.execute(
+            select(Product.product_id, Product.product_name).where(Product.product_id.in_(ids))).all())
+    by_name = {}
+    if names:
+        by_name = dict(db.session.execute(
+            select(Product.product_name, func.min(Product.product_id))
+            .where(Product.product_name.in_(names))
+            .group_by(Product.product_name)).all())
+        existing.update({product_id: name for name, product_id in by_name.items()})
+
+    now = datetime.utcnow()
+    writes = []
+    inserts_by_name = {}
+    # Owner of every name written by the batch so far (None for a new product)
+    claimed = {}
+    for line_number, row in batch:
+        unknown = set(row) - set(PRODUCT_COLUMNS)
+        if unknown:
+            report['errors'].append({'line': line_number, 'error': f"Unknown fields: {', '.join(sorted(unknown))}."})
+            continue
+
+        # Checked before the lookups: a list or object cannot be looked up (nor written)
+        if 'product_id' in row and not isinstance(row['product_id'], int):
+            report['errors'].append({'line': line_number, 'error': "Invalid product ID."})
+            continue
+        if 'name' in row and not isinstance(row['name'], str):
+            report['errors'].append({'line': line_number, 'error': "Invalid product name."})
+            continue
+
+        if 'product_id' in row:
+            product_id = row['product_id']
+            if product_id not in existing:
+                report['errors'].append({'line': line_number, 'error': "Product not found."})
+                continue
+        else:
+            product_id = by_name.get(row.get('name'))
+
+        error = validate_product(row, partial=product_id is not None)
+        if error:
+            report['errors'].append({'line': line_number, 'error': error})
+            continue
+
+        values = {PRODUCT_COLUMNS[field]: value for field, value in row.items() if field != 'product_id'}
+        name = values.get('product_name')
+        if name is not None:
+            owner = claimed[name] if name in claimed else by_name.get(name, product_id)
+            if owner != product_id:
+                report['errors'].append({'line': line_number, 'error': NAME_TAKEN})
+                continue
+            claimed[name] = product_id
+        if product_id is None:
+            # A name repeated within the batch updates the pending insert instead of duplicating it.
+            if name in inserts_by_name:
+                inserts_by_name[name].update(values)
+                continue
+            inserts_by_name[name] = values
+            writes.append((line_number, values))
+        else:
+            values.update(product_id=product_id, updated_at=now)
+            writes.append((line_number, values))
+
+    inserts = [values for _, values in writes if 'product_id' not in values]
+    updates = [values for _, values in writes if 'product_id' in values]
+    try:
+        if inserts:
+            db.session.execute(insert(Product), inserts)
+        if updates:
+            db.session.execute(update(Product), updates)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        inserts, updates = _write_rows(writes, report)
+
+    report['inserted'] += len(inserts)
+    report['updated'] += len(updates)
+    updated_ids = [values['product_id'] for values in updates]
+    touched_names = {values['product_name'] for values in inserts + updates if 'product_name' in values}
+    touched_names.update(existing[product_id] for product_id in updated_ids)
+    product_cache.invalidate(product_ids=updated_ids, names=touched_names)
+
+
+def import_products(records, batch_size=1000, max_errors=1000):
+    """
+    Upsert products from parsed (line_number, row, error) records in batches.
+
+    Rows with a `product_id` update that product; rows without one update the
+    product with the same name or insert a new product. Each batch is written
+    with executemany INSERT/UPDATE statements in one transaction. When rows were
+    written, one search index optimization is queued (coalesced across imports).
+
+    Returns:
+        Dict with the number of processed, inserted and updated rows and the
+        per-row `errors` (at most `max_errors` are listed, `error_count` has the total).
+    """
+    report = {'processed': 0, 'inserted': 0, 'updated': 0, 'errors': []}
+    batch = []
+    error_count = 0
+
+    def flush():
+        nonlocal error_count
+        before = len(report['errors'])
+        try:
+            _apply_batch(batch, report)
+        except Exception as e:
+            db.session.rollback()
+            lines = [line_number for line_number, _ in batch]
+            report['errors'].append({'line': lines[0], 'error': f"Batch ending at line {lines[-1]} failed: {e}"})
+        error_count += len(report['errors']) - before
+        del report['errors'][max_errors:]
+        batch.clear()
+
+    for line_number, row, error in records:
+        report['processed'] += 1
+        if error:
+            error_count += 1
+            if len(report['errors']) < max_errors:
+                report['errors'].append({'line': line_number, 'error': error})
+            continue
+        batch.append((line_number, row))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    report['error_count'] = error_count
+    if report['inserted'] or report['updated']:
+        enqueue_unique('optimize_search_index', 'optimize_search_index')
+    return report
+
+
+def _export_rows(batch_size):
+    """Yield product rows as API dicts, fetching `batch_size` rows at a time from a server-side cursor."""
+    columns = [getattr(Product, column).label(field) for field, column in PRODUCT_COLUMNS.items()]
+    result = db.session.execute(
+        select(*columns).order_by(Product.product_id),
+        execution_options={'stream_results': True, 'yield_per': batch_size},
+    )
+    for partition in result.partitions():
+        for row in partition:
+            yield row._asdict()
+
+
+def export_products(fmt='ndjson', batch_size=1000):
+    """Yield the whole catalog as NDJSON lines or CSV text chunks without loading it in memory."""
+    if fmt == 'csv':
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(PRODUCT_COLUMNS))
+        writer.writeheader()
+        for count, row in enumerate(_export_rows(batch_size), start=1):
+            writer.writerow(row)
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for row in _export_rows(batch_size):
+            # Exact decimal string, as the API sends it
+            row['price'] = str(row['price'])
+            yield json.dumps(row) + '\n'
@@ -0,0 +1,303 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache, wraps
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db
+from models.rate_limit import RateLimitCounter
+from services.jobs import job
+from services.metrics import RATE_LIMITED
+
+logger = logging.getLogger('ratelimit')
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Names of the limits declared with `rate_limit`, validated when the app starts
+_limits = {'default'}
+
+
+class TokenBucket:
+    """
+    Bursts of up to `limit` requests, with the bucket refilled at `limit` per `period`.
+
+    State: [tokens left, Unix time of the last refill].
+    """
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.ttl = period
+
+    def hit(self, state, now):
+        """Take a token; returns (seconds until one is available, 0 when taken, and the new state)."""
+        tokens, refilled_at = state or (self.limit, now)
+        tokens = min(self.limit, tokens + max(0.0, now - refilled_at) * self.limit / self.period)
+        if tokens >= 1:
+            return 0.0, [tokens - 1, now]
+        return (1 - tokens) * self.period / self.limit, [tokens, now]
+
+
+class SlidingWindow:
+    """
+    At most `limit` requests in any `period`.
+
+    The count over the sliding window is estimated from the counts of the
+    current and the previous fixed window, the latter weighted by how much of
+    it the sliding window still covers. State: [window number, count in
+    that window, count in the window before].
+    """
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.ttl = 2 * period
+
+    def hit(self, state, now):
+        """Count a request; returns (seconds until it would be allowed, 0 when counted, and the new state)."""
+        window = int(now // self.period)
+        current = previous = 0
+        if state:
+            counted_window, count, count_before = state
+            if counted_window == window:
+                current, previous = count, count_before
+            elif counted_window == window - 1:
+                previous = count
+        elapsed = now / self.period - window
+        if previous * (1 - elapsed) + current + 1 <= self.limit:
+            return 0.0, [window, current + 1, previous]
+        if current + 1 > self.limit:
+            # Wait for the next window, until this one's weight has dropped enough
+            wait = 1 - elapsed + 1 - (self.limit - 1) / current
+        else:
+            wait = 1 - (self.limit - 1 - current) / previous - elapsed
+        return max(wait * self.period, 0.001), [window, current, previous]
+
+
+ALGORITHMS = {'token_bucket': TokenBucket, 'sliding_window': SlidingWindow}
+
+
+def parse_limit(spec):
+    """Parse a limit such as '10/minute' into (10, 60); raises ValueError when malformed."""
+    count, _, unit = spec.partition('/')
+    unit = unit.strip().lower()
+    unit = unit[:-1] if unit.endswith('s') and unit[:-1] in PERIODS else unit
+    if not count.strip().isdigit() or int(count) < 1 or unit not in PERIODS:
+        raise ValueError(f"Invalid rate limit {spec!r}, expected '<count>/<{'|'.join(PERIODS)}>'.")
+    return int(count), PERIODS[unit]
+
+
+@lru_cache(maxsize=64)
+def _limiter(spec, algorithm):
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown RATE_LIMIT_ALGORITHM {algorithm!r}.")
+    return ALGORITHMS[algorithm](*parse_limit(spec))
+
+
+class LocalRateLimitBackend:
+    """Counters in this process: exact, but every worker process enforces the limits on its own."""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def update(self, key, hit, ttl):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            outcome, state = hit(entry[0] if entry and entry[1] > now else None, now)
+            self._entries[key] = (state, now + ttl)
+            if len(self._entries) > self.maxsize:
+                self._entries = {key: entry for key, entry in self._entries.items() if entry[1] > now}
+                # Still full of live counters: forget the least recently used ones
+                for stale in list(self._entries)[:len(self._entries) - self.maxsize]:
+                    del self._entries[stale]
+        return outcome
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DatabaseRateLimitBackend:
+    """
+    Counters in the rate_limit_counter table of the primary database, shared by all worker processes.
+
+    Each hit reads the counter and replaces it with a conditional UPDATE that
+    only matches the state it read, retrying when another process changed it
+    in between. Runs on its own connection, outside the request's session.
+    """
+
+    def __init__(self, attempts=5):
+        self.attempts = attempts
+
+    def update(self, key, hit, ttl):
+        table = RateLimitCounter.__table__
+        for _ in range(self.attempts):
+            now = time.time()
+            expires_at = datetime.utcfromtimestamp(now + ttl)
+            try:
+                with db.engine.begin() as connection:
+                    row = connection.execute(
+                        select(table.c.state, table.c.expires_at).where(table.c.key == key)).first()
+                    if row is None:
+                        outcome, state = hit(None, now)
+                        connection.execute(insert(table).values(key=key, state=json.dumps(state),
+                                                                expires_at=expires_at))
+                        return outcome
+                    live = row.expires_at > datetime.utcfromtimestamp(now)
+                    outcome, state = hit(json.loads(row.state) if live else None, now)
+                    changed = connection.execute(
+                        update(table)
+                        .where(table.c.key == key, table.c.state == row.state)
+                        .values(state=json.dumps(state), expires_at=expires_at)
+                    ).rowcount
+                if changed:
+                    return outcome
+            except IntegrityError:
+                # Another process created the counter first
+                continue
+        raise RuntimeError(f'Rate limit counter {key!r} kept changing, gave up after {self.attempts} attempts.')
+
+    def clear(self):
+        with db.engine.begin() as connection:
+            connection.execute(delete(RateLimitCounter.__table__))
+
+
+class RedisRateLimitBackend:
+    """
+    Counters shared by all worker processes through a Redis-compatible server.
+
+    Requires the optional `redis` package. Each hit is an optimistic
+    WATCH/MULTI transaction on the counter's key, which expires on its own.
+    """
+
+    def __init__(self, url, prefix='rate-limit:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND='redis' requires the 'redis' package.")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def update(self, key, hit, ttl):
+        name = self.prefix + key
+        outcome = []
+
+        def transaction(pipeline):
+            value = pipeline.get(name)
+            result, state = hit(json.loads(value) if value is not None else None, time.time())
+            pipeline.multi()
+            pipeline.set(name, json.dumps(state), ex=max(1, math.ceil(ttl)))
+            outcome[:] = [result]
+
+        self.client.transaction(transaction, name)
+        return outcome[0]
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+def init_rate_limits(app):
+    """Create the configured counter backend and check the configured limits."""
+    backend = app.config.get('RATE_LIMIT_BACKEND', 'local')
+    if backend == 'local':
+        counters = LocalRateLimitBackend()
+    elif backend == 'database':
+        counters = DatabaseRateLimitBackend()
+    elif backend == 'redis':
+        counters = RedisRateLimitBackend(app.config['RATE_LIMIT_REDIS_URL'])
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend!r}.")
+    app.extensions['rate_limits'] = counters
+    for name in _limits:
+        spec = app.config.get(f'RATE_LIMIT_{name.upper()}')
+        if spec:
+            _limiter(spec, app.config.get('RATE_LIMIT_ALGORITHM', 'token_bucket'))
+
+
+def retry_later(message, status, retry_after):
+    """Error response telling the client to retry in `retry_after` seconds (rounded up)."""
+    response = jsonify({"message": message})
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
+
+def check_rate_limit(name, identity, algorithm=None):
+    """
+    Count a request of `identity` against the limit RATE_LIMIT_<NAME>.
+
+    Nothing is counted when the limit is not set or `identity` is None.
+    When the counters cannot be reached the request is let through.
+
+    Returns:
+        Seconds until the client may retry, 0 when the request is allowed.
+    """
+    config = current_app.config
+    spec = config.get(f'RATE_LIMIT_{name.upper()}')
+    if not spec or identity is None:
+        return 0
+    limiter = _limiter(spec, algorithm or config.get('RATE_LIMIT_ALGORITHM', 'token_bucket'))
+    # Identities (addresses, emails) are stored hashed
+    key = f'{name}:{hashlib.sha256(str(identity).encode()).hexdigest()[:32]}'
+    try:
+        retry_after = current_app.extensions['rate_limits'].update(key, limiter.hit, limiter.ttl)
+    except Exception:
+        logger.warning('rate limit %s unavailable, request let through', name, exc_info=True)
+        return 0
+    if retry_after:
+        RATE_LIMITED.labels(name).inc()
+    return retry_after
+
+
+def client_ip():
+    """The client's address (behind reverse proxies, set PROXY_FIX_HOPS so it is the real client's)."""
+    return request.remote_addr
+
+
+def json_field(name):
+    """Key function returning the request's JSON field `name`, normalized (e.g. the account of a login)."""
+    def key():
+        data = request.get_json(silent=True)
+        value = data.get(name) if isinstance(data, dict) else None
+        return value.strip().lower() if isinstance(value, str) and value.strip() else None
+    return key
+
+
+def rate_limit(name, key=client_ip, algorithm=None):
+    """
+    Limit how often a client may call the view to RATE_LIMIT_<NAME> (e.g. '10/minute').
+
+    Requests are counted per value of `key()`, the client IP by default. Over
+    the limit the view is not run and the client gets 429 with Retry-After.
+    The algorithm defaults to RATE_LIMIT_ALGORITHM ('token_bucket' or
+    'sliding_window'); an empty limit disables it. Stack several to limit
+    per address and per account.
+    """
+    _limits.add(name)
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            retry_after = check_rate_limit(name, key(), algorithm)
+            if retry_after:
+                return retry_later("Too many requests, please retry later.", 429, retry_after)
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@job('purge_rate_limit_counters', every=3600)
+def purge_expired_counters():
+    """Hourly job: delete expired counters of the database backend."""
+    result = db.session.execute(delete(RateLimitCounter).where(RateLimitCounter.expires_at < datetime.utcnow()))
+    db.session.commit()
+    return result.rowcount
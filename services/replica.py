@@ -0,0 +1,125 @@
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.engine import make_url
+from models import db
+from models.routing import REPLICA_BIND
+
+# Cookie carrying the Unix time until which the client reads from the primary
+PRIMARY_COOKIE = 'db_primary_until'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RecentWriters:
+    """Thread-safe in-process record of users that wrote recently and must read from the primary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deadlines = {}
+
+    def add(self, user_id, seconds):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._deadlines) > 1024:
+                self._deadlines = {key: deadline for key, deadline in self._deadlines.items() if deadline > now}
+            self._deadlines[user_id] = now + seconds
+
+    def __contains__(self, user_id):
+        with self._lock:
+            deadline = self._deadlines.get(user_id)
+            if deadline is None:
+                return False
+            if deadline < time.monotonic():
+                del self._deadlines[user_id]
+                return False
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._deadlines.clear()
+
+
+recent_writers = RecentWriters()
+
+
+def _current_user_id():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+def _reads_primary():
+    """Whether the client is inside its read-your-writes window."""
+    try:
+        if float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    user_id = _current_user_id()
+    return user_id is not None and user_id in recent_writers
+
+
+def use_replica():
+    """Send this request's SELECTs to the replica, unless there is none or the client just wrote."""
+    if REPLICA_BIND in db.engines and not _reads_primary():
+        g.db_read_replica = True
+
+
+def read_replica():
+    """
+    Let the view's SELECTs use the read replica (when DATABASE_REPLICA_URL is set).
+
+    Clients that wrote within the last DB_READ_YOUR_WRITES_SECONDS keep reading
+    from the primary, recognised by the PRIMARY_COOKIE or, within the same
+    process, by their user ID. Place it below `jwt_required`/`admin_required`.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            use_replica()
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _mark_writer(response):
+    """Start the read-your-writes window after a request that wrote to the primary."""
+    if request.method in SAFE_METHODS or not g.get('db_wrote') or response.status_code >= 400:
+        return response
+    seconds = current_app.config['DB_READ_YOUR_WRITES_SECONDS']
+    if seconds <= 0:
+        return response
+    user_id = _current_user_id()
+    if user_id is not None:
+        recent_writers.add(user_id, seconds)
+    response.set_cookie(PRIMARY_COOKIE, str(int(time.time() + seconds)), max_age=seconds,
+                        httponly=True, samesite='Lax')
+    return response
+
+
+def init_replica(app):
+    """Start read-your-writes windows after writes when a read replica is configured."""
+    if app.config.get('DATABASE_REPLICA_URL'):
+        app.after_request(_mark_writer)
+
+
+def sync_sqlite_replica():
+    """Copy the primary SQLite database into the replica file with SQLite's online backup."""
+    primary = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    replica = make_url(current_app.config['DATABASE_REPLICA_URL'])
+    if primary.get_backend_name() != 'sqlite' or replica.get_backend_name() != 'sqlite':
+        raise ValueError("Replica sync is only available when both databases are SQLite files.")
+
+    db.engines[REPLICA_BIND].dispose()
+    source = sqlite3.connect(primary.database)
+    target = sqlite3.connect(replica.database)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
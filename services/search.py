@@ -0,0 +1,130 @@
+import re
+import weakref
+from sqlalchemy import DDL, and_, column, event, func, inspect, or_, table, text
+from models import db
+from models.product import Product
+from services.jobs import job
+
+# External-content FTS5 index over the product table. The triggers keep it in sync
+# with every write (ORM, bulk import, raw SQL); stock-only updates do not touch it.
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        product_name, description,
+        content='product', content_rowid='product_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, product_name, description)
+        VALUES (new.product_id, new.product_name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, product_name, description)
+        VALUES ('delete', old.product_id, old.product_name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF product_name, description ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, product_name, description)
+        VALUES ('delete', old.product_id, old.product_name, old.description);
+        INSERT INTO product_fts(rowid, product_name, description)
+        VALUES (new.product_id, new.product_name, new.description);
+    END""",
+]
+
+for _statement in FTS_DDL:
+    event.listen(Product.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+product_fts = table('product_fts', column('rowid'))
+
+# bm25() column weights: a hit in the name counts ten times a hit in the description.
+RANK = text('bm25(product_fts, 10.0, 1.0)')
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    """Split a user query into plain word terms (quotes and FTS operators are dropped)."""
+    return _TERM.findall(query)
+
+
+# Per-engine memo of whether the FTS5 table exists, so searches do not re-inspect the schema.
+_fts_installed = weakref.WeakKeyDictionary()
+
+
+def uses_fts():
+    """Whether the current database has the FTS5 product index."""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+    if engine not in _fts_installed:
+        _fts_installed[engine] = inspect(engine).has_table('product_fts')
+    return _fts_installed[engine]
+
+
+def install_fts(rebuild=True):
+    """Create the FTS5 table and triggers if missing and optionally rebuild the index from `product`."""
+    for statement in FTS_DDL:
+        db.session.execute(text(statement))
+    if rebuild:
+        db.session.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    _fts_installed.pop(db.engine, None)
+
+
+@job('optimize_search_index')
+def optimize_search_index():
+    """Merge the FTS5 index segments left behind by bulk writes (queued after imports)."""
+    if uses_fts():
+        db.session.execute(text("INSERT INTO product_fts(product_fts) VALUES ('optimize')"))
+        db.session.commit()
+
+
+def _fts_query(terms):
+    # Every term must match, the last one as a prefix so results follow the user's typing.
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _base_query(terms):
+    """Query of matching products plus the ORDER BY expressions that rank them."""
+    if uses_fts():
+        match = text('product_fts MATCH :match').bindparams(match=_fts_query(terms))
+        query = (db.session.query(Product)
+                 .select_from(product_fts)
+                 .join(Product, Product.product_id == product_fts.c.rowid)
+                 .filter(match))
+        return query, [RANK, Product.product_id]
+
+    # Fallback for other backends: every term must appear in the name or description.
+    # On PostgreSQL a pg_trgm GIN index on both columns serves these ILIKE scans.
+    conditions = [or_(Product.product_name.ilike(f'%{term}%'), Product.description.ilike(f'%{term}%'))
+                  for term in terms]
+    query = db.session.query(Product).filter(and_(*conditions))
+    name_prefix = Product.product_name.ilike(f'{terms[0]}%')
+    return query, [name_prefix.desc(), Product.product_id]
+
+
+def search_products(query, category_id=None, limit=20, offset=0):
+    """
+    Full-text search over product names and descriptions.
+
+    Returns:
+        Tuple (products, facets, has_more) where products is the ranked page,
+        facets lists {category_id, count} for all matches (ignoring the
+        category filter) and has_more tells whether another page follows.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], [], False
+
+    matches, order_by = _base_query(terms)
+
+    facet_rows = (matches.with_entities(Product.category_id, func.count())
+                  .group_by(Product.category_id)
+                  .order_by(func.count().desc(), Product.category_id)
+                  .all())
+    facets = [{'category_id': category, 'count': count} for category, count in facet_rows]
+
+    if category_id is not None:
+        matches = matches.filter(Product.category_id == category_id)
+    products = matches.order_by(*order_by).offset(offset).limit(limit + 1).all()
+    return products[:limit], facets, len(products) > limit
@@ -0,0 +1,141 @@
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func, insert, select
+from models import db
+from models.category import Category
+from models.invoice import Invoice
+from models.order import Order
+from models.order_items import OrderItems
+from models.product import Product
+from models.user import User
+from services.analytics import rebuild_sales_rollups
+from services.passwords import hash_password
+
+# Credentials of every synthetic user: loadtest<n>@example.com / SYNTHETIC_PASSWORD
+SYNTHETIC_EMAIL = 'loadtest{}@example.com'
+SYNTHETIC_PASSWORD = 'LoadTest123!'
+
+_WORDS = ('oak', 'walnut', 'pine', 'steel', 'glass', 'linen', 'velvet', 'leather', 'rattan', 'marble',
+          'chair', 'table', 'sofa', 'lamp', 'desk', 'shelf', 'bed', 'rug', 'mirror', 'stool',
+          'modern', 'classic', 'rustic', 'compact', 'folding', 'outdoor', 'kids', 'office', 'corner', 'round')
+
+
+def _insert_chunked(model, rows, chunk_size=5000):
+    """Insert rows with one executemany per chunk."""
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(insert(model), rows[start:start + chunk_size])
+
+
+def _next_id(column):
+    return (db.session.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def seed_categories_bulk(names):
+    """Insert the categories that do not exist yet with one query and one executemany; returns how many."""
+    names = list(dict.fromkeys(names))
+    existing = set(db.session.execute(
+        select(Category.category_name).where(Category.category_name.in_(names))).scalars())
+    missing = [{'category_name': name} for name in names if name not in existing]
+    if missing:
+        _insert_chunked(Category, missing)
+    db.session.commit()
+    return len(missing)
+
+
+def seed_users_bulk(users, password):
+    """
+    Insert users (dicts with user_name, email and role) that do not exist yet.
+
+    All of them get the same password, hashed once: hashing is deliberately
+    slow, so hashing per user would dominate the seeding time.
+    """
+    emails = [user['email'] for user in users]
+    existing = set()
+    for start in range(0, len(emails), 500):
+        existing.update(db.session.execute(
+            select(User.email).where(User.email.in_(emails[start:start + 500]))).scalars())
+    missing = [user for user in users if user['email'] not in existing]
+    if missing:
+        password_hash = hash_password(password)
+        now = datetime.utcnow()
+        _insert_chunked(User, [{**user, 'password_hash': password_hash, 'created_at': now, 'updated_at': now}
+                               for user in missing])
+    db.session.commit()
+    return len(missing)
+
+
+def seed_synthetic(users=1000, categories=20, products=10000, orders=2000, items_per_order=3, seed=0):
+    """
+    Seed a reproducible synthetic dataset for benchmarks and load tests.
+
+    Creates `users` customers (loadtest<n>@example.com, password
+    SYNTHETIC_PASSWORD), `categories` categories, `products` products with
+    plenty of stock and `orders` past orders (Placed, Paid or Shipped, each
+    with `items_per_order` lines and an invoice). Everything is written with
+    executemany batches; running it again only adds what is missing, apart
+    from the orders, which are added on every run. The sales rollups of the
+    days the orders fall on are rebuilt afterwards.
+
+    Returns:
+        Dict with the number of rows inserted per table.
+    """
+    rng = random.Random(seed)
+    report = {'users': 0, 'categories': 0, 'products': 0, 'orders': 0, 'order_items': 0}
+
+    report['users'] = seed_users_bulk(
+        [{'user_name': f'Load Test {n}', 'email': SYNTHETIC_EMAIL.format(n), 'role': 'customer'}
+         for n in range(users)],
+        SYNTHETIC_PASSWORD)
+    report['categories'] = seed_categories_bulk(f'Synthetic Category {n}' for n in range(categories))
+    category_ids = db.session.execute(
+        select(Category.category_id).where(Category.category_name.like('Synthetic Category %'))).scalars().all()
+
+    existing = db.session.execute(
+        select(func.count()).select_from(Product).where(Product.product_name.like('Synthetic Product %'))).scalar()
+    now = datetime.utcnow()
+    rows = []
+    for n in range(existing, products):
+        words = rng.sample(_WORDS, 4)
+        rows.append({'product_name': f'Synthetic Product {n} {words[0]} {words[1]}',
+                     'description': ' '.join(words),
+                     'price': Decimal(rng.randint(100, 100000)) / 100,
+                     'product_quantity': 1_000_000,
+                     'category_id': rng.choice(category_ids),
+                     'updated_at': now})
+    _insert_chunked(Product, rows)
+    db.session.commit()
+    report['products'] = len(rows)
+
+    user_ids = db.session.execute(
+        select(User.user_id).where(User.email.like(SYNTHETIC_EMAIL.format('%')))).scalars().all()
+    product_prices = db.session.execute(select(Product.product_id, Product.price)).all()
+    if not orders or not user_ids or not product_prices:
+        return report
+
+    # Explicit primary keys let the items and invoices reference their order without reading it back
+    order_id = _next_id(Order.order_id)
+    order_rows, item_rows, invoice_rows = [], [], []
+    for _ in range(orders):
+        placed_at = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+        total = Decimal('0')
+        for product_id, price in rng.sample(product_prices, min(items_per_order, len(product_prices))):
+            quantity = rng.randint(1, 3)
+            item_rows.append({'order_id': order_id, 'product_id': product_id, 'quantity': quantity,
+                              'unit_price': price})
+            total += price * quantity
+        user_id = rng.choice(user_ids)
+        order_rows.append({'order_id': order_id, 'user_id': user_id, 'status': rng.choice(('Placed', 'Paid', 'Shipped')),
+                           'order_date': placed_at, 'updated_at': placed_at})
+        invoice_rows.append({'order_id': order_id, 'user_id': user_id, 'total_amount': total,
+                             'payment_method': 'Online Payment', 'invoice_date': placed_at})
+        order_id += 1
+    _insert_chunked(Order, order_rows)
+    _insert_chunked(OrderItems, item_rows)
+    _insert_chunked(Invoice, invoice_rows)
+    db.session.commit()
+    placed = [row['order_date'] for row in order_rows]
+    rebuild_sales_rollups(min(placed).date(), max(placed).date() + timedelta(days=1))
+    report['orders'] = len(order_rows)
+    report['order_items'] = len(item_rows)
+    return report